@@ -0,0 +1,126 @@
+"""
+Incremental (online) aggregation of count events into time buckets.
+
+Counters are updated as events arrive and each bucket is emitted as soon as the
+stream time passes its end, so long and live runs publish partial results and
+hold only the open buckets in memory. Several resolutions (e.g. 5/15/60 min)
+are kept at once, plus a per-site, per-day rollup.
+
+With a known recording start (parsed from siteNN_YYYYMMDD_HHMM file names, or
+the wall clock for live streams) buckets are aligned to the clock: a recording
+starting 18:07 has 15-minute buckets 18:00-18:15, 18:15-18:30, ... and
+bucket_start_sec/bucket_end_sec stay offsets from the recording start (the
+first one may be negative). Without a start, buckets are measured from the
+start of the video as before.
+"""
+from __future__ import annotations
+import math
+import re
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+FILENAME_START = re.compile(r"(site\d+)_(\d{8})_(\d{4})", re.IGNORECASE)
+DAY_SEC = 86400
+_EPOCH = datetime(1970, 1, 1)
+
+def parse_recording_start(path: str) -> Optional[datetime]:
+    """Recording start from a siteNN_YYYYMMDD_HHMM[...] file name, else None."""
+    m = FILENAME_START.search(str(path).replace("\\", "/").rsplit("/", 1)[-1])
+    if not m:
+        return None
+    try:
+        return datetime.strptime(m.group(2) + m.group(3), "%Y%m%d%H%M")
+    except ValueError:
+        return None
+
+Row = Dict[str, object]
+RowSink = Callable[[str, List[Row]], None]
+
+class OnlineAggregator:
+    """
+    add(events) -> update counters; advance(t_sec) -> close buckets ending at or
+    before t_sec; flush() -> close everything. Closed rows are passed to
+    `on_close(resolution, rows)` (resolution "5min", "15min", ..., "daily")
+    and also returned.
+    """
+
+    def __init__(self, bucket_minutes: Sequence[int] = (15,), origin: Optional[datetime] = None,
+                 extra_keys: Sequence[str] = (), daily: bool = True,
+                 on_close: Optional[RowSink] = None):
+        self.bucket_minutes = tuple(int(m) for m in bucket_minutes)
+        for m in self.bucket_minutes:
+            if m <= 0 or DAY_SEC % (m * 60):
+                raise ValueError(f"Bucket size must divide a day evenly, got {m} min")
+        self.origin = origin
+        self.extra_keys = tuple(extra_keys)
+        self.daily = daily
+        self.on_close = on_close
+        # seconds of the recording start on the aligned clock (0 when unknown)
+        self._origin_sec = (origin - _EPOCH).total_seconds() if origin is not None else 0.0
+        self._sizes = [(f"{m}min", m * 60) for m in self.bucket_minutes]
+        if daily and origin is not None:
+            self._sizes.append(("daily", DAY_SEC))
+        self._open: Dict[str, Dict[int, Counter]] = {name: defaultdict(Counter) for name, _ in self._sizes}
+        self.events_seen = 0
+
+    def add(self, events: Iterable) -> None:
+        for e in events:
+            abs_sec = self._origin_sec + float(e.t_sec)
+            key = (e.site_id, *(getattr(e, k) for k in self.extra_keys), e.cls_name)
+            for name, size in self._sizes:
+                self._open[name][int(math.floor(abs_sec / size)) * size][key] += 1
+            self.events_seen += 1
+
+    def advance(self, t_sec: float) -> Dict[str, List[Row]]:
+        """Close every bucket that ends at or before stream time t_sec."""
+        return self._close(self._origin_sec + float(t_sec))
+
+    def flush(self) -> Dict[str, List[Row]]:
+        return self._close(math.inf)
+
+    def _close(self, abs_now: float) -> Dict[str, List[Row]]:
+        closed: Dict[str, List[Row]] = {}
+        for name, size in self._sizes:
+            buckets = self._open[name]
+            ready = sorted(b for b in buckets if b + size <= abs_now)
+            if not ready:
+                continue
+            rows = []
+            for b in ready:
+                counts = buckets.pop(b)
+                for key in sorted(counts):
+                    rows.append(self._row(name, b, size, key, counts[key]))
+            closed[name] = rows
+            if self.on_close is not None:
+                self.on_close(name, rows)
+        return closed
+
+    def _row(self, name: str, start_abs: int, size: int, key: Tuple, count: int) -> Row:
+        row: Row = {
+            "bucket_start_sec": _offset(start_abs - self._origin_sec),
+            "bucket_end_sec": _offset(start_abs + size - self._origin_sec),
+        }
+        if self.origin is not None:
+            start = _EPOCH + timedelta(seconds=start_abs)
+            row["bucket_start"] = start.isoformat(sep=" ")
+            row["bucket_end"] = (start + timedelta(seconds=size)).isoformat(sep=" ")
+            if name == "daily":
+                row = {"date": start.date().isoformat()}
+        row["site_id"] = key[0]
+        for k, v in zip(self.extra_keys, key[1:-1]):
+            row[k] = v
+        row["vehicle_class"] = key[-1]
+        row["count"] = count
+        return row
+
+def _offset(sec: float):
+    sec = round(sec, 3)
+    return int(sec) if float(sec).is_integer() else sec
+
+def row_columns(extra_keys: Sequence[str] = (), with_clock: bool = False, daily: bool = False) -> List[str]:
+    if daily:
+        head = ["date"]
+    else:
+        head = ["bucket_start_sec", "bucket_end_sec"] + (["bucket_start", "bucket_end"] if with_clock else [])
+    return head + ["site_id", *extra_keys, "vehicle_class", "count"]
@@ -1,22 +1,19 @@
 """15-minute time bucketing and aggregation."""
 from __future__ import annotations
 import pandas as pd
-import math
+from typing import Sequence
 
-BUCKET_SEC = 900  # 15 minutes
+from .online import OnlineAggregator, row_columns
 
-def events_to_15min_counts(events: list) -> pd.DataFrame:
-    if not events:
-        return pd.DataFrame(columns=["bucket_start_sec","bucket_end_sec","site_id","vehicle_class","count"])
+BUCKET_SEC = 900  # 15 minutes
 
-    rows = []
-    for e in events:
-        b = int(math.floor(float(e.t_sec) / BUCKET_SEC))
-        start = b * BUCKET_SEC
-        end = start + BUCKET_SEC
-        rows.append([start, end, e.site_id, e.cls_name])
+def events_to_15min_counts(events: list, extra_keys: Sequence[str] = ()) -> pd.DataFrame:
+    """
+    Batch form of OnlineAggregator: 15-minute buckets from the start of the video.
 
-    df = pd.DataFrame(rows, columns=["bucket_start_sec","bucket_end_sec","site_id","vehicle_class"])
-    out = df.groupby(["bucket_start_sec","bucket_end_sec","site_id","vehicle_class"], as_index=False).size()
-    out = out.rename(columns={"size": "count"})
-    return out.sort_values(["bucket_start_sec","site_id","vehicle_class"]).reset_index(drop=True)
+    extra_keys: additional CountEvent fields to split counts by, e.g. ("zone_id", "direction").
+    """
+    agg = OnlineAggregator(bucket_minutes=(BUCKET_SEC // 60,), extra_keys=extra_keys, daily=False)
+    agg.add(events)
+    rows = agg.flush().get(f"{BUCKET_SEC // 60}min", [])
+    return pd.DataFrame(rows, columns=row_columns(extra_keys))
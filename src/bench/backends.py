@@ -0,0 +1,131 @@
+"""
+Compare inference backends on a reference clip: per-frame latency and count drift.
+
+Every backend/precision runs detection + tracking + counting on the same sampled
+frames of the first --seconds; counts are compared against the first combo
+(torch:fp32 by default). Each combo decodes the clip again instead of holding
+the frames in memory; only inference + tracking is timed.
+
+Usage:
+    python -m src.bench.backends --video data/raw_videos/site01_ref.mp4 --site site01
+    python -m src.bench.backends --video clip.mp4 --site site01 --combos torch:fp32,openvino:int8 --seconds 120
+"""
+from __future__ import annotations
+import argparse
+import copy
+import math
+import time
+from collections import Counter
+from itertools import islice
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.export.json_summary import write_json
+from src.ingest.video_reader import probe_video
+from src.process_video import build_counter, build_tracker, open_frames
+from src.track.batch import class_filter
+from src.utils.config import load_yaml
+
+DEFAULT_COMBOS = "torch:fp32,onnxruntime:fp32,onnxruntime:int8,openvino:fp32,openvino:int8"
+
+def run_combo(video: str, end_frame: Optional[int], cfg: dict, site_cfg: dict, keep: set, scale: float,
+              backend: str, precision: str, warmup: int = 3) -> Dict:
+    cfg = copy.deepcopy(cfg)
+    cfg["detector"].update(backend=backend, precision=precision)
+    t0 = time.perf_counter()
+    tracker = build_tracker(cfg)
+    load_sec = time.perf_counter() - t0
+    frame_iter, _ = open_frames(video, cfg, end_frame=end_frame)
+    for pkt in islice(frame_iter, warmup):
+        # predict() leaves the tracker untouched, so warm-up does not shift track ids
+        tracker.model.predict(pkt.frame_bgr, imgsz=tracker.imgsz, conf=tracker.conf, iou=tracker.iou, verbose=False)
+
+    counter = build_counter(site_cfg, cfg, scale=scale)
+    rule = cfg["counting"]["rule"]
+    keep_table = class_filter(tracker.names, keep)
+    latencies: List[float] = []
+    counts: Counter = Counter()
+    frame_iter, _ = open_frames(video, cfg, end_frame=end_frame)
+    for pkt in frame_iter:
+        t = time.perf_counter()
+        tracked = tracker.track_frame(pkt.frame_bgr)
+        latencies.append(time.perf_counter() - t)
+        if keep:
+            tracked = tracked.only(keep_table)
+        counts.update(e.cls_name for e in counter.update(pkt.t_sec, tracked, rule_name=rule))
+    lat = np.asarray(latencies)
+    return {
+        "backend": backend,
+        "precision": precision,
+        "load_sec": round(load_sec, 2),
+        "frames": len(lat),
+        "latency_ms_mean": round(float(lat.mean()) * 1000, 2) if len(lat) else None,
+        "latency_ms_p50": round(float(np.percentile(lat, 50)) * 1000, 2) if len(lat) else None,
+        "latency_ms_p95": round(float(np.percentile(lat, 95)) * 1000, 2) if len(lat) else None,
+        "frames_per_sec": round(len(lat) / float(lat.sum()), 2) if lat.sum() > 0 else None,
+        "counts": dict(sorted(counts.items())),
+        "total": int(sum(counts.values())),
+    }
+
+def compare_counts(result: Dict, baseline: Dict) -> Dict:
+    classes = sorted(set(result["counts"]) | set(baseline["counts"]))
+    delta = {c: result["counts"].get(c, 0) - baseline["counts"].get(c, 0) for c in classes}
+    base_total = baseline["total"]
+    return {
+        "count_delta": {c: d for c, d in delta.items() if d},
+        "count_abs_diff": int(sum(abs(d) for d in delta.values())),
+        "total_change_pct": round(100.0 * (result["total"] - base_total) / base_total, 2) if base_total else None,
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description="Latency and count drift of the inference backends")
+    ap.add_argument("--video", required=True, help="Reference clip of a calibrated site")
+    ap.add_argument("--site", required=True)
+    ap.add_argument("--config", default="configs/pipeline.yaml")
+    ap.add_argument("--sites", default="configs/sites.yaml")
+    ap.add_argument("--classes", default="configs/classes.yaml")
+    ap.add_argument("--combos", default=DEFAULT_COMBOS, help="Comma-separated backend:precision; first is the baseline")
+    ap.add_argument("--seconds", type=float, default=60.0, help="Use only the first N seconds of the clip")
+    ap.add_argument("--out", default=None, help="Optional JSON file for the results")
+    args = ap.parse_args()
+
+    cfg = load_yaml(args.config)
+    site_cfg = load_yaml(args.sites)["sites"][args.site]
+    keep = set(load_yaml(args.classes).get("keep_classes", []))
+
+    # frames with t_sec < --seconds; the decoder stops there instead of reading the whole clip
+    end_frame = int(math.ceil(args.seconds * probe_video(args.video)["src_fps"]))
+    _, meta = open_frames(args.video, cfg, end_frame=end_frame)
+    print(f"Reference: {args.video} (first {args.seconds:g} s at {cfg['fps_infer']} fps)")
+
+    results: List[Dict] = []
+    for combo in [c.strip() for c in args.combos.split(",") if c.strip()]:
+        backend, _, precision = combo.partition(":")
+        precision = precision or "fp32"
+        try:
+            r = run_combo(args.video, end_frame, cfg, site_cfg, keep, meta["scale"], backend, precision)
+        except (ImportError, ValueError, RuntimeError) as e:
+            print(f"⚠️  {combo}: skipped ({e})")
+            results.append({"backend": backend, "precision": precision, "error": str(e)})
+            continue
+        results.append(r)
+
+    ok = [r for r in results if "error" not in r]
+    if ok:
+        baseline = ok[0]
+        for r in ok:
+            r.update(compare_counts(r, baseline))
+        print(f"\n{'backend':<12} {'prec':<5} {'p50 ms':>8} {'p95 ms':>8} {'fps':>7} {'total':>6} {'Δ%':>7} {'|Δ|':>4}")
+        for r in ok:
+            pct = r["total_change_pct"]
+            print(f"{r['backend']:<12} {r['precision']:<5} {r['latency_ms_p50']:>8} {r['latency_ms_p95']:>8} "
+                  f"{r['frames_per_sec']:>7} {r['total']:>6} {('-' if pct is None else pct):>7} {r['count_abs_diff']:>4}")
+
+    if args.out:
+        write_json({"video": args.video, "site": args.site, "baseline": ok[0]["backend"] + ":" + ok[0]["precision"]
+                    if ok else None, "results": results}, args.out)
+        print(f"Results: {args.out}")
+
+if __name__ == "__main__":
+    main()
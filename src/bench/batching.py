@@ -0,0 +1,82 @@
+"""
+Single-frame vs batched inference on a reference clip: frames/sec per
+detector.batch_size, and whether the events match single-frame mode.
+
+Every batch size runs the pipeline (decode -> infer -> count, as process_video)
+on the same sampled frames of the first --seconds with one loaded model, reset
+between runs. The first batch size is the baseline the events are compared
+with; any difference is a bug, and the run exits with code 1.
+
+Usage:
+    python -m src.bench.batching --video data/raw_videos/site01_ref.mp4 --site site01
+    python -m src.bench.batching --video clip.mp4 --site site01 --batch_sizes 1,4,8,16 --seconds 120
+"""
+from __future__ import annotations
+import argparse
+import math
+import time
+from typing import Dict, List, Optional
+
+from src.export.json_summary import write_json
+from src.ingest.video_reader import probe_video
+from src.process_video import build_counter, build_tracker, count_frames, open_frames
+from src.utils.config import load_yaml
+
+def run_batch_size(tracker, video: str, end_frame: Optional[int], cfg: dict, site_cfg: dict, keep: set,
+                   batch_size: int) -> Dict:
+    tracker.reset()
+    frame_iter, meta = open_frames(video, cfg, end_frame=end_frame)
+    counter = build_counter(site_cfg, cfg, scale=meta["scale"])
+    t0 = time.perf_counter()
+    events, processed, _ = count_frames(frame_iter, tracker, counter, cfg, keep, batch_size)
+    elapsed = time.perf_counter() - t0
+    return {
+        "batch_size": batch_size,
+        "frames": processed,
+        "elapsed_sec": round(elapsed, 3),
+        "frames_per_sec": round(processed / elapsed, 2) if elapsed > 0 else None,
+        "events": [(e.t_sec, e.track_id, e.cls_name, e.zone_id, e.direction) for e in events],
+    }
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Frames/sec of single-frame vs batched inference, with a count check")
+    ap.add_argument("--video", required=True, help="Reference clip of a calibrated site")
+    ap.add_argument("--site", required=True)
+    ap.add_argument("--config", default="configs/pipeline.yaml")
+    ap.add_argument("--sites", default="configs/sites.yaml")
+    ap.add_argument("--classes", default="configs/classes.yaml")
+    ap.add_argument("--batch_sizes", default="1,4,8", help="Comma-separated; the first is the baseline")
+    ap.add_argument("--seconds", type=float, default=60.0, help="Use only the first N seconds of the clip")
+    ap.add_argument("--out", default=None, help="Optional JSON file for the results")
+    args = ap.parse_args(argv)
+
+    cfg = load_yaml(args.config)
+    site_cfg = load_yaml(args.sites)["sites"][args.site]
+    keep = set(load_yaml(args.classes).get("keep_classes", []))
+    sizes = [max(1, int(b)) for b in args.batch_sizes.split(",") if b.strip()]
+    end_frame = int(math.ceil(args.seconds * probe_video(args.video)["src_fps"]))
+    print(f"Reference: {args.video} (first {args.seconds:g} s at {cfg['fps_infer']} fps)")
+
+    tracker = build_tracker(cfg)
+    warm_iter, _ = open_frames(args.video, cfg, end_frame=end_frame)
+    tracker.track_frames([pkt.frame_bgr for _, pkt in zip(range(max(sizes)), warm_iter)])  # backend init
+
+    results: List[Dict] = [run_batch_size(tracker, args.video, end_frame, cfg, site_cfg, keep, b) for b in sizes]
+    baseline = results[0]
+    print(f"\n{'batch':>5} {'fps':>8} {'speedup':>8} {'events':>7} {'match':>6}")
+    for r in results:
+        r["speedup"] = round(r["frames_per_sec"] / baseline["frames_per_sec"], 2) \
+            if r["frames_per_sec"] and baseline["frames_per_sec"] else None
+        r["events_match"] = r["events"] == baseline["events"]
+        print(f"{r['batch_size']:>5} {str(r['frames_per_sec']):>8} {str(r['speedup']):>8} {len(r['events']):>7} "
+              f"{'yes' if r['events_match'] else 'NO':>6}")
+
+    if args.out:
+        write_json({"video": args.video, "site": args.site, "seconds": args.seconds,
+                    "results": [dict(r, events=len(r["events"])) for r in results]}, args.out)
+        print(f"Results: {args.out}")
+    if not all(r["events_match"] for r in results):
+        raise SystemExit("❌ Batched events differ from the baseline")
+
+if __name__ == "__main__":
+    main()
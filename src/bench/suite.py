@@ -0,0 +1,233 @@
+"""
+Offline benchmark suite: throughput of the pipeline's CPU stages on synthetic
+data (no model, no download), tracked over time with a regression check.
+
+Each case runs `--repeat` times and keeps the best time; results are appended
+to a JSONL history and compared with the median of the last `--window` runs
+on the same host and settings. A case whose throughput dropped by more than
+`--threshold` fails the run (exit code 1), so it can gate CI.
+
+Usage:
+    python -m src.bench.suite
+    python -m src.bench.suite --quick --threshold 0.2 --history benchmarks/history.jsonl
+    python -m src.bench.suite --only counter,annotate --no_record
+"""
+from __future__ import annotations
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.aggregate.time_bucketing import events_to_15min_counts
+from src.bench.synthetic import make_synthetic_tracks, make_synthetic_video
+from src.count.counter import CountEvent, LineCrossingCounter
+from src.export.annotation_sink import track_arrays
+from src.export.csv_writer import write_csv
+from src.export.excel_writer import write_xlsx
+from src.export.json_summary import write_json
+from src.export.video_annotator import draw_track_arrays, draw_tracks
+from src.ingest.video_reader import iter_video_frames
+
+GROUPS = ("reader", "counter", "aggregate", "export", "annotate")
+DENSITIES = (2, 10, 50)   # vehicles on screen
+SIZE = (1280, 720)
+
+MIN_SAMPLE_SEC = 0.2
+
+def best_time(fn: Callable[[], object], repeat: int) -> float:
+    """Best time of one fn() call; short cases are looped so each sample takes MIN_SAMPLE_SEC."""
+    t0 = time.perf_counter()
+    fn()
+    loops = max(1, int(math.ceil(MIN_SAMPLE_SEC / max(time.perf_counter() - t0, 1e-9))))
+    best = float("inf")
+    gc_was_enabled = gc.isenabled()
+    gc.disable()  # as timeit: collector pauses are noise here
+    try:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            best = min(best, (time.perf_counter() - t0) / loops)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return best
+
+def result(name: str, unit: str, items: int, sec: float, **extra) -> dict:
+    return dict(name=name, unit=unit, items=items, best_sec=round(sec, 5),
+                throughput=round(items / sec, 2) if sec > 0 else None, **extra)
+
+def bench_reader(workdir: str, seconds: float, repeat: int) -> List[dict]:
+    path = os.path.join(workdir, f"suite_{int(seconds)}s.avi")
+    if not os.path.exists(path):
+        make_synthetic_video(path, seconds=seconds, fps=30.0, size=SIZE)
+    out = []
+    for mode in ("read", "grab"):
+        n = sum(1 for _ in iter_video_frames(path, 10.0, decode_mode=mode)[0])
+        sec = best_time(lambda: sum(1 for _ in iter_video_frames(path, 10.0, decode_mode=mode)[0]), repeat)
+        out.append(result(f"reader.{mode}", "frames/s", n, sec))
+    return out
+
+def _count(frames: List[tuple]) -> List[CountEvent]:
+    w, h = SIZE
+    counter = LineCrossingCounter("bench", (w / 2, 0.0), (w / 2, float(h)), min_track_age_frames=3)
+    events = []
+    for t_sec, tracked in frames:
+        events.extend(counter.update(t_sec, tracked, rule_name="line_cross"))
+    return events
+
+def bench_counter(streams: Dict[int, List[tuple]], repeat: int) -> List[dict]:
+    out = []
+    for density, frames in streams.items():
+        events = _count(frames)
+        sec = best_time(lambda: _count(frames), repeat)
+        # the event count is deterministic; a change means counting behaviour changed
+        out.append(result(f"counter.density{density}", "frames/s", len(frames), sec, events=len(events)))
+    return out
+
+def _day_of_events(events: List[CountEvent], n: int) -> List[CountEvent]:
+    """n events spread over 24 h, cycling through the counted ones."""
+    t = np.sort(np.random.default_rng(0).uniform(0, 86400.0, size=n))
+    return [CountEvent(float(t[i]), "bench", i, events[i % len(events)].cls_name, "line_cross") for i in range(n)]
+
+def bench_aggregate(events: List[CountEvent], n_events: int, repeat: int) -> List[dict]:
+    day = _day_of_events(events, n_events)
+    sec = best_time(lambda: events_to_15min_counts(day), repeat)
+    return [result("aggregate.events_to_15min_counts", "events/s", len(day), sec)]
+
+def bench_export(events: List[CountEvent], days: int, workdir: str, repeat: int) -> List[dict]:
+    df = pd.concat([events_to_15min_counts(_day_of_events(events, 20000)).assign(day=d) for d in range(days)],
+                   ignore_index=True)
+    csv_path = os.path.join(workdir, "suite_counts.csv")
+    xlsx_path = os.path.join(workdir, "suite_counts.xlsx")
+    return [result("export.write_csv", "rows/s", len(df), best_time(lambda: write_csv(df, csv_path), repeat)),
+            result("export.write_xlsx", "rows/s", len(df), best_time(lambda: write_xlsx(df, xlsx_path), repeat))]
+
+def bench_annotate(frames: List[tuple], repeat: int) -> List[dict]:
+    w, h = SIZE
+    canvas = np.random.default_rng(0).integers(30, 70, size=(h, w, 3), dtype=np.uint8)
+    arrays = [track_arrays(batch) for _, batch in frames]
+
+    def objects():
+        for _, objs in frames:
+            draw_tracks(canvas.copy(), objs)
+
+    def compact():
+        for ids, xyxy, labels in arrays:
+            draw_track_arrays(canvas, ids, xyxy, labels)
+
+    return [result("annotate.draw_tracks_copy", "frames/s", len(frames), best_time(objects, repeat)),
+            result("annotate.draw_track_arrays", "frames/s", len(frames), best_time(compact, repeat))]
+
+def run_suite(groups=GROUPS, quick: bool = False, repeat: int = 3, workdir: Optional[str] = None) -> List[dict]:
+    workdir = workdir or tempfile.mkdtemp(prefix="vta_suite_")
+    n_frames = 600 if quick else 3000
+    streams = {d: make_synthetic_tracks(n_frames, fps=10.0, density=d, size=SIZE, seed=d) for d in DENSITIES}
+    events = _count(streams[DENSITIES[1]])
+    results: List[dict] = []
+    if "reader" in groups:
+        results += bench_reader(workdir, 10.0 if quick else 30.0, repeat)
+    if "counter" in groups:
+        results += bench_counter(streams, repeat)
+    if "aggregate" in groups:
+        results += bench_aggregate(events, 20000 if quick else 200000, repeat)
+    if "export" in groups:
+        results += bench_export(events, 7 if quick else 31, workdir, repeat)
+    if "annotate" in groups:
+        results += bench_annotate(streams[DENSITIES[1]][:200 if quick else 600], repeat)
+    return results
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_history(path: str) -> List[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def append_history(path: str, entry: dict) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, sort_keys=True) + "\n")
+
+def compare(results: List[dict], history: List[dict], host: str, quick: bool,
+            threshold: float, window: int) -> List[dict]:
+    """Annotate each result with its baseline (median of the last `window` comparable runs)."""
+    past = [h for h in history if h.get("host") == host and h.get("quick") == quick][-window:]
+    for r in results:
+        counted = [h["events"][r["name"]] for h in past if r["name"] in h.get("events", {})]
+        if "events" in r and counted and counted[-1] != r["events"]:
+            print(f"⚠️  {r['name']}: {r['events']} events, {counted[-1]} in the previous run (counting changed)")
+        prev = [h["results"][r["name"]] for h in past if h["results"].get(r["name"])]
+        if not prev or r["throughput"] is None:
+            r.update(baseline=None, change_pct=None, regression=False)
+            continue
+        base = float(np.median(prev))
+        change = r["throughput"] / base - 1.0
+        r.update(baseline=round(base, 2), change_pct=round(100.0 * change, 1), regression=change < -threshold)
+    return results
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Offline throughput benchmarks with regression tracking")
+    ap.add_argument("--only", default=",".join(GROUPS), help=f"Comma-separated groups of: {', '.join(GROUPS)}")
+    ap.add_argument("--quick", action="store_true", help="Smaller inputs (compared only with other --quick runs)")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per case; the best time is kept")
+    ap.add_argument("--history", default="benchmarks/history.jsonl")
+    ap.add_argument("--threshold", type=float, default=0.15,
+                    help="Fail when throughput drops more than this fraction below the baseline")
+    ap.add_argument("--window", type=int, default=5, help="Baseline = median of this many previous runs")
+    ap.add_argument("--no_record", action="store_true", help="Compare only; do not append to the history")
+    ap.add_argument("--workdir", default=None, help="Where to write synthetic inputs (default: temp dir)")
+    ap.add_argument("--out", default=None, help="Optional JSON file for this run's results")
+    args = ap.parse_args(argv)
+
+    groups = [g.strip() for g in args.only.split(",") if g.strip()]
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        raise SystemExit(f"❌ Unknown benchmark group(s): {', '.join(sorted(unknown))}")
+
+    host = platform.node()
+    results = run_suite(groups, quick=args.quick, repeat=max(1, args.repeat), workdir=args.workdir)
+    compare(results, load_history(args.history), host, args.quick, args.threshold, args.window)
+
+    for r in results:
+        change = f"{r['change_pct']:+6.1f}%" if r["change_pct"] is not None else "    new"
+        flag = "  ❌ REGRESSION" if r["regression"] else ""
+        print(f"{r['name']:36} {r['throughput']:>12,.1f} {r['unit']:9} {change}{flag}")
+
+    entry = {
+        "run_at": datetime.utcnow().isoformat() + "Z",
+        "commit": git_commit(),
+        "host": host,
+        "python": platform.python_version(),
+        "quick": args.quick,
+        "results": {r["name"]: r["throughput"] for r in results},
+        "events": {r["name"]: r["events"] for r in results if "events" in r},
+    }
+    if not args.no_record:
+        append_history(args.history, entry)
+    if args.out:
+        write_json(dict(entry, details=results, threshold=args.threshold), args.out)
+
+    regressed = [r["name"] for r in results if r["regression"]]
+    if regressed:
+        raise SystemExit(f"❌ Throughput regression (> {args.threshold:.0%} below baseline): {', '.join(regressed)}")
+    print("✅ No throughput regressions")
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,10 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from typing import Dict, List, Optional, Set, Tuple
-from .geometry import bottom_center, crossed_line
+
+import numpy as np
+
+from .geometry import crossed_line, side_of_line
 
 @dataclass
 class CountEvent:
@@ -11,28 +14,55 @@ class CountEvent:
     track_id: int
     cls_name: str
     rule: str
+    zone_id: str = "line"
+    direction: str = "any"
 
 class LineCrossingCounter:
     def __init__(self, site_id: str, p1: Tuple[float,float], p2: Tuple[float,float],
-                 min_track_age_frames: int = 3, count_once_per_video: bool = True):
+                 min_track_age_frames: int = 3, count_once_per_video: bool = True,
+                 max_idle_sec: Optional[float] = None):
         self.site_id = site_id
         self.p1 = p1
         self.p2 = p2
         self.min_track_age_frames = min_track_age_frames
         self.count_once_per_video = count_once_per_video
+        # forget tracks unseen this long (None = keep state for the whole video)
+        self.max_idle_sec = max_idle_sec
 
         self.prev_point: Dict[int, Tuple[float,float]] = {}
         self.age_frames: Dict[int, int] = {}
         self.counted: Set[int] = set()
+        self.last_seen: Dict[int, float] = {}
+        self._next_evict: Optional[float] = None
+
+    def evict(self, t_sec: float) -> int:
+        """Drop state of tracks unseen for more than max_idle_sec; returns how many were dropped."""
+        if self.max_idle_sec is None:
+            return 0
+        cutoff = t_sec - self.max_idle_sec
+        stale = [tid for tid, seen in self.last_seen.items() if seen < cutoff]
+        for tid in stale:
+            del self.last_seen[tid]
+            self.prev_point.pop(tid, None)
+            self.age_frames.pop(tid, None)
+            self.counted.discard(tid)
+        return len(stale)
 
-    def update(self, t_sec: float, tracked_objects: List, rule_name: str = "line_crossing") -> List[CountEvent]:
+    def update(self, t_sec: float, tracked, rule_name: str = "line_crossing") -> List[CountEvent]:
+        """One frame's tracks (a TrackBatch) in frame order -> new crossing events."""
         events: List[CountEvent] = []
 
-        for obj in tracked_objects:
-            tid = int(obj.track_id)
-            p = bottom_center(obj.xyxy)
+        if self.max_idle_sec is not None and (self._next_evict is None or t_sec >= self._next_evict):
+            self.evict(t_sec)
+            self._next_evict = t_sec + self.max_idle_sec / 4.0
+        if not len(tracked):
+            return events
+
+        for i, (tid, (x1, _, x2, y2)) in enumerate(zip(tracked.track_id.tolist(), tracked.xyxy.tolist())):
+            p = ((x1 + x2) / 2.0, y2)
 
             self.age_frames[tid] = self.age_frames.get(tid, 0) + 1
+            self.last_seen[tid] = t_sec
 
             if self.count_once_per_video and tid in self.counted:
                 self.prev_point[tid] = p
@@ -42,14 +72,39 @@ class LineCrossingCounter:
             if prev is not None:
                 if self.age_frames[tid] >= self.min_track_age_frames and crossed_line(prev, p, self.p1, self.p2):
                     self.counted.add(tid)
+                    toward_b = side_of_line(p, self.p1, self.p2) > side_of_line(prev, self.p1, self.p2)
                     events.append(CountEvent(
                         t_sec=t_sec,
                         site_id=self.site_id,
                         track_id=tid,
-                        cls_name=str(obj.cls_name),
-                        rule=rule_name
+                        cls_name=tracked.name(int(tracked.cls_id[i])),
+                        rule=rule_name,
+                        direction="A_to_B" if toward_b else "B_to_A"
                     ))
 
             self.prev_point[tid] = p
 
         return events
+
+    def snapshot(self) -> dict:
+        """Per-track state as arrays (for checkpoints); restore() reverses it."""
+        tids = list(self.age_frames)
+        return {
+            "track_id": np.array(tids, dtype=np.int64),
+            "prev_point": np.array([self.prev_point.get(t, (np.nan, np.nan)) for t in tids],
+                                   dtype=np.float64).reshape(-1, 2),
+            "age_frames": np.array([self.age_frames[t] for t in tids], dtype=np.int64),
+            "last_seen": np.array([self.last_seen.get(t, np.nan) for t in tids], dtype=np.float64),
+            "counted": np.array([t in self.counted for t in tids], dtype=bool),
+            "next_evict": self._next_evict,
+        }
+
+    def restore(self, snap: dict) -> None:
+        tids = np.asarray(snap["track_id"]).tolist()
+        self.prev_point = {t: tuple(p) for t, p in zip(tids, np.asarray(snap["prev_point"]).tolist())
+                           if p[0] == p[0]}
+        self.age_frames = dict(zip(tids, np.asarray(snap["age_frames"]).tolist()))
+        self.last_seen = {t: s for t, s in zip(tids, np.asarray(snap["last_seen"]).tolist()) if s == s}
+        self.counted = {t for t, c in zip(tids, np.asarray(snap["counted"]).tolist()) if c}
+        next_evict = float(snap["next_evict"]) if snap.get("next_evict") is not None else np.nan
+        self._next_evict = None if next_evict != next_evict else next_evict
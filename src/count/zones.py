@@ -0,0 +1,238 @@
+"""
+Multi-zone counting: many lines and polygons per site, per-direction events.
+
+Zones come from an optional `zones:` list in configs/sites.yaml; a site without
+one gets a single line zone built from its `line` / `direction` keys:
+
+    zones:
+      - id: northbound
+        line: {p1: [100, 400], p2: [600, 400]}
+        direction: A_to_B        # any | A_to_B | B_to_A
+        segment: true            # false: count crossings anywhere on the infinite line
+      - id: junction
+        polygon: [[0, 0], [200, 0], [200, 150], [0, 150]]
+        direction: in            # in | out | any
+
+Line sides follow geometry.side_of_line(p, p1, p2): side A is negative, side B
+positive. For a line drawn left to right, A is above it in the image and B below,
+so A_to_B means moving down the frame. A line in `zones:` only counts movements
+passing between p1 and p2, so several lines on one site do not fire on each
+other's extensions. The single line built from `line` / `direction` counts on
+the whole infinite line, exactly like LineCrossingCounter, so switching a site's
+direction does not change which crossings count. A polygon counts a track when its
+bottom-center enters (`in`) or leaves (`out`) the polygon between two frames.
+
+Per-track state lives in preallocated arrays indexed by a slot per track id.
+Tracks not seen for `max_idle_sec` are evicted and their slots reused, so memory
+is bounded by the number of concurrently visible vehicles, not the video length.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .counter import CountEvent
+from .geometry import bottom_centers, crossed_segments, points_in_polygons
+
+LINE_DIRECTIONS = ("any", "A_to_B", "B_to_A")
+POLYGON_DIRECTIONS = ("in", "out", "any")
+
+@dataclass
+class Zone:
+    zone_id: str
+    kind: str             # "line" | "polygon"
+    points: np.ndarray    # (2,2) for a line, (V,2) for a polygon
+    direction: str = "any"
+    segment: bool = True  # lines: only between p1 and p2 (False: the infinite line)
+
+def parse_zones(site_cfg: dict, scale: float = 1.0) -> List[Zone]:
+    specs = site_cfg.get("zones") or [{
+        "id": "line", "line": site_cfg["line"], "direction": site_cfg.get("direction", "any"), "segment": False
+    }]
+    zones: List[Zone] = []
+    for i, spec in enumerate(specs):
+        zone_id = str(spec.get("id", f"zone{i}"))
+        if "polygon" in spec:
+            pts = np.asarray(spec["polygon"], dtype=np.float64) * scale
+            direction = spec.get("direction", "in")
+            if pts.ndim != 2 or pts.shape[0] < 3:
+                raise ValueError(f"Zone '{zone_id}': polygon needs at least 3 [x, y] points")
+            if direction not in POLYGON_DIRECTIONS:
+                raise ValueError(f"Zone '{zone_id}': direction must be one of {POLYGON_DIRECTIONS}")
+            zones.append(Zone(zone_id, "polygon", pts, direction))
+        elif "line" in spec:
+            pts = np.asarray([spec["line"]["p1"], spec["line"]["p2"]], dtype=np.float64) * scale
+            direction = spec.get("direction", "any")
+            if direction not in LINE_DIRECTIONS:
+                raise ValueError(f"Zone '{zone_id}': direction must be one of {LINE_DIRECTIONS}")
+            zones.append(Zone(zone_id, "line", pts, direction, bool(spec.get("segment", True))))
+        else:
+            raise ValueError(f"Zone '{zone_id}' needs a 'line' or 'polygon'")
+    return zones
+
+class ZoneCounter:
+    def __init__(self, site_id: str, zones: List[Zone], min_track_age_frames: int = 3,
+                 count_once_per_video: bool = True, max_idle_sec: Optional[float] = 60.0,
+                 capacity: int = 64):
+        self.site_id = site_id
+        self.zones = zones
+        self.min_track_age_frames = min_track_age_frames
+        self.count_once_per_video = count_once_per_video
+        self.max_idle_sec = max_idle_sec
+
+        self._lines = [z for z in zones if z.kind == "line"]
+        self._polys = [z for z in zones if z.kind == "polygon"]
+        self._line_a = np.array([z.points[0] for z in self._lines], dtype=np.float64).reshape(-1, 2)
+        self._line_b = np.array([z.points[1] for z in self._lines], dtype=np.float64).reshape(-1, 2)
+        self._line_dir = np.array([{"any": 0, "A_to_B": 1, "B_to_A": -1}[z.direction] for z in self._lines])
+        self._line_segment = np.array([z.segment for z in self._lines], dtype=bool)
+        if self._polys:
+            self._edge_a = np.concatenate([z.points for z in self._polys])
+            self._edge_b = np.concatenate([np.roll(z.points, -1, axis=0) for z in self._polys])
+            self._edge_starts = np.cumsum([0] + [len(z.points) for z in self._polys[:-1]])
+        self._poly_dir = [z.direction for z in self._polys]
+
+        # per-track state, one row per slot
+        self._slot: Dict[int, int] = {}
+        self._free: List[int] = []
+        self._track_id = np.zeros(0, dtype=np.int64)
+        self._prev_xy = np.zeros((0, 2), dtype=np.float64)
+        self._age = np.zeros(0, dtype=np.int32)
+        self._last_seen = np.zeros(0, dtype=np.float64)
+        self._counted = np.zeros((0, len(zones)), dtype=bool)   # line zones first, then polygons
+        self._inside = np.zeros((0, len(self._polys)), dtype=bool)
+        self._grow(capacity)
+        self._next_evict = None
+
+    @property
+    def active_tracks(self) -> int:
+        return len(self._slot)
+
+    def _grow(self, capacity: int) -> None:
+        old = len(self._age)
+        extra = capacity - old
+        self._track_id = np.concatenate([self._track_id, np.full(extra, -1, dtype=np.int64)])
+        self._prev_xy = np.concatenate([self._prev_xy, np.zeros((extra, 2))])
+        self._age = np.concatenate([self._age, np.zeros(extra, dtype=np.int32)])
+        self._last_seen = np.concatenate([self._last_seen, np.zeros(extra)])
+        self._counted = np.concatenate([self._counted, np.zeros((extra, self._counted.shape[1]), dtype=bool)])
+        self._inside = np.concatenate([self._inside, np.zeros((extra, self._inside.shape[1]), dtype=bool)])
+        self._free.extend(range(capacity - 1, old - 1, -1))
+
+    def _slots_for(self, track_ids) -> tuple:
+        slots = np.empty(len(track_ids), dtype=np.int64)
+        is_new = np.zeros(len(track_ids), dtype=bool)
+        for i, tid in enumerate(track_ids):
+            s = self._slot.get(tid)
+            if s is None:
+                if not self._free:
+                    self._grow(2 * len(self._age))
+                s = self._free.pop()
+                self._slot[tid] = s
+                self._track_id[s] = tid
+                self._age[s] = 0
+                self._counted[s] = False
+                self._inside[s] = False
+                is_new[i] = True
+            slots[i] = s
+        return slots, is_new
+
+    def evict(self, t_sec: float) -> int:
+        """Drop tracks unseen for more than max_idle_sec; returns how many were dropped."""
+        if self.max_idle_sec is None or not self._slot:
+            return 0
+        live = np.fromiter(self._slot.values(), dtype=np.int64, count=len(self._slot))
+        stale = live[self._last_seen[live] < t_sec - self.max_idle_sec]
+        for s in stale.tolist():
+            del self._slot[int(self._track_id[s])]
+            self._track_id[s] = -1
+            self._free.append(s)
+        return len(stale)
+
+    def update(self, t_sec: float, tracked, rule_name: Optional[str] = None) -> List[CountEvent]:
+        events: List[CountEvent] = []
+        if self.max_idle_sec is not None:
+            if self._next_evict is None or t_sec >= self._next_evict:
+                self.evict(t_sec)
+                self._next_evict = t_sec + self.max_idle_sec / 4.0
+        if not len(tracked):
+            return events
+
+        ids = tracked.track_id.tolist()
+        xy = bottom_centers(tracked.xyxy)
+        slots, is_new = self._slots_for(ids)
+
+        self._age[slots] += 1
+        eligible = (~is_new) & (self._age[slots] >= self.min_track_age_frames)
+        prev = self._prev_xy[slots]
+        n_lines = len(self._lines)
+
+        hits = []  # (object index, zone column, direction label, rule)
+        if n_lines:
+            crossed, toward_b = crossed_segments(prev, xy, self._line_a, self._line_b, self._line_segment)
+            wanted = (self._line_dir[None, :] == 0) | \
+                     ((self._line_dir[None, :] == 1) & toward_b) | ((self._line_dir[None, :] == -1) & ~toward_b)
+            fire = crossed & wanted & eligible[:, None]
+            if self.count_once_per_video:
+                fire &= ~self._counted[slots, :n_lines]
+            for i, z in zip(*np.nonzero(fire)):
+                hits.append((i, z, "A_to_B" if toward_b[i, z] else "B_to_A", "line_crossing"))
+
+        if self._polys:
+            inside = points_in_polygons(xy, self._edge_a, self._edge_b, self._edge_starts)
+            was_inside = self._inside[slots]
+            entered = inside & ~was_inside
+            left = ~inside & was_inside
+            for k, direction in enumerate(self._poly_dir):
+                trans = entered[:, k] if direction == "in" else left[:, k] if direction == "out" \
+                    else entered[:, k] | left[:, k]
+                fire = trans & eligible
+                if self.count_once_per_video:
+                    fire &= ~self._counted[slots, n_lines + k]
+                for i in np.nonzero(fire)[0]:
+                    hits.append((i, n_lines + k, "in" if entered[i, k] else "out", "roi_entry"))
+            self._inside[slots] = inside
+
+        for i, z, direction, rule in hits:
+            self._counted[slots[i], z] = True
+            zone = self._lines[z] if z < n_lines else self._polys[z - n_lines]
+            events.append(CountEvent(
+                t_sec=t_sec,
+                site_id=self.site_id,
+                track_id=ids[i],
+                cls_name=tracked.name(int(tracked.cls_id[i])),
+                rule=rule,
+                zone_id=zone.zone_id,
+                direction=direction
+            ))
+
+        self._prev_xy[slots] = xy
+        self._last_seen[slots] = t_sec
+        return events
+
+    def snapshot(self) -> dict:
+        """Per-track state as arrays (for checkpoints); restore() reverses it."""
+        return {
+            "track_id": self._track_id.copy(),
+            "prev_xy": self._prev_xy.copy(),
+            "age": self._age.copy(),
+            "last_seen": self._last_seen.copy(),
+            "counted": self._counted.copy(),
+            "inside": self._inside.copy(),
+            "free": np.array(self._free, dtype=np.int64),
+            "next_evict": self._next_evict,
+        }
+
+    def restore(self, snap: dict) -> None:
+        self._track_id = np.array(snap["track_id"], dtype=np.int64)
+        self._prev_xy = np.array(snap["prev_xy"], dtype=np.float64).reshape(-1, 2)
+        self._age = np.array(snap["age"], dtype=np.int32)
+        self._last_seen = np.array(snap["last_seen"], dtype=np.float64)
+        self._counted = np.array(snap["counted"], dtype=bool).reshape(len(self._age), len(self.zones))
+        self._inside = np.array(snap["inside"], dtype=bool).reshape(len(self._age), len(self._polys))
+        self._free = np.asarray(snap["free"]).tolist()
+        live = np.flatnonzero(self._track_id != -1)
+        self._slot = dict(zip(self._track_id[live].tolist(), live.tolist()))
+        next_evict = float(snap["next_evict"]) if snap.get("next_evict") is not None else np.nan
+        self._next_evict = None if next_evict != next_evict else next_evict
@@ -0,0 +1,170 @@
+"""
+Inference backends for the YOLO model: torch, onnxruntime, openvino.
+
+    detector:
+      model: "yolov8n.pt"
+      backend: "onnxruntime"   # torch | onnxruntime | openvino
+      precision: "int8"        # fp32 | int8 (onnxruntime / openvino only)
+
+Non-torch backends export the .pt weights once and keep the result in
+`export_dir`, in a folder named after the weights hash, backend, precision and
+imgsz, so later runs load it directly. The exported model is loaded back
+through Ultralytics, so predict()/track() and therefore Detection and
+TrackedObject output are the same for every backend.
+
+INT8:
+- onnxruntime: static QDQ quantization calibrated on frames sampled from
+  `calibration_video` (use a typical clip of the site); without one, dynamic
+  (weight-only) quantization is used.
+- openvino: NNCF post-training quantization through the Ultralytics exporter;
+  `calibration_data` is its dataset yaml (Ultralytics default if null).
+- torch: not supported; the PyTorch CPU int8 path does not cover YOLO's conv
+  layers, so it is rejected instead of silently running fp32.
+"""
+from __future__ import annotations
+import os
+import shutil
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.utils.hashing import file_sha256
+
+BACKENDS = ("torch", "onnxruntime", "openvino")
+PRECISIONS = ("fp32", "int8")
+
+def backend_options(det_cfg: dict) -> Dict:
+    """Backend keyword arguments for YoloDetector / UltralyticsByteTracker from the detector: section."""
+    return dict(
+        backend=det_cfg.get("backend", "torch"),
+        precision=det_cfg.get("precision", "fp32"),
+        export_dir=det_cfg.get("export_dir", "models/exported"),
+        calibration_video=det_cfg.get("calibration_video"),
+        calibration_data=det_cfg.get("calibration_data"),
+    )
+
+def export_name(model_name: str, backend: str, precision: str, imgsz: int) -> str:
+    stem = os.path.splitext(os.path.basename(model_name))[0]
+    tag = file_sha256(model_name)[:12] if os.path.isfile(model_name) else "name"
+    return f"{stem}-{tag}-{backend}-{precision}-{imgsz}"
+
+def resolve_weights(model_name: str, imgsz: int, backend: str = "torch", precision: str = "fp32",
+                    export_dir: str = "models/exported", calibration_video: Optional[str] = None,
+                    calibration_data: Optional[str] = None) -> str:
+    """Path of the weights to load for this backend, exporting them on first use."""
+    if backend not in BACKENDS:
+        raise ValueError(f"detector.backend must be one of {BACKENDS}, got '{backend}'")
+    if precision not in PRECISIONS:
+        raise ValueError(f"detector.precision must be one of {PRECISIONS}, got '{precision}'")
+    if backend == "torch":
+        if precision != "fp32":
+            raise ValueError("INT8 needs backend onnxruntime or openvino; torch runs fp32 only")
+        return model_name
+
+    if not os.path.isfile(model_name):
+        # hub names ("yolov8n.pt") are downloaded on first load; key the export by the real file
+        from ultralytics import YOLO
+        model_name = str(getattr(YOLO(model_name), "ckpt_path", None) or model_name)
+    target = os.path.join(export_dir, export_name(model_name, backend, precision, imgsz))
+    if backend == "onnxruntime":
+        path = os.path.join(target, "model.onnx")
+        if not os.path.isfile(path):
+            _export_onnx(model_name, imgsz, precision, target, calibration_video)
+        return path
+
+    if not os.path.isdir(target):
+        _export_openvino(model_name, imgsz, precision, target, calibration_data)
+    return target
+
+def load_yolo(model_name: str, imgsz: int, backend: str = "torch", precision: str = "fp32", **export_opts):
+    from ultralytics import YOLO
+    weights = resolve_weights(model_name, imgsz, backend, precision, **export_opts)
+    # exported models carry no task hint in their file name
+    return YOLO(weights) if backend == "torch" else YOLO(weights, task="detect")
+
+# --- export ---
+def _export(model_name: str, imgsz: int, fmt: str, **kw) -> str:
+    from ultralytics import YOLO
+    # dynamic axes so batched inference (detector.batch_size > 1) works on the exported model
+    return str(YOLO(model_name).export(format=fmt, imgsz=imgsz, dynamic=True, **kw))
+
+def _move_into(src: str, target: str, name: Optional[str] = None) -> None:
+    tmp = target + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    if name is None:
+        shutil.move(src, tmp)
+    else:
+        os.makedirs(tmp)
+        shutil.move(src, os.path.join(tmp, name))
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+
+def _export_onnx(model_name: str, imgsz: int, precision: str, target: str,
+                 calibration_video: Optional[str]) -> None:
+    print(f"⏳ Exporting {model_name} to ONNX ({precision}, imgsz={imgsz}) -> {target}")
+    onnx_fp32 = _export(model_name, imgsz, "onnx", simplify=True)
+    if precision == "int8":
+        quantized = os.path.splitext(onnx_fp32)[0] + ".int8.onnx"
+        quantize_onnx(onnx_fp32, quantized, imgsz, calibration_video)
+        os.remove(onnx_fp32)
+        onnx_fp32 = quantized
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    _move_into(onnx_fp32, target, "model.onnx")
+
+def _export_openvino(model_name: str, imgsz: int, precision: str, target: str,
+                     calibration_data: Optional[str]) -> None:
+    print(f"⏳ Exporting {model_name} to OpenVINO ({precision}, imgsz={imgsz}) -> {target}")
+    kw = {"int8": precision == "int8"}
+    if precision == "int8" and calibration_data:
+        kw["data"] = calibration_data
+    out_dir = _export(model_name, imgsz, "openvino", **kw)
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    _move_into(out_dir, target)
+
+# --- onnxruntime int8 ---
+def letterbox_tensor(frame_bgr, imgsz: int) -> np.ndarray:
+    """Ultralytics-style letterbox to imgsz x imgsz as a 1x3xHxW float32 RGB tensor in [0, 1]."""
+    import cv2
+    h, w = frame_bgr.shape[:2]
+    r = min(imgsz / h, imgsz / w)
+    nh, nw = int(round(h * r)), int(round(w * r))
+    img = cv2.resize(frame_bgr, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    top, left = (imgsz - nh) // 2, (imgsz - nw) // 2
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    canvas[top:top + nh, left:left + nw] = img
+    return np.ascontiguousarray(canvas[:, :, ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+def calibration_frames(video_path: str, imgsz: int, n: int = 64) -> List[np.ndarray]:
+    """n frames spread evenly over the video, preprocessed like the model input."""
+    from src.ingest.video_reader import probe_video, iter_video_frames
+    probe = probe_video(video_path)
+    total = max(1, probe["total_frames"])
+    fps_infer = max(probe["src_fps"] * min(1.0, n / float(total)), 1e-3)
+    frame_iter, _ = iter_video_frames(video_path, fps_infer=fps_infer, decode_mode="grab")
+    return [letterbox_tensor(pkt.frame_bgr, imgsz) for _, pkt in zip(range(n), frame_iter)]
+
+def quantize_onnx(src: str, dst: str, imgsz: int, calibration_video: Optional[str] = None) -> None:
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+    if not calibration_video:
+        print("⚠️  No detector.calibration_video; using dynamic (weight-only) INT8 quantization")
+        quantize_dynamic(src, dst, weight_type=QuantType.QUInt8)
+        return
+
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationDataReader
+
+    input_name = ort.InferenceSession(src, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    frames = calibration_frames(calibration_video, imgsz)
+    if not frames:
+        raise RuntimeError(f"No calibration frames read from {calibration_video}")
+
+    class _Reader(CalibrationDataReader):
+        def __init__(self):
+            self._it = iter(frames)
+
+        def get_next(self):
+            x = next(self._it, None)
+            return None if x is None else {input_name: x}
+
+    quantize_static(src, dst, _Reader(), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, per_channel=True)
@@ -0,0 +1,150 @@
+"""
+Region-of-interest cropping and a motion gate in front of the detector.
+
+ROI: only the area around the counting line matters, so frames are cropped
+before detection and boxes are shifted back to full-frame coordinates. A site
+can set `roi: [x1, y1, x2, y2]` in configs/sites.yaml (source pixels);
+otherwise the ROI is the bounding box of its line (or zones) padded by
+`roi.pad_px`. The detector imgsz is scaled down with the crop so objects keep
+the pixel size they had in the full frame and the model sees fewer pixels.
+
+Motion gate: the ROI of each sampled frame is compared with the previous one
+(grayscale, downscaled, absolute difference). When fewer than `min_area_frac`
+of its pixels changed by more than `threshold`, the frame skips inference and
+the tracker gets an empty frame (the native tracker still Kalman-predicts its
+tracks; Ultralytics' tracker just holds them). Inference is forced at least
+every `max_skip_frames` frames so tracks of vehicles waiting in the ROI stay
+alive; keep it below the tracker's track_buffer.
+"""
+from __future__ import annotations
+import dataclasses
+import math
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+@dataclasses.dataclass(frozen=True)
+class RegionOfInterest:
+    x1: int
+    y1: int
+    x2: int
+    y2: int
+
+    @property
+    def width(self) -> int:
+        return self.x2 - self.x1
+
+    @property
+    def height(self) -> int:
+        return self.y2 - self.y1
+
+    def crop(self, frame):
+        return frame[self.y1:self.y2, self.x1:self.x2]
+
+    def scaled(self, scale: float, frame_w: int, frame_h: int) -> "RegionOfInterest":
+        """Same region after a decode-time resize, clipped to the decoded frame."""
+        return RegionOfInterest(max(0, int(math.floor(self.x1 * scale))), max(0, int(math.floor(self.y1 * scale))),
+                                min(frame_w, int(math.ceil(self.x2 * scale))),
+                                min(frame_h, int(math.ceil(self.y2 * scale))))
+
+    def as_list(self) -> List[int]:
+        return [self.x1, self.y1, self.x2, self.y2]
+
+def site_roi(site_cfg: dict, width: int, height: int, pad_px: float = 150.0) -> RegionOfInterest:
+    """ROI in source pixels: the site's `roi`, else its line/zone extent padded by pad_px."""
+    if site_cfg.get("roi"):
+        x1, y1, x2, y2 = (float(v) for v in site_cfg["roi"])
+    else:
+        pts = []
+        for spec in site_cfg.get("zones") or [{"line": site_cfg["line"]}]:
+            if "polygon" in spec:
+                pts.extend(spec["polygon"])
+            else:
+                pts.extend([spec["line"]["p1"], spec["line"]["p2"]])
+        pts = np.asarray(pts, dtype=np.float64)
+        (x1, y1), (x2, y2) = pts.min(axis=0) - pad_px, pts.max(axis=0) + pad_px
+    roi = RegionOfInterest(max(0, int(x1)), max(0, int(y1)), min(width, int(math.ceil(x2))),
+                           min(height, int(math.ceil(y2))))
+    if roi.width < 32 or roi.height < 32:
+        raise ValueError(f"ROI {roi.as_list()} for site '{site_cfg.get('site_id')}' is empty or too small")
+    return roi
+
+def roi_imgsz(imgsz: int, roi: RegionOfInterest, frame_w: int, frame_h: int, stride: int = 32) -> int:
+    """Detector imgsz for the crop that keeps the full-frame pixel scale."""
+    scale = imgsz / float(max(frame_w, frame_h))
+    return max(stride, int(math.ceil(max(roi.width, roi.height) * scale / stride)) * stride)
+
+def shift_tracked(tracked, dx: int, dy: int):
+    return tracked.shifted(dx, dy)
+
+def shift_arrays(dets: Tuple, dx: int, dy: int) -> Tuple:
+    xyxy, conf, cls = dets
+    return xyxy + np.array([dx, dy, dx, dy], dtype=xyxy.dtype), conf, cls
+
+class MotionGate:
+    def __init__(self, threshold: float = 25.0, min_area_frac: float = 0.002, downscale: int = 4,
+                 max_skip_frames: int = 10):
+        self.threshold = threshold
+        self.min_area_frac = min_area_frac
+        self.downscale = max(1, int(downscale))
+        self.max_skip_frames = int(max_skip_frames)
+        self._prev: Optional[np.ndarray] = None
+        self._skipped_run = 0
+        self.frames_checked = 0
+        self.frames_skipped = 0
+        self.frames_forced = 0
+
+    def _small_gray(self, img) -> np.ndarray:
+        h, w = img.shape[:2]
+        small = cv2.resize(img, (max(1, w // self.downscale), max(1, h // self.downscale)),
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def check(self, img) -> bool:
+        """True when the frame should go through the detector."""
+        self.frames_checked += 1
+        gray = self._small_gray(img)
+        prev, self._prev = self._prev, gray
+        if prev is None or prev.shape != gray.shape:
+            self._skipped_run = 0
+            return True
+        moving = np.count_nonzero(cv2.absdiff(gray, prev) > self.threshold)
+        if moving >= self.min_area_frac * gray.size:
+            self._skipped_run = 0
+            return True
+        if self._skipped_run >= self.max_skip_frames:
+            self._skipped_run = 0
+            self.frames_forced += 1
+            return True
+        self._skipped_run += 1
+        self.frames_skipped += 1
+        return False
+
+    def snapshot(self) -> dict:
+        """Frame-to-frame state (for checkpoints); the counters in stats() stay per run."""
+        return {"prev": self._prev.copy() if self._prev is not None else None, "skipped_run": self._skipped_run}
+
+    def restore(self, snap: dict) -> None:
+        prev = snap.get("prev")
+        prev = None if prev is None else np.asarray(prev)
+        self._prev = prev if prev is not None and prev.ndim == 2 else None
+        self._skipped_run = int(snap["skipped_run"])
+
+    def stats(self) -> dict:
+        return {
+            "frames_checked": self.frames_checked,
+            "frames_skipped": self.frames_skipped,
+            "frames_forced": self.frames_forced,
+            "skip_rate": round(self.frames_skipped / self.frames_checked, 4) if self.frames_checked else 0.0,
+        }
+
+def build_motion_gate(cfg: dict) -> Optional[MotionGate]:
+    gate_cfg = cfg.get("motion_gate", {})
+    if not gate_cfg.get("enabled", False):
+        return None
+    return MotionGate(threshold=float(gate_cfg.get("threshold", 25)),
+                      min_area_frac=float(gate_cfg.get("min_area_frac", 0.002)),
+                      downscale=int(gate_cfg.get("downscale", 4)),
+                      max_skip_frames=int(gate_cfg.get("max_skip_frames", 10)))
@@ -1,42 +1,48 @@
 """YOLO detection module."""
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import List, Dict, Tuple
+from typing import List, Sequence, Tuple
 import numpy as np
 
-@dataclass
 class Detection:
-    xyxy: Tuple[float, float, float, float]
-    conf: float
-    cls_id: int
-    cls_name: str
+    __slots__ = ("xyxy", "conf", "cls_id", "cls_name")
+
+    def __init__(self, xyxy: Tuple[float, float, float, float], conf: float, cls_id: int, cls_name: str):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls_id = cls_id
+        self.cls_name = cls_name
 
 class YoloDetector:
-    def __init__(self, model_name: str, conf: float, iou: float, imgsz: int):
-        from ultralytics import YOLO
-        self.model = YOLO(model_name)
+    def __init__(self, model_name: str, conf: float, iou: float, imgsz: int,
+                 backend: str = "torch", precision: str = "fp32", **export_opts):
+        from .backends import load_yolo
+        self.model = load_yolo(model_name, imgsz, backend, precision, **export_opts)
         self.conf = conf
         self.iou = iou
         self.imgsz = imgsz
         self.names = self.model.names  # dict id->name
 
     def detect(self, frame_bgr) -> List[Detection]:
+        """One frame as Detection records; the pipeline uses detect_arrays()."""
+        xyxy, confs, clss = self.detect_arrays([frame_bgr])[0]
+        names = self.names
+        return [Detection(tuple(box), c, k, str(names[k]))
+                for box, c, k in zip(xyxy.tolist(), confs.tolist(), clss.tolist())]
+
+    def detect_arrays(self, frames_bgr: Sequence) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Per frame (xyxy (N,4), conf (N,), cls_id (N,)); several frames go through one predict call."""
+        frames_bgr = list(frames_bgr)
+        if not frames_bgr:
+            return []
         # Ultralytics expects BGR ok with OpenCV arrays
-        res = self.model.predict(frame_bgr, conf=self.conf, iou=self.iou, imgsz=self.imgsz, verbose=False)[0]
-        dets: List[Detection] = []
-        if res.boxes is None:
-            return dets
+        results = self.model.predict(frames_bgr if len(frames_bgr) > 1 else frames_bgr[0],
+                                     conf=self.conf, iou=self.iou, imgsz=self.imgsz, verbose=False)
+        return [self._to_arrays(res) for res in results]
 
+    @staticmethod
+    def _to_arrays(res) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if res.boxes is None:
+            return np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
         boxes = res.boxes
-        xyxy = boxes.xyxy.cpu().numpy()
-        confs = boxes.conf.cpu().numpy()
-        clss = boxes.cls.cpu().numpy().astype(int)
-
-        for (x1, y1, x2, y2), c, k in zip(xyxy, confs, clss):
-            dets.append(Detection(
-                xyxy=(float(x1), float(y1), float(x2), float(y2)),
-                conf=float(c),
-                cls_id=int(k),
-                cls_name=str(self.names[int(k)])
-            ))
-        return dets
+        return (boxes.xyxy.cpu().numpy().reshape(-1, 4), boxes.conf.cpu().numpy().reshape(-1),
+                boxes.cls.cpu().numpy().astype(np.int64).reshape(-1))
@@ -0,0 +1,198 @@
+"""
+Annotated video output on a background thread.
+
+The count stage hands each frame and its tracks (as compact arrays) to
+AnnotationSink.submit(), which only enqueues. A worker thread downscales,
+draws overlays in place (the frame is not used after counting, so it is not
+copied) and encodes, either with cv2.VideoWriter or by piping raw frames to
+an external ffmpeg:
+
+    output:
+      annotated_scale: 0.5          # downscale before drawing / encoding
+      annotated_fps: 5              # keep every round(fps_infer / annotated_fps)-th frame
+      annotated_encoder: "ffmpeg"   # opencv | ffmpeg
+      ffmpeg: {bin: ffmpeg, codec: libx264, preset: veryfast, crf: 26}
+
+With `annotated_mode: deferred` nothing is drawn during the run; the video is
+rendered afterwards from the track cache (python -m src.tools.render_annotated).
+"""
+from __future__ import annotations
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .video_annotator import draw_roi, draw_track_arrays, draw_zones
+
+_END = object()
+
+def track_arrays(tracked) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """TrackBatch -> (ids (K,), xyxy (K,4) float32, labels)."""
+    return tracked.track_id, tracked.xyxy.astype(np.float32), tracked.cls_names
+
+class _OpenCvEncoder:
+    def __init__(self, path: str, fps: float, size: Tuple[int, int]):
+        self._writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+        if not self._writer.isOpened():
+            raise RuntimeError(f"Cannot open video writer: {path}")
+
+    def write(self, frame) -> None:
+        self._writer.write(frame)
+
+    def close(self) -> None:
+        self._writer.release()
+
+class _FfmpegEncoder:
+    def __init__(self, path: str, fps: float, size: Tuple[int, int], bin: str = "ffmpeg",
+                 codec: str = "libx264", preset: str = "veryfast", crf: int = 26,
+                 extra_args: Sequence[str] = ()):
+        cmd = [bin, "-y", "-loglevel", "error",
+               "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{size[0]}x{size[1]}", "-r", f"{fps:.6g}", "-i", "-",
+               "-c:v", codec, "-preset", str(preset), "-crf", str(crf), "-pix_fmt", "yuv420p",
+               *extra_args, path]
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def write(self, frame) -> None:
+        try:
+            self._proc.stdin.write(np.ascontiguousarray(frame).data)
+        except BrokenPipeError:
+            raise RuntimeError(f"ffmpeg exited: {self._proc.stderr.read().decode(errors='replace').strip()}")
+
+    def close(self) -> None:
+        try:
+            self._proc.stdin.close()
+        except BrokenPipeError:  # ffmpeg already exited; its exit code and stderr say why
+            pass
+        if self._proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed: {self._proc.stderr.read().decode(errors='replace').strip()}")
+
+class AnnotationSink:
+    def __init__(self, path: str, frame_size: Tuple[int, int], in_fps: float, zones: List = (),
+                 roi=None, scale: float = 1.0, every_n: int = 1, encoder: str = "opencv",
+                 ffmpeg: Optional[Dict] = None, queue_size: int = 8, drop_when_full: bool = False):
+        """
+        frame_size: (w, h) of the frames passed to submit(); in_fps: their rate.
+        zones / roi: in submitted-frame pixels (scaled here with the output).
+        """
+        self.path = path
+        self.scale = float(scale)
+        self.every_n = max(1, int(every_n))
+        self.size = (max(2, int(round(frame_size[0] * self.scale)) // 2 * 2),
+                     max(2, int(round(frame_size[1] * self.scale)) // 2 * 2))
+        self.fps = float(in_fps) / self.every_n
+        self.zones = [_scaled_zone(z, self.scale) for z in zones]
+        self.roi = roi.scaled(self.scale, *self.size) if roi is not None else None
+        self.drop_when_full = drop_when_full
+
+        self.encoder_name = encoder
+        if encoder == "ffmpeg" and shutil.which((ffmpeg or {}).get("bin", "ffmpeg")) is None:
+            print("⚠️  ffmpeg not found; writing the annotated video with OpenCV")
+            self.encoder_name = "opencv"
+        self._ffmpeg = ffmpeg or {}
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+        self._seen = 0
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.draw_sec = 0.0
+        self.encode_sec = 0.0
+
+    def start(self) -> "AnnotationSink":
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if self.encoder_name == "ffmpeg":
+            self._encoder = _FfmpegEncoder(self.path, self.fps, self.size, **self._ffmpeg)
+        else:
+            self._encoder = _OpenCvEncoder(self.path, self.fps, self.size)
+        self._thread = threading.Thread(target=self._work, name="annotate", daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, frame, tracked) -> bool:
+        """Queue a frame (given up by the caller) with its TrackBatch; False if skipped or dropped."""
+        if self._error is not None:
+            raise RuntimeError(f"Annotation sink failed: {self._error}") from self._error
+        self._seen += 1
+        if (self._seen - 1) % self.every_n:
+            return False
+        item = (frame, track_arrays(tracked))
+        if self.drop_when_full:
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                self.frames_dropped += 1
+                return False
+        else:
+            self._queue.put(item)
+        return True
+
+    def close(self) -> dict:
+        if self._thread is not None:
+            self._queue.put(_END)
+            self._thread.join()
+            self._thread = None
+            try:
+                self._encoder.close()
+            except Exception:
+                if self._error is None:
+                    raise
+                # the worker's error comes first; the encoder failing to close follows from it
+        if self._error is not None:
+            raise RuntimeError(f"Annotation sink failed: {self._error}") from self._error
+        return self.stats()
+
+    def stats(self) -> dict:
+        return {"path": os.path.abspath(self.path), "encoder": self.encoder_name, "fps": round(self.fps, 3),
+                "size": list(self.size), "frames_written": self.frames_written,
+                "frames_dropped": self.frames_dropped, "draw_sec": round(self.draw_sec, 4),
+                "encode_sec": round(self.encode_sec, 4)}
+
+    def _work(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                return
+            if self._error is not None:
+                continue  # keep draining so submit() never blocks on a dead worker
+            try:
+                t0 = time.perf_counter()
+                frame, (ids, xyxy, labels) = item
+                if self.scale != 1.0 or (frame.shape[1], frame.shape[0]) != self.size:
+                    frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+                draw_zones(frame, self.zones)
+                if self.roi is not None:
+                    draw_roi(frame, self.roi)
+                draw_track_arrays(frame, ids, xyxy, labels, self.scale)
+                t1 = time.perf_counter()
+                self._encoder.write(frame)
+                self.draw_sec += t1 - t0
+                self.encode_sec += time.perf_counter() - t1
+                self.frames_written += 1
+            except BaseException as e:  # surfaced on the next submit()/close()
+                self._error = e
+
+def _scaled_zone(zone, scale: float):
+    if scale == 1.0:
+        return zone
+    import dataclasses
+    return dataclasses.replace(zone, points=np.asarray(zone.points) * scale)
+
+def build_annotation_sink(path: str, out_cfg: dict, frame_size: Tuple[int, int], fps_in: float,
+                          zones: List = (), roi=None) -> AnnotationSink:
+    target_fps = out_cfg.get("annotated_fps")
+    every_n = max(1, int(round(fps_in / float(target_fps)))) if target_fps else 1
+    return AnnotationSink(
+        path, frame_size, fps_in, zones=zones, roi=roi,
+        scale=float(out_cfg.get("annotated_scale", 1.0)),
+        every_n=every_n,
+        encoder=out_cfg.get("annotated_encoder", "opencv"),
+        ffmpeg=out_cfg.get("ffmpeg"),
+        queue_size=int(out_cfg.get("annotated_queue_size", 8)),
+        drop_when_full=bool(out_cfg.get("annotated_drop_when_full", False)),
+    )
@@ -1,8 +1,42 @@
 """CSV export functionality."""
 from __future__ import annotations
-import pandas as pd
+import csv
 import os
+from typing import TYPE_CHECKING, Dict, Iterable, List, Sequence
+
+if TYPE_CHECKING:  # pandas is only needed by callers that pass DataFrames
+    import pandas as pd
 
 def write_csv(df: pd.DataFrame, path: str) -> None:
     os.makedirs(os.path.dirname(path), exist_ok=True)
     df.to_csv(path, index=False)
+
+class CsvRowAppender:
+    """Streams rows into a CSV as they become available (header written on open)."""
+
+    def __init__(self, path: str, columns: Sequence[str]):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.columns = list(columns)
+        self.rows_written = 0
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerow(self.columns)
+
+    def write(self, rows: List[Dict]) -> None:
+        if not rows:
+            return
+        with open(self.path, "a", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=self.columns, extrasaction="ignore")
+            w.writerows(rows)
+        self.rows_written += len(rows)
+
+def write_csv_chunks(chunks: Iterable[pd.DataFrame], path: str, columns: Sequence[str]) -> int:
+    """Write DataFrames one after another under a single header; returns rows written."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    rows = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerow(list(columns))
+        for df in chunks:
+            df.to_csv(f, index=False, header=False, columns=list(columns))
+            rows += len(df)
+    return rows
@@ -2,7 +2,39 @@
 from __future__ import annotations
 import pandas as pd
 import os
+from typing import Iterable, Sequence
+
+XLSX_MAX_ROWS = 1048576
 
 def write_xlsx(df: pd.DataFrame, path: str) -> None:
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    df.to_excel(path, index=False, engine="openpyxl")
+    write_xlsx_chunks([df], path, df.columns, sheet_name="Sheet1")
+
+def write_xlsx_chunks(chunks: Iterable[pd.DataFrame], path: str, columns: Sequence[str],
+                      sheet_name: str = "counts") -> int:
+    """
+    Stream DataFrames into a workbook with openpyxl's write-only mode (rows are
+    not kept in memory). Continues on a new sheet past Excel's row limit.
+    Returns rows written.
+    """
+    from openpyxl import Workbook
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    wb = Workbook(write_only=True)
+    columns = list(columns)
+    ws, sheet_rows, sheets, rows = None, XLSX_MAX_ROWS, 0, 0
+    for df in chunks:
+        for rec in df[columns].itertuples(index=False, name=None):
+            if sheet_rows >= XLSX_MAX_ROWS:
+                sheets += 1
+                ws = wb.create_sheet(sheet_name if sheets == 1 else f"{sheet_name}_{sheets}")
+                ws.append(columns)
+                sheet_rows = 1
+            ws.append([v.item() if hasattr(v, "item") else v for v in rec])
+            sheet_rows += 1
+            rows += 1
+    if ws is None:
+        wb.create_sheet(sheet_name).append(columns)
+    tmp = path + ".tmp"
+    wb.save(tmp)
+    os.replace(tmp, path)
+    return rows
@@ -11,3 +11,25 @@ def draw_tracks(frame, tracked_objects):
         cv2.rectangle(frame, (x1,y1), (x2,y2), (0,255,0), 2)
         cv2.putText(frame, f"{o.cls_name} #{o.track_id}", (x1, max(0,y1-5)),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,255,0), 2)
+
+def draw_zones(frame, zones):
+    import numpy as np
+    for z in zones:
+        pts = np.asarray(z.points, dtype=np.int32)
+        if z.kind == "line":
+            draw_line(frame, pts[0], pts[1])
+        else:
+            cv2.polylines(frame, [pts.reshape(-1, 1, 2)], True, (0,255,255), 2)
+        cv2.putText(frame, f"{z.zone_id} ({z.direction})", tuple(int(v) for v in pts[0]),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,255,255), 1)
+
+def draw_roi(frame, roi):
+    cv2.rectangle(frame, (roi.x1, roi.y1), (roi.x2 - 1, roi.y2 - 1), (255,128,0), 1)
+
+def draw_track_arrays(frame, track_ids, xyxy, labels, scale: float = 1.0):
+    """draw_tracks from compact arrays (ids (K,), boxes (K,4) in pre-scale pixels, label strings)."""
+    for tid, (x1, y1, x2, y2), label in zip(track_ids, xyxy * scale, labels):
+        x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+        cv2.rectangle(frame, (x1,y1), (x2,y2), (0,255,0), 2)
+        cv2.putText(frame, f"{label} #{tid}", (x1, max(0,y1-5)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0,255,0), 2)
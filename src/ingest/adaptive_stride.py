@@ -0,0 +1,150 @@
+"""
+Adaptive sampling rate: infer often while vehicles approach the counting line,
+rarely while the scene is empty.
+
+The count stage reports every processed frame's tracks to observe(); the
+reader asks the controller for the step to the next frame. The rate needed
+for each track is the larger of
+
+- association: the box may move at most `max_move_frac` of its width between
+  samples, so IoU matching keeps the same track id;
+- crossing: a track expected to reach a counting line within `lookahead_sec`
+  (or with unknown speed, i.e. just appeared) gets `max_fps`;
+- confirmation: while the tracker holds unconfirmed tracks (a vehicle seen
+  once), `max_fps`: at `min_fps` it would have moved off its first box by the
+  next sample, and the track would never be confirmed or counted;
+
+and the frame rate is the maximum over tracks, clipped to [min_fps, max_fps]
+(min_fps with no tracks). Rates go up immediately and come down only after
+`cooldown_sec` without demand for the higher rate.
+
+`min_fps` bounds how late a newly arriving vehicle is first seen: it should be
+sampled at least min_track_age_frames + 1 times before reaching the line, so
+keep 1 / min_fps well below the time a vehicle needs from the frame (or ROI)
+edge to the line.
+"""
+from __future__ import annotations
+import threading
+from collections import Counter, deque
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from src.count.geometry import bottom_centers
+
+def zone_segments(zones) -> np.ndarray:
+    """(S,2,2) segments of the counting zones: each line, and every polygon edge."""
+    segs = []
+    for z in zones:
+        pts = np.asarray(z.points, dtype=np.float64)
+        if z.kind == "line":
+            segs.append(pts[:2])
+        else:
+            segs.extend(np.stack([pts, np.roll(pts, -1, axis=0)], axis=1))
+    return np.asarray(segs, dtype=np.float64).reshape(-1, 2, 2)
+
+def distance_to_segments(points: np.ndarray, segs: np.ndarray) -> np.ndarray:
+    """(N,2) points, (S,2,2) segments -> (N,) distance to the nearest segment."""
+    a, b = segs[:, 0], segs[:, 1]
+    ab = b - a
+    t = ((points[:, None, :] - a[None]) * ab[None]).sum(-1) / np.maximum((ab * ab).sum(-1), 1e-9)[None]
+    closest = a[None] + np.clip(t, 0.0, 1.0)[..., None] * ab[None]
+    return np.sqrt(((points[:, None, :] - closest) ** 2).sum(-1)).min(axis=1)
+
+class AdaptiveStride:
+    def __init__(self, src_fps: float, min_fps: float, max_fps: float, segments: np.ndarray,
+                 lookahead_sec: float = 2.0, max_move_frac: float = 0.3, cooldown_sec: float = 3.0):
+        if not 0 < min_fps <= max_fps:
+            raise ValueError(f"adaptive_stride needs 0 < min_fps <= max_fps, got {min_fps}, {max_fps}")
+        self.src_fps = float(src_fps)
+        self.min_fps = float(min_fps)
+        self.max_fps = min(float(max_fps), self.src_fps)
+        self.segments = segments
+        self.lookahead_sec = lookahead_sec
+        self.max_move_frac = max_move_frac
+        self.cooldown_sec = cooldown_sec
+
+        self._lock = threading.Lock()
+        self._step = self._to_step(self.max_fps)  # start fast until the scene is known
+        self._last: Dict[int, Tuple[float, float, float]] = {}   # track id -> (t, x, y)
+        self._recent: deque = deque()   # (t_sec, wanted fps) within the cooldown window
+        self.steps_used: Counter = Counter()
+        self.first_t: Optional[float] = None
+        self.last_t: Optional[float] = None
+
+    def _to_step(self, fps: float) -> int:
+        return max(1, int(self.src_fps // fps))
+
+    def __call__(self) -> int:
+        """Step (in source frames) from the frame just read to the next one to read."""
+        with self._lock:
+            self.steps_used[self._step] += 1
+            return self._step
+
+    def wanted_fps(self, t_sec: float, tracked) -> float:
+        if not len(tracked):
+            self._last = {}
+            return self.min_fps
+        pts = bottom_centers(tracked.xyxy)
+        widths = np.maximum(tracked.xyxy[:, 2] - tracked.xyxy[:, 0], 1.0)
+        speed = np.full(len(tracked), np.nan)
+        last = {}
+        for i, (tid, x, y) in enumerate(zip(tracked.track_id.tolist(), pts[:, 0].tolist(), pts[:, 1].tolist())):
+            prev = self._last.get(tid)
+            if prev is not None and t_sec > prev[0]:
+                speed[i] = np.hypot(x - prev[1], y - prev[2]) / (t_sec - prev[0])
+            last[tid] = (t_sec, x, y)
+        self._last = last
+
+        known = ~np.isnan(speed)
+        fps = np.full(len(tracked), self.max_fps)          # new tracks: unknown speed
+        fps[known] = speed[known] / (self.max_move_frac * widths[known])
+        if len(self.segments):
+            dist = distance_to_segments(pts, self.segments)
+            soon = known & (dist < speed * self.lookahead_sec)
+            fps[soon] = self.max_fps
+        return float(np.clip(fps.max(), self.min_fps, self.max_fps))
+
+    def observe(self, t_sec: float, tracked, pending: int = 0) -> None:
+        """Feed one processed frame's tracks (in frame order) and the tracker's unconfirmed tracks."""
+        wanted = self.wanted_fps(t_sec, tracked)
+        if pending:
+            wanted = self.max_fps
+        if self.first_t is None:
+            self.first_t = t_sec
+        self.last_t = t_sec
+        self._recent.append((t_sec, wanted))
+        while self._recent and self._recent[0][0] < t_sec - self.cooldown_sec:
+            self._recent.popleft()
+        # up at once, down only when nothing in the cooldown window wanted more
+        fps = max(w for _, w in self._recent)
+        with self._lock:
+            self._step = self._to_step(fps)
+
+    def stats(self) -> dict:
+        frames = sum(self.steps_used.values())
+        span = (self.last_t - self.first_t) if self.first_t is not None else 0.0
+        fixed = span * self.max_fps + 1
+        return {
+            "min_fps": self.min_fps,
+            "max_fps": self.max_fps,
+            "frames_sampled": frames,
+            "frames_at_max_fps_equivalent": int(round(fixed)),
+            "inference_calls_vs_fixed": round(frames / fixed, 4) if fixed > 0 else None,
+            "mean_fps": round(frames / span, 3) if span > 0 else None,
+            "steps_used": {str(k): v for k, v in sorted(self.steps_used.items())},
+        }
+
+def build_adaptive_stride(cfg: dict, src_fps: float, zones) -> Optional[AdaptiveStride]:
+    ad_cfg = cfg.get("adaptive_stride", {})
+    if not ad_cfg.get("enabled", False):
+        return None
+    return AdaptiveStride(
+        src_fps=src_fps,
+        min_fps=float(ad_cfg.get("min_fps", 2.0)),
+        max_fps=float(ad_cfg.get("max_fps") or cfg["fps_infer"]),
+        segments=zone_segments(zones),
+        lookahead_sec=float(ad_cfg.get("lookahead_sec", 2.0)),
+        max_move_frac=float(ad_cfg.get("max_move_frac", 0.3)),
+        cooldown_sec=float(ad_cfg.get("cooldown_sec", 3.0)),
+    )
@@ -0,0 +1,219 @@
+"""
+Live stream ingestion (RTSP/HTTP URLs, camera device indexes).
+
+A capture thread reads the stream as fast as it arrives and publishes frames at
+`fps_infer` into a one-slot buffer; if the consumer has not taken the previous
+frame yet it is replaced (latest frame wins), so a slow detector drops frames
+instead of building up latency. Timestamps come from the wall clock at capture.
+
+A local file with realtime=True is replayed at its native frame rate and stands
+in for a camera in tests; it ends at end-of-file instead of reconnecting.
+"""
+from __future__ import annotations
+import os
+import threading
+import time
+from typing import Iterator, List, Optional
+
+import cv2
+import numpy as np
+
+from .video_reader import FramePacket
+
+LIVE_PREFIXES = ("rtsp://", "rtsps://", "rtmp://", "http://", "https://", "udp://", "tcp://")
+
+def is_live_source(source: str) -> bool:
+    return str(source).lower().startswith(LIVE_PREFIXES) or str(source).isdigit()
+
+class LatestFrameBuffer:
+    """Single-slot handoff between a producer and a consumer thread."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item) -> None:
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None):
+        """Next item, or None once closed and drained (or on timeout)."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._item is not None or self._closed, timeout):
+                return None
+            item, self._item = self._item, None
+            return item
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+class LiveFrameSource:
+    def __init__(self, source: str, fps_infer: float, realtime: bool = False,
+                 backoff_initial_sec: float = 1.0, backoff_max_sec: float = 30.0,
+                 max_reconnects: Optional[int] = None, duration_sec: Optional[float] = None,
+                 resize_to: Optional[int] = None):
+        self.source = source
+        self.fps_infer = float(fps_infer)
+        self.realtime = realtime
+        self.backoff_initial_sec = backoff_initial_sec
+        self.backoff_max_sec = backoff_max_sec
+        self.max_reconnects = max_reconnects
+        self.duration_sec = duration_sec
+        self.resize_to = resize_to
+
+        self.is_file = not is_live_source(source) and os.path.exists(source)
+        self.buffer = LatestFrameBuffer()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self.meta: dict = {}
+
+        self.frames_captured = 0
+        self.frames_published = 0
+        self.frames_delivered = 0
+        self.reconnects = 0
+        self.last_error: Optional[str] = None
+        self._latencies: List[float] = []
+        self._lat_lock = threading.Lock()
+        self.start_epoch: Optional[float] = None
+
+    # --- lifecycle ---
+    def start(self, timeout: float = 30.0) -> dict:
+        """Start capturing; returns stream meta once the first connection succeeds."""
+        self.start_epoch = time.time()
+        self._thread = threading.Thread(target=self._capture_loop, name="live-capture", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            self.stop()
+            raise RuntimeError(f"Cannot open live source: {self.source} ({self.last_error})")
+        if not self.meta:
+            self.stop()
+            raise RuntimeError(f"Cannot open live source: {self.source} ({self.last_error})")
+        return self.meta
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.buffer.close()
+
+    def __iter__(self) -> Iterator[FramePacket]:
+        while True:
+            pkt = self.buffer.get(timeout=0.5)
+            if pkt is None:
+                if self._stop.is_set() or (self._thread is not None and not self._thread.is_alive()):
+                    return
+                continue
+            self.frames_delivered += 1
+            yield pkt
+
+    def mark_processed(self, pkt: FramePacket) -> None:
+        """Record capture -> done latency for a packet the pipeline has finished with."""
+        with self._lat_lock:
+            self._latencies.append(time.time() - (self.start_epoch + pkt.t_sec))
+            if len(self._latencies) > 10000:
+                del self._latencies[:5000]
+
+    def stats(self) -> dict:
+        with self._lat_lock:
+            lat = np.asarray(self._latencies, dtype=np.float64)
+        return {
+            "frames_captured": self.frames_captured,
+            "frames_published": self.frames_published,
+            "frames_delivered": self.frames_delivered,
+            "frames_dropped": self.buffer.dropped,
+            "reconnects": self.reconnects,
+            "latency_sec_p50": round(float(np.percentile(lat, 50)), 4) if lat.size else None,
+            "latency_sec_p95": round(float(np.percentile(lat, 95)), 4) if lat.size else None,
+            "latency_sec_max": round(float(lat.max()), 4) if lat.size else None,
+            "last_error": self.last_error,
+        }
+
+    # --- capture thread ---
+    def _open(self):
+        src = int(self.source) if str(self.source).isdigit() else self.source
+        cap = cv2.VideoCapture(src)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        return cap
+
+    def _capture_loop(self) -> None:
+        backoff = self.backoff_initial_sec
+        try:
+            while not self._stop.is_set():
+                cap = self._open()
+                if cap is None:
+                    self.last_error = "open failed"
+                else:
+                    backoff = self.backoff_initial_sec
+                    ended = self._read_until_failure(cap)
+                    cap.release()
+                    if ended:
+                        return
+                if self._stop.is_set():
+                    return
+                if self.max_reconnects is not None and self.reconnects >= self.max_reconnects:
+                    self.last_error = f"gave up after {self.reconnects} reconnects"
+                    return
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2.0, self.backoff_max_sec)
+                self.reconnects += 1
+        finally:
+            self._ready.set()
+            self.buffer.close()
+
+    def _read_until_failure(self, cap) -> bool:
+        """Read until the stream fails. True means the stream ended for good."""
+        src_fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 0)
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0)
+        scale = 1.0
+        if self.resize_to and max(width, height) > int(self.resize_to):
+            scale = int(self.resize_to) / float(max(width, height))
+        out_size = (int(round(width * scale)), int(round(height * scale)))
+        if not self.meta:
+            self.meta = dict(src_fps=src_fps, fps_infer=self.fps_infer, step=None, total_frames=0,
+                             width=width, height=height, decode_mode="live", scale=scale,
+                             frame_width=out_size[0], frame_height=out_size[1],
+                             live=True, source=str(self.source), start_epoch=self.start_epoch)
+        self._ready.set()
+
+        interval = 1.0 / self.fps_infer
+        next_pub = 0.0
+        file_t0 = time.time()
+        file_idx = 0
+        while not self._stop.is_set():
+            ok, frame = cap.read()
+            if not ok:
+                if self.is_file:
+                    return True  # end of file
+                self.last_error = "read failed"
+                return False
+            now = time.time()
+            self.frames_captured += 1
+            if self.is_file and self.realtime:
+                # pace replay at the file's native rate
+                file_idx += 1
+                delay = file_t0 + file_idx / src_fps - now
+                if delay > 0:
+                    time.sleep(delay)
+                    now = time.time()
+            t_sec = now - self.start_epoch
+            if self.duration_sec is not None and t_sec >= self.duration_sec:
+                return True
+            if t_sec < next_pub:
+                continue
+            next_pub += interval
+            if next_pub <= t_sec:  # fell behind the capture rate; don't burst to catch up
+                next_pub = t_sec + interval
+            if scale != 1.0:
+                frame = cv2.resize(frame, out_size, interpolation=cv2.INTER_LINEAR)
+            self.frames_published += 1
+            self.buffer.put(FramePacket(frame_bgr=frame, frame_index=self.frames_captured - 1, t_sec=t_sec))
+        return True
@@ -2,7 +2,9 @@
 from __future__ import annotations
 import cv2
 from dataclasses import dataclass
-from typing import Iterator, Tuple
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+DECODE_MODES = ("read", "grab", "seek")
 
 @dataclass
 class FramePacket:
@@ -10,30 +12,124 @@ class FramePacket:
     frame_index: int
     t_sec: float
 
-def iter_video_frames(video_path: str, fps_infer: float) -> Tuple[Iterator[FramePacket], dict]:
+def _open(video_path: str):
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         raise RuntimeError(f"Cannot open video: {video_path}")
+    return cap
 
+def _props(cap) -> Tuple[float, int, int, int]:
     src_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 0)
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0)
+    return src_fps, total_frames, width, height
+
+def probe_video(video_path: str) -> dict:
+    """Container properties without decoding any frame."""
+    cap = _open(video_path)
+    try:
+        src_fps, total_frames, width, height = _props(cap)
+    finally:
+        cap.release()
+    return dict(src_fps=src_fps, total_frames=total_frames, width=width, height=height)
+
+def iter_video_frames(video_path: str, fps_infer: float, decode_mode: str = "read",
+                      resize_to: Optional[int] = None, start_frame: int = 0,
+                      end_frame: Optional[int] = None,
+                      stride: Optional[Callable[[], int]] = None) -> Tuple[Iterator[FramePacket], dict]:
+    """
+    Yield every `step`-th frame of the video.
+
+    decode_mode:
+        read - decode and convert every source frame, keep every step-th (original behaviour)
+        grab - grab() the dropped frames (no BGR conversion / copy), retrieve() only kept ones
+        seek - jump straight to each kept frame; cheapest for intra-only codecs (MJPG) and large steps
+    resize_to: if set, kept frames whose long side exceeds it are downscaled at decode time
+        (meta["scale"] maps source pixel coordinates to the yielded frames).
+    start_frame / end_frame: restrict to source frames [start_frame, end_frame). Frame
+        indices and timestamps stay absolute and sampling stays on the same step grid
+        as a full read, so a range yields exactly the frames a full read would.
+    stride: if set, called after each kept frame for the number of source frames to
+        the next one (adaptive sampling); `fps_infer` then only sets the first step.
+    """
+    if decode_mode not in DECODE_MODES:
+        raise ValueError(f"decode_mode must be one of {DECODE_MODES}, got '{decode_mode}'")
+
+    cap = _open(video_path)
+    src_fps, total_frames, width, height = _props(cap)
 
     step = max(1, int(round(src_fps / fps_infer)))
+
+    scale = 1.0
+    if resize_to and max(width, height) > int(resize_to):
+        scale = int(resize_to) / float(max(width, height))
+    out_size = (int(round(width * scale)), int(round(height * scale)))
+
     meta = dict(src_fps=src_fps, fps_infer=fps_infer, step=step,
-                total_frames=total_frames, width=width, height=height)
+                total_frames=total_frames, width=width, height=height,
+                decode_mode=decode_mode, scale=scale,
+                frame_width=out_size[0], frame_height=out_size[1], adaptive_stride=stride is not None)
+
+    def _resize(frame):
+        if scale == 1.0:
+            return frame
+        return cv2.resize(frame, out_size, interpolation=cv2.INTER_LINEAR)
 
     def _gen():
-        frame_idx = 0
-        while True:
+        frame_idx = max(0, int(start_frame))
+        next_keep = -(-frame_idx // step) * step  # first frame on the step grid
+        if frame_idx:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        try:
+            while end_frame is None or frame_idx < end_frame:
+                keep = frame_idx == next_keep
+                if keep or decode_mode == "read":
+                    ok, frame = cap.read()
+                else:
+                    ok, frame = cap.grab(), None
+                if not ok:
+                    break
+                if keep:
+                    t_sec = frame_idx / float(src_fps)
+                    yield FramePacket(frame_bgr=_resize(frame), frame_index=frame_idx, t_sec=t_sec)
+                    next_keep = frame_idx + (max(1, int(stride())) if stride is not None else step)
+                if decode_mode == "seek" and keep and next_keep - frame_idx > 1:
+                    frame_idx = next_keep
+                    if total_frames and frame_idx >= total_frames:
+                        break
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+                else:
+                    frame_idx += 1
+        finally:
+            cap.release()
+
+    return _gen(), meta
+
+def iter_frames_at(video_path: str, frame_indices: Iterable[int],
+                   size: Optional[Tuple[int, int]] = None) -> Iterator[FramePacket]:
+    """
+    Decode the given (increasing) source frame indices, grab()-skipping the rest.
+    size: (w, h) to resize the yielded frames to, e.g. a run's decoded frame size.
+    """
+    cap = _open(video_path)
+    src_fps = _props(cap)[0]
+    try:
+        pos = 0
+        for idx in frame_indices:
+            idx = int(idx)
+            if idx < pos:
+                raise ValueError(f"frame indices must increase, got {idx} after {pos - 1}")
+            while pos < idx:
+                if not cap.grab():
+                    return
+                pos += 1
             ok, frame = cap.read()
             if not ok:
-                break
-            if frame_idx % step == 0:
-                t_sec = frame_idx / float(src_fps)
-                yield FramePacket(frame_bgr=frame, frame_index=frame_idx, t_sec=t_sec)
-            frame_idx += 1
+                return
+            pos += 1
+            if size is not None and (frame.shape[1], frame.shape[0]) != tuple(size):
+                frame = cv2.resize(frame, tuple(size), interpolation=cv2.INTER_LINEAR)
+            yield FramePacket(frame_bgr=frame, frame_index=idx, t_sec=idx / float(src_fps))
+    finally:
         cap.release()
-
-    return _gen(), meta
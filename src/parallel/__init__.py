@@ -0,0 +1 @@
+"""Parallel package."""
@@ -0,0 +1,223 @@
+"""
+Resumable batch processing over the site-organized video archive.
+
+Usage:
+    python -m src.parallel.batch --root data/raw_videos --workers 4
+    python -m src.parallel.batch --root data/raw_videos --dry_run
+    python -m src.parallel.batch --root data/raw_videos --force
+
+Every video under --root (see src/tools/organize_videos.py) is one job. The
+site is looked up in configs/sites.yaml from the folder name (siteNN), the
+file stem or its siteNN_ prefix. Outputs go to <out>/<site>/<video stem>/.
+
+The job manifest (<out>/manifest.json by default) records status, timings and
+the hash of the input file and of the effective config. Re-running skips jobs
+that are done and unchanged, and retries failed, interrupted or changed ones.
+With checkpoint.enabled, a retried job resumes from its last checkpoint.
+Worker count, threads per worker and CPU pinning come from this host's
+profile (python -m src.tools.autotune) when there is one.
+"""
+from __future__ import annotations
+import argparse
+import json
+import multiprocessing as mp
+import os
+import re
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from src.utils.config import load_yaml
+from src.utils.hashing import file_sha256, obj_sha256
+from src.utils.host_profile import apply_threads, load_host_profile, pin_cpus, worker_cpus
+from src.export.json_summary import write_json
+
+VIDEO_EXTS = (".mp4", ".avi", ".mov", ".mkv")
+SITE_PREFIX = re.compile(r"^(site\d+)_", re.IGNORECASE)
+
+def discover_videos(root: str) -> List[str]:
+    found = []
+    for dirpath, _, files in os.walk(root):
+        for f in files:
+            if os.path.splitext(f)[1].lower() in VIDEO_EXTS:
+                found.append(os.path.join(dirpath, f))
+    return sorted(found)
+
+def _norm(key: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", key.lower())
+
+def resolve_site(video_path: str, sites: Dict) -> Optional[str]:
+    """Map a video to a sites.yaml key (site01 matches site_01)."""
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    candidates = [os.path.basename(os.path.dirname(video_path)), stem]
+    m = SITE_PREFIX.match(stem)
+    if m:
+        candidates.append(m.group(1))
+    for c in candidates:
+        if c in sites:
+            return c
+    by_norm = {_norm(k): k for k in sites}
+    for c in candidates:
+        if _norm(c) in by_norm:
+            return by_norm[_norm(c)]
+    return None
+
+def load_manifest(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {"jobs": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        doc = json.load(f)
+    doc.setdefault("jobs", {})
+    return doc
+
+def save_manifest(manifest: Dict, path: str) -> None:
+    tmp = path + ".tmp"
+    write_json(manifest, tmp)
+    os.replace(tmp, path)
+
+def _input_hash(path: str, prev: Optional[Dict]) -> str:
+    # hashing a multi-GB recording is slow; reuse the old hash if size+mtime are unchanged
+    st = os.stat(path)
+    if prev and prev.get("input_size") == st.st_size and prev.get("input_mtime_ns") == st.st_mtime_ns:
+        return prev["input_hash"]
+    return file_sha256(path)
+
+def plan_jobs(videos: List[str], root: str, out_root: str, cfg: Dict, sites: Dict, keep: List[str],
+              manifest: Dict, force: bool = False) -> Tuple[List[Dict], List[str], List[str]]:
+    """Returns (jobs to run, skipped job ids, videos without a calibrated site)."""
+    todo, skipped, unresolved = [], [], []
+    for video in videos:
+        job_id = os.path.relpath(video, root).replace(os.sep, "/")
+        site = resolve_site(video, sites)
+        if site is None:
+            unresolved.append(job_id)
+            continue
+        prev = manifest["jobs"].get(job_id)
+        st = os.stat(video)
+        job = dict(
+            job_id=job_id,
+            input=os.path.abspath(video),
+            site=site,
+            out_dir=os.path.join(out_root, site, os.path.splitext(os.path.basename(video))[0]),
+            input_size=st.st_size,
+            input_mtime_ns=st.st_mtime_ns,
+            input_hash=_input_hash(video, prev),
+            config_hash=obj_sha256({"pipeline": cfg, "site": sites[site], "keep_classes": sorted(keep)}),
+        )
+        if (not force and prev and prev.get("status") == "done"
+                and prev.get("input_hash") == job["input_hash"]
+                and prev.get("config_hash") == job["config_hash"]):
+            skipped.append(job_id)
+            continue
+        # a failed or interrupted job continues from its last checkpoint (if any)
+        job["resume"] = bool(cfg.get("checkpoint", {}).get("enabled", False)) and bool(prev) \
+            and prev.get("status") in ("failed", "running")
+        todo.append(job)
+    return todo, skipped, unresolved
+
+def _init_worker(threads: int, cv2_threads: int, workers: int, slot=None) -> None:
+    """Thread limits for a job process; with `slot` (a shared counter) also its own CPUs."""
+    if slot is not None:
+        with slot.get_lock():
+            index = slot.value
+            slot.value += 1
+        pin_cpus(worker_cpus(index, workers))
+    apply_threads(threads, cv2_threads)
+
+def _run_job(job: Dict, config: str, sites: str, classes: str) -> Dict:
+    from src.process_video import build_arg_parser, run
+
+    t0 = time.perf_counter()
+    try:
+        args = build_arg_parser().parse_args([
+            "--input", job["input"], "--site", job["site"], "--out", job["out_dir"],
+            "--config", config, "--sites", sites, "--classes", classes,
+        ] + (["--resume"] if job.get("resume") else []))
+        summary = run(args)
+        return dict(status="done", events_total=summary["events_total"], outputs=summary["outputs"],
+                    elapsed_sec=round(time.perf_counter() - t0, 3), error=None)
+    except BaseException as e:  # SystemExit from run() is a job failure too
+        return dict(status="failed", elapsed_sec=round(time.perf_counter() - t0, 3),
+                    error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc())
+
+def _now() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Process every video under a site-organized folder tree")
+    ap.add_argument("--root", default="data/raw_videos")
+    ap.add_argument("--out", default="out/batch")
+    ap.add_argument("--config", default="configs/pipeline.yaml")
+    ap.add_argument("--sites", default="configs/sites.yaml")
+    ap.add_argument("--classes", default="configs/classes.yaml")
+    ap.add_argument("--workers", type=int, default=None,
+                    help="Parallel jobs (default: from the host profile, else 2)")
+    ap.add_argument("--manifest", default=None, help="Job manifest path (default: <out>/manifest.json)")
+    ap.add_argument("--force", action="store_true", help="Re-run jobs even if done and unchanged")
+    ap.add_argument("--dry_run", action="store_true", help="Only show what would run")
+    args = ap.parse_args(argv)
+
+    cfg = load_yaml(args.config)
+    sites = (load_yaml(args.sites) or {}).get("sites", {})
+    keep = list(load_yaml(args.classes).get("keep_classes", []))
+    manifest_path = args.manifest or os.path.join(args.out, "manifest.json")
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+    manifest = load_manifest(manifest_path)
+
+    videos = discover_videos(args.root)
+    todo, skipped, unresolved = plan_jobs(videos, args.root, args.out, cfg, sites, keep,
+                                          manifest, force=args.force)
+
+    print(f"🎞️  {len(videos)} videos: {len(todo)} to run, {len(skipped)} up to date, "
+          f"{len(unresolved)} without a calibrated site")
+    for job_id in unresolved:
+        print(f"⏭️  Skipping '{job_id}' (no matching site in {args.sites})")
+    if args.dry_run or not todo:
+        for job in todo:
+            print(f"   would run {job['job_id']} -> {job['out_dir']}")
+        return
+
+    for job in todo:
+        manifest["jobs"][job["job_id"]] = dict(job, status="running", started_at=_now(),
+                                               attempts=manifest["jobs"].get(job["job_id"], {}).get("attempts", 0) + 1)
+    save_manifest(manifest, manifest_path)
+
+    profile = load_host_profile(cfg)
+    tuned = profile["settings"] if profile is not None else None
+    workers = max(1, min(args.workers or (tuned["workers"] if tuned else 2), len(todo)))
+    if tuned and workers == tuned["workers"]:
+        threads, cv2_threads, pinned = tuned["torch_threads"], tuned["cv2_threads"], tuned["affinity"]
+        print(f"   Host profile: {workers} workers x {threads} threads, batch {tuned['batch_size']}"
+              f"{', pinned' if pinned else ''}")
+    else:
+        threads = cv2_threads = max(1, (os.cpu_count() or 1) // workers)
+        pinned = False
+    ctx = mp.get_context("spawn")
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(threads, cv2_threads, workers, ctx.Value("i", 0) if pinned else None)) as pool:
+        futs = {pool.submit(_run_job, job, args.config, args.sites, args.classes): job for job in todo}
+        for fut in as_completed(futs):
+            job = futs[fut]
+            try:
+                result = fut.result()
+            except Exception as e:  # worker process died
+                result = dict(status="failed", error=f"{type(e).__name__}: {e}")
+            entry = manifest["jobs"][job["job_id"]]
+            entry.update(result, finished_at=_now())
+            save_manifest(manifest, manifest_path)
+            if result["status"] == "done":
+                print(f"✅ {job['job_id']} ({result['elapsed_sec']}s, {result['events_total']} events)")
+            else:
+                failed += 1
+                print(f"❌ {job['job_id']}: {result['error']}")
+
+    print(f"\n📊 Summary: {len(todo) - failed} done, {failed} failed, {len(skipped)} skipped")
+    print(f"   Manifest: {manifest_path}")
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
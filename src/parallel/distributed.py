@@ -0,0 +1,368 @@
+"""
+Coordinator / worker mode: many nodes process one video archive through a
+shared work queue (src/parallel/work_queue.py).
+
+    # coordinator: queue every video under --root as 30-minute time shards
+    python -m src.parallel.distributed submit --root data/raw_videos --queue sqlite:///shared/traffic/queue.db
+
+    # on every node (as many as you like, started and stopped at any time)
+    python -m src.parallel.distributed work --queue sqlite:///shared/traffic/queue.db
+
+    python -m src.parallel.distributed status --queue sqlite:///shared/traffic/queue.db
+    python -m src.parallel.distributed merge --queue sqlite:///shared/traffic/queue.db --out out/distributed
+
+A job is one time shard of one video (the same shards as process_video
+--shards, see src/parallel/shards.py; --shard_minutes 0 makes whole-video
+jobs). Its payload carries the pipeline config, the site calibration and the
+kept classes, so workers only need the code, the model weights and the videos
+at the same path (a shared mount). A worker keeps the model loaded between
+jobs, heartbeats its lease while a job runs and reports the shard's events.
+`--procs N` runs N worker processes on the node (default: the host profile's
+worker count, see src/tools/autotune.py).
+
+No double counting: a shard only reports the crossings in the frame range it
+owns (its warm-up overlap is dropped), a retried shard replaces nothing but
+its own slot, and the queue accepts one result per job. Submitting again is
+idempotent; videos resubmitted with another config form a new group and merge
+uses only the newest group per video.
+
+merge writes, per site, counts_<N>min.csv / counts_daily.csv /
+counts_15min.xlsx over all its finished videos on the site clock (recording
+starts from siteNN_YYYYMMDD_HHMM file names) to <out>/<site>/counts/, and
+<out>/distributed_summary.json. Videos with an unknown start get their own
+<out>/<site>/<video>/counts/. Videos with shards still pending or failed are
+left out and listed.
+"""
+from __future__ import annotations
+import argparse
+import dataclasses
+import math
+import multiprocessing as mp
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from src.export.json_summary import write_json
+from src.parallel.batch import discover_videos, resolve_site
+from src.parallel.work_queue import Lease, WorkQueue, open_queue
+from src.utils.config import load_yaml
+from src.utils.hashing import obj_sha256
+
+def plan_video_jobs(video: str, site: str, cfg: dict, site_cfg: dict, keep: List[str], shard_minutes: float,
+                    batch_size: Optional[int] = None) -> List[Tuple[str, dict]]:
+    """(job_id, payload) per time shard of one video."""
+    from src.ingest.video_reader import probe_video
+    from src.parallel.shards import plan_shards
+
+    st = os.stat(video)
+    group = obj_sha256({"input": os.path.abspath(video), "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                        "config": cfg, "site": site_cfg, "keep_classes": sorted(keep),
+                        "shard_minutes": shard_minutes})[:12]
+    whole = [dict(index=0, start_frame=0, end_frame=None, warmup_from=0)]
+    if shard_minutes > 0:
+        probe = probe_video(video)
+        step = max(1, int(round(probe["src_fps"] / float(cfg["fps_infer"]))))
+        n = max(1, math.ceil(probe["total_frames"] / probe["src_fps"] / (60.0 * shard_minutes)))
+        overlap = int(round(float(cfg.get("engine", {}).get("shard_overlap_sec", 10.0)) * probe["src_fps"]))
+        shards = plan_shards(probe["total_frames"], step, n, overlap) if n > 1 else whole
+    else:
+        shards = whole
+    stem = os.path.splitext(os.path.basename(video))[0]
+    video_info = {"group": group, "n_shards": len(shards), "submitted_at": time.time()}
+    return [(f"{site}/{stem}/{group}/{sh['index']:03d}",
+             {"input": os.path.abspath(video), "site": site, "site_cfg": site_cfg, "config": cfg,
+              "keep_classes": sorted(keep), "batch_size": batch_size, "video": video_info, "shard": sh})
+            for sh in shards]
+
+# --- worker ---
+
+def run_job(payload: dict, models) -> dict:
+    """Process one shard with a cached model -> JSON-ready result."""
+    from src.parallel.shards import run_shard
+
+    cfg = payload["config"]
+    batch_size = max(1, int(payload.get("batch_size") or cfg["detector"].get("batch_size", 1)))
+    r = run_shard(payload["input"], cfg, payload["site_cfg"], set(payload["keep_classes"]), batch_size,
+                  payload["shard"], tracker=models.get(cfg))
+    return dict(r, events=[dataclasses.asdict(e) for e in r["events"]])
+
+class _Heartbeat:
+    """Extends a lease every lease_sec / 3 on a background thread."""
+
+    def __init__(self, queue: WorkQueue, lease: Lease, lease_sec: float):
+        self.queue, self.lease, self.lease_sec = queue, lease, lease_sec
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.lease_sec / 3.0):
+            try:
+                if not self.queue.heartbeat(self.lease, self.lease_sec):
+                    self.lost = True
+                    return
+            except Exception as e:  # queue briefly unreachable: retry next beat, the lease has slack
+                print(f"⚠️  Heartbeat for {self.lease.job_id} failed: {e}")
+
+    def __enter__(self) -> "_Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+def work(queue_url: str, worker_id: str, lease_sec: float = 120.0, poll_sec: float = 5.0,
+         idle_exit_sec: Optional[float] = None, max_jobs: Optional[int] = None, max_models: int = 1) -> dict:
+    """Lease and run jobs until the queue stays empty for idle_exit_sec (None: forever) or max_jobs ran."""
+    from src.server import ModelCache
+
+    queue = open_queue(queue_url)
+    models = ModelCache(max_models=max_models)
+    stats = {"worker": worker_id, "done": 0, "failed": 0, "lost": 0, "frames": 0, "busy_sec": 0.0}
+    idle_since = time.monotonic()
+    while max_jobs is None or stats["done"] + stats["failed"] + stats["lost"] < max_jobs:
+        lease = queue.lease(worker_id, lease_sec)
+        if lease is None:
+            if idle_exit_sec is not None and time.monotonic() - idle_since >= idle_exit_sec:
+                break
+            time.sleep(poll_sec)
+            continue
+        t0 = time.perf_counter()
+        try:
+            with _Heartbeat(queue, lease, lease_sec) as hb:
+                result = run_job(lease.payload, models)
+        except KeyboardInterrupt:
+            queue.release(lease)  # stopping a worker is not the job's fault: no attempt used up
+            raise
+        except BaseException as e:  # SystemExit from the pipeline is a job failure too
+            queue.fail(lease, f"{type(e).__name__}: {e}")
+            stats["failed"] += 1
+            print(f"❌ {lease.job_id} (attempt {lease.attempt}): {type(e).__name__}: {e}")
+        else:
+            result.update(worker=worker_id, attempt=lease.attempt)
+            if not hb.lost and queue.complete(lease, result):
+                stats["done"] += 1
+                stats["frames"] += result["frames_processed"]
+                print(f"✅ {lease.job_id}: {len(result['events'])} events, {result['frames_processed']} frames "
+                      f"in {result['elapsed_sec']:.1f}s")
+            else:
+                stats["lost"] += 1
+                print(f"⚠️  {lease.job_id}: lease expired while running; result dropped (the job was requeued)")
+        stats["busy_sec"] += time.perf_counter() - t0
+        idle_since = time.monotonic()
+    stats["busy_sec"] = round(stats["busy_sec"], 3)
+    return stats
+
+def _work_process(index: int, procs: int, kwargs: dict, threads: int, cv2_threads: int, pinned: bool) -> None:
+    from src.utils.host_profile import apply_threads, pin_cpus, worker_cpus
+
+    if pinned:
+        pin_cpus(worker_cpus(index, procs))
+    apply_threads(threads, cv2_threads)
+    try:
+        _print_stats(work(**kwargs))
+    except KeyboardInterrupt:
+        pass
+
+def _print_stats(stats: dict) -> None:
+    print(f"📊 {stats['worker']}: {stats['done']} done, {stats['failed']} failed, {stats['lost']} lost; "
+          f"{stats['frames']} frames in {stats['busy_sec']:.1f}s busy")
+
+# --- merge ---
+
+def select_groups(queue: WorkQueue) -> Dict[str, dict]:
+    """Newest submitted group per input video -> {group: {payload of shard 0, jobs: [job records]}}."""
+    groups: Dict[str, dict] = {}
+    for job in queue.jobs():
+        info = job["payload"]["video"]
+        g = groups.setdefault(info["group"], dict(job["payload"], jobs=[]))
+        g["jobs"].append(job)
+    newest: Dict[str, dict] = {}
+    for g in groups.values():
+        cur = newest.get(g["input"])
+        if cur is None or g["video"]["submitted_at"] > cur["video"]["submitted_at"]:
+            newest[g["input"]] = g
+    return {g["video"]["group"]: g for g in newest.values()}
+
+def merge(queue: WorkQueue, out_dir: str) -> dict:
+    from src.aggregate.online import parse_recording_start
+    from src.count.counter import CountEvent
+    from src.parallel.shards import merge_shard_events
+    from src.process_video import build_aggregator, write_15min_workbook
+
+    groups = select_groups(queue)
+    results: Dict[str, List[dict]] = defaultdict(list)
+    for job_id, payload, result in queue.results():
+        if payload["video"]["group"] in groups:
+            results[payload["video"]["group"]].append(result)
+
+    videos: Dict[str, List[dict]] = defaultdict(list)
+    pending = []
+    for group, g in groups.items():
+        name = os.path.basename(g["input"])
+        if len(results[group]) < g["video"]["n_shards"]:
+            states = [j["status"] for j in g["jobs"]]
+            pending.append({"input": g["input"], "site": g["site"], "shards": g["video"]["n_shards"],
+                            **{s: states.count(s) for s in ("queued", "leased", "done", "failed")}})
+            continue
+        for r in results[group]:
+            r["events"] = [CountEvent(**e) for e in r["events"]]
+        videos[g["site"]].append({
+            "name": name, "input": g["input"], "group": g, "origin": parse_recording_start(g["input"]),
+            "events": merge_shard_events(results[group]),
+            "frames_processed": sum(r["frames_processed"] for r in results[group]),
+            "worker_sec": round(sum(r["elapsed_sec"] for r in results[group]), 3),
+            "workers": sorted({r["worker"] for r in results[group]}),
+            "attempts": sum(j["attempts"] for j in g["jobs"]),
+        })
+
+    sites = {}
+    for site, vids in sorted(videos.items()):
+        g0 = vids[0]["group"]
+        clocked = [v for v in vids if v["origin"] is not None]
+        # one table on the site clock for every video with a known start; the others stand alone
+        tables = [(os.path.join(out_dir, site, "counts"), clocked)] if clocked else []
+        tables += [(os.path.join(out_dir, site, os.path.splitext(v["name"])[0], "counts"), [v])
+                   for v in vids if v["origin"] is None]
+        outputs = []
+        for counts_dir, members in tables:
+            os.makedirs(counts_dir, exist_ok=True)
+            origin = min(v["origin"] for v in members) if members[0]["origin"] is not None else None
+            agg, sinks, closed_15 = build_aggregator(g0["config"], g0["site_cfg"], counts_dir, origin)
+            for v in members:
+                offset = (v["origin"] - origin).total_seconds() if origin is not None else 0.0
+                agg.add(dataclasses.replace(e, t_sec=e.t_sec + offset) for e in v["events"])
+            agg.flush()
+            _, _, xlsx_path = write_15min_workbook(counts_dir, agg, sinks, closed_15)
+            outputs.append({"videos": [v["name"] for v in members], "origin": origin.isoformat() if origin else None,
+                            "counts_by_resolution": {n: os.path.abspath(s.path) for n, s in sinks.items()},
+                            "counts_xlsx": os.path.abspath(xlsx_path)})
+        sites[site] = {
+            "videos": [dict({k: v[k] for k in ("name", "input", "frames_processed", "worker_sec", "workers",
+                                                "attempts")},
+                            events=len(v["events"]), shards=v["group"]["video"]["n_shards"]) for v in vids],
+            "events_total": sum(len(v["events"]) for v in vids),
+            "outputs": outputs,
+        }
+
+    summary = {"merged_at": datetime.utcnow().isoformat() + "Z", "queue": queue.counts(), "sites": sites,
+               "pending_videos": pending}
+    os.makedirs(out_dir, exist_ok=True)
+    write_json(summary, os.path.join(out_dir, "distributed_summary.json"))
+    return summary
+
+# --- CLI ---
+
+def _submit(args) -> None:
+    cfg = load_yaml(args.config)
+    sites = (load_yaml(args.sites) or {}).get("sites", {})
+    keep = list(load_yaml(args.classes).get("keep_classes", []))
+    videos = list(args.input) + (discover_videos(args.root) if args.root else [])
+    if not videos:
+        raise SystemExit("❌ No videos: give --root and/or --input")
+    jobs = []
+    for video in videos:
+        site = resolve_site(video, sites)
+        if site is None:
+            print(f"⏭️  Skipping '{video}' (no matching site in {args.sites})")
+            continue
+        jobs += plan_video_jobs(video, site, cfg, sites[site], keep, args.shard_minutes, args.batch_size)
+    if args.dry_run:
+        for job_id, _ in jobs:
+            print(f"   would queue {job_id}")
+        return
+    queued = open_queue(args.queue).submit(jobs, max_attempts=args.max_attempts, force=args.force)
+    print(f"✅ {queued} jobs queued ({len(jobs) - queued} already in the queue) from {len(videos)} videos")
+
+def _work(args) -> None:
+    from src.utils.host_profile import load_host_profile
+
+    worker_id = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    kwargs = dict(queue_url=args.queue, lease_sec=args.lease_sec, poll_sec=args.poll_sec,
+                  idle_exit_sec=args.idle_exit_sec, max_jobs=args.max_jobs)
+    profile = load_host_profile(load_yaml(args.config)) if os.path.exists(args.config) else None
+    tuned = profile["settings"] if profile is not None else None
+    procs = max(1, args.procs or (tuned["workers"] if tuned else 1))
+    if procs == 1:
+        _print_stats(work(worker_id=worker_id, **kwargs))
+        return
+    if tuned and procs == tuned["workers"]:
+        threads, cv2_threads, pinned = tuned["torch_threads"], tuned["cv2_threads"], tuned["affinity"]
+    else:
+        threads = cv2_threads = max(1, (os.cpu_count() or 1) // procs)
+        pinned = False
+    ctx = mp.get_context("spawn")
+    children = [ctx.Process(target=_work_process, args=(i, procs, dict(kwargs, worker_id=f"{worker_id}.{i}"),
+                                                        threads, cv2_threads, pinned)) for i in range(procs)]
+    print(f"⏳ {procs} worker processes x {threads} threads on {args.queue}")
+    for p in children:
+        p.start()
+    try:
+        for p in children:
+            p.join()
+    except KeyboardInterrupt:  # children got the same SIGINT and hand their jobs back
+        for p in children:
+            p.join()
+
+def _status(args) -> None:
+    queue = open_queue(args.queue)
+    counts = queue.counts()
+    print("   " + ", ".join(f"{n} {s}" for s, n in counts.items()))
+    now = time.time()
+    for job in queue.jobs("leased"):
+        print(f"⏳ {job['job_id']}: {job['worker']} (attempt {job['attempts']}, "
+              f"lease {job['lease_expires'] - now:+.0f}s)")
+    for job in queue.jobs("failed"):
+        print(f"❌ {job['job_id']}: {job['error']} after {job['attempts']} attempts")
+
+def _merge(args) -> None:
+    summary = merge(open_queue(args.queue), args.out)
+    for site, s in summary["sites"].items():
+        print(f"✅ {site}: {len(s['videos'])} videos, {s['events_total']} events")
+        for o in s["outputs"]:
+            for path in o["counts_by_resolution"].values():
+                print(f"CSV : {path}")
+    for p in summary["pending_videos"]:
+        print(f"⏭️  {os.path.basename(p['input'])} not merged: {p['done']}/{p['shards']} shards done "
+              f"({p['failed']} failed)")
+    print(f"   Summary: {os.path.join(args.out, 'distributed_summary.json')}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Distributed processing over a shared work queue")
+    sub = ap.add_subparsers(dest="command", required=True)
+    for name in ("submit", "work", "status", "merge"):
+        p = sub.add_parser(name)
+        p.add_argument("--queue", required=True, help="Work queue URL, e.g. sqlite:///shared/traffic/queue.db")
+        if name == "submit":
+            p.add_argument("--root", default=None, help="Queue every video under this folder tree")
+            p.add_argument("--input", action="append", default=[], help="Queue this video (repeatable)")
+            p.add_argument("--config", default="configs/pipeline.yaml")
+            p.add_argument("--sites", default="configs/sites.yaml")
+            p.add_argument("--classes", default="configs/classes.yaml")
+            p.add_argument("--shard_minutes", type=float, default=30.0,
+                           help="Video minutes per job (0 = one job per video)")
+            p.add_argument("--batch_size", type=int, default=None)
+            p.add_argument("--max_attempts", type=int, default=3)
+            p.add_argument("--force", action="store_true", help="Re-queue jobs that are already in the queue")
+            p.add_argument("--dry_run", action="store_true")
+        elif name == "work":
+            p.add_argument("--worker_id", default=None, help="Default: <hostname>-<pid>")
+            p.add_argument("--procs", type=int, default=None,
+                           help="Worker processes on this node (default: host profile workers, else 1)")
+            p.add_argument("--config", default="configs/pipeline.yaml", help="Only used to find the host profile")
+            p.add_argument("--lease_sec", type=float, default=120.0)
+            p.add_argument("--poll_sec", type=float, default=5.0)
+            p.add_argument("--idle_exit_sec", type=float, default=None, help="Exit after the queue is empty this long")
+            p.add_argument("--max_jobs", type=int, default=None)
+        elif name == "merge":
+            p.add_argument("--out", default="out/distributed")
+    args = ap.parse_args(argv)
+    {"submit": _submit, "work": _work, "status": _status, "merge": _merge}[args.command](args)
+
+if __name__ == "__main__":
+    main()
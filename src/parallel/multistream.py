@@ -0,0 +1,411 @@
+"""
+Many camera streams through one shared model in one process.
+
+Usage:
+    python -m src.parallel.multistream --streams configs/streams.yaml --out out/multi
+    python -m src.parallel.multistream --stream site01=data/raw_videos/site01/a.mp4 \\
+        --stream site02=rtsp://10.0.0.12/stream1 --duration 3600
+
+A streams file lists the feeds (`name` defaults to the site key):
+
+    streams:
+      - site: site01
+        input: data/raw_videos/site01/site01_20260118_1800_day.mp4
+        priority: 2                  # share of inference per scheduling round (default 1)
+        start: "2026-01-18 18:00"    # like --start (default: from the file name / wall clock)
+      - site: site02
+        input: rtsp://10.0.0.12/stream1
+
+Every stream is read on its own thread (iter_video_frames for files,
+LiveFrameSource for cameras or with --realtime) into a short frame queue; the
+motion gate, when enabled, runs there too. The scheduler fills each inference
+batch from the streams that have frames ready by deficit round-robin: a stream
+gets `priority` frames per round, a stream with nothing ready is skipped and
+banks no credit, so a stalled camera never holds the others back and a busy one
+cannot starve them. Up to `--batch_size` frames from any mix of cameras go
+through one detector call; each frame's detections then go to that stream's own
+ByteTracker and counter, in the stream's frame order.
+
+Compared with one process_video run per camera there is a single copy of the
+weights and one thread pool, and inference runs in batches across cameras.
+Each stream writes the same counts_*.csv / counts_15min.xlsx / run_summary.json
+as process_video to <out>/<name>/; <out>/multistream_summary.json has the host
+totals and each stream's share.
+
+Tracking is always the native ByteTracker (tracker.type: native; Ultralytics'
+model.track keeps one tracker per model). ROI crops, the track cache and the
+annotated video are single-stream features and are not applied here. Cameras
+with different frame sizes are letterboxed to a common square input inside a
+batch, which can shift detections slightly from a single-stream run.
+"""
+from __future__ import annotations
+import argparse
+import os
+import signal
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional
+
+from src.utils.config import ensure_dirs, load_yaml
+from src.export.json_summary import write_json
+
+@dataclass
+class StreamSpec:
+    name: str
+    site: str
+    input: str
+    priority: float = 1.0
+    start: Optional[str] = None
+
+def parse_streams(doc: Optional[dict], cli: List[str]) -> List[StreamSpec]:
+    """Streams from a streams.yaml document and `--stream SITE=INPUT` arguments; names made unique."""
+    raw = list((doc or {}).get("streams") or [])
+    for spec in cli:
+        site, sep, source = spec.partition("=")
+        if not sep or not site or not source:
+            raise SystemExit(f"❌ --stream must be SITE=INPUT, got '{spec}'")
+        raw.append({"site": site, "input": source})
+    specs: List[StreamSpec] = []
+    seen: Dict[str, int] = {}
+    for i, item in enumerate(raw):
+        if not item.get("site") or not item.get("input"):
+            raise SystemExit(f"❌ Stream #{i + 1} needs 'site' and 'input'")
+        priority = float(item.get("priority", 1))
+        if priority <= 0:
+            raise SystemExit(f"❌ Stream #{i + 1}: priority must be > 0")
+        name = str(item.get("name") or item["site"])
+        seen[name] = seen.get(name, 0) + 1
+        if seen[name] > 1:
+            name = f"{name}_{seen[name]}"
+        specs.append(StreamSpec(name, str(item["site"]), str(item["input"]), priority, item.get("start")))
+    return specs
+
+class Stream:
+    """One camera: its reader thread and frame queue, tracker, counter and aggregator."""
+
+    def __init__(self, spec: StreamSpec, site_cfg: dict, cfg: dict, detector, out_dir: str,
+                 realtime: bool = False, duration_sec: Optional[float] = None):
+        from src.detect.roi import build_motion_gate
+        from src.ingest.live_stream import is_live_source
+        from src.process_video import build_aggregator, build_counter, open_frames, open_live, recording_start
+        from src.track.bytetrack import ByteTracker
+        from src.track.tracker import NativeByteTracker
+
+        self.spec = spec
+        self.site_cfg = site_cfg
+        self.live = is_live_source(spec.input) or realtime
+        self.source = None
+        if self.live:
+            self.source = open_live(spec.input, cfg, realtime=True, duration_sec=duration_sec)
+            self.meta = self.source.start()
+            self.frames = iter(self.source)
+        else:
+            self.frames, self.meta = open_frames(spec.input, cfg)
+        self.gate = build_motion_gate(cfg)
+        self.tracker = NativeByteTracker(detector, ByteTracker.from_config(cfg["tracker"]))
+        self.counter = build_counter(site_cfg, cfg, scale=self.meta["scale"])
+        self.paths = ensure_dirs(out_dir)
+        self.origin = recording_start(SimpleNamespace(start=spec.start, input=spec.input), self.meta)
+        self.aggregator, self.sinks, self.closed_15 = build_aggregator(cfg, site_cfg, self.paths.counts_dir,
+                                                                       self.origin)
+        self.events: List = []
+        self.processed = 0
+        self.inferred = 0
+        self.error: Optional[str] = None
+
+        # scheduler state, guarded by the scheduler's condition
+        self.buf: deque = deque()
+        self.done = False
+        self.deficit = 0.0
+
+    def stop(self) -> None:
+        if self.source is not None:
+            self.source.stop()
+
+class MultiStreamScheduler:
+    """Reader threads -> per-stream queues -> weighted round-robin inference batches."""
+
+    def __init__(self, streams: List[Stream], batch_size: int, queue_frames: int = 4,
+                 batch_wait_sec: float = 0.02):
+        self.streams = streams
+        self.batch_size = max(1, int(batch_size))
+        self.queue_frames = max(1, int(queue_frames))
+        self.batch_wait_sec = batch_wait_sec
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._pos = 0
+        self._threads: List[threading.Thread] = []
+        self.batches_formed = 0
+        self.frames_batched = 0
+
+    def start(self) -> "MultiStreamScheduler":
+        for s in self.streams:
+            t = threading.Thread(target=self._read, args=(s,), name=f"read-{s.spec.name}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self) -> None:
+        """Stop reading; batches() ends once the frames already queued are handed out."""
+        self._stop.set()
+        for s in self.streams:
+            s.stop()
+        with self._cond:
+            self._cond.notify_all()
+
+    def join(self) -> None:
+        for t in self._threads:
+            t.join()
+
+    def _read(self, s: Stream) -> None:
+        frames = s.frames
+        try:
+            for pkt in frames:
+                on = s.gate.check(pkt.frame_bgr) if s.gate is not None else True
+                with self._cond:
+                    while len(s.buf) >= self.queue_frames and not self._stop.is_set():
+                        self._cond.wait()
+                    if self._stop.is_set():
+                        break
+                    s.buf.append((pkt, on))
+                    self._cond.notify_all()
+        except Exception as e:  # one failing camera must not stop the others
+            s.error = f"{type(e).__name__}: {e}"
+            print(f"⚠️  Stream '{s.spec.name}' stopped: {s.error}")
+        finally:
+            close = getattr(frames, "close", None)
+            if close is not None:
+                close()
+            with self._cond:
+                s.done = True
+                self._cond.notify_all()
+
+    def _ready(self) -> int:
+        return sum(len(s.buf) for s in self.streams)
+
+    def _take(self) -> list:
+        """Deficit round-robin over the streams with frames ready, up to batch_size frames."""
+        batch = []
+        n = len(self.streams)
+        while len(batch) < self.batch_size and self._ready():
+            s = self.streams[self._pos]
+            if s.buf:
+                if s.deficit < 1:
+                    s.deficit += s.spec.priority
+                while s.deficit >= 1 and s.buf and len(batch) < self.batch_size:
+                    pkt, on = s.buf.popleft()
+                    batch.append((s, pkt, on))
+                    s.deficit -= 1
+                if s.deficit >= 1 and s.buf:
+                    break  # batch is full; this stream continues its turn in the next batch
+                if not s.buf:
+                    s.deficit = 0.0  # ran out of frames: the rest of its turn is not banked
+            else:
+                s.deficit = 0.0
+            self._pos = (self._pos + 1) % n
+        return batch
+
+    def batches(self) -> Iterator[list]:
+        """Yields lists of (stream, FramePacket, run inference?) until every stream has ended."""
+        while True:
+            with self._cond:
+                while not self._ready() and not all(s.done for s in self.streams):
+                    self._cond.wait(0.5)
+                if not self._ready():
+                    return
+                # a moment for more cameras to deliver, so the batch is not sent half empty
+                deadline = time.monotonic() + self.batch_wait_sec
+                while self._ready() < self.batch_size and not all(s.done or len(s.buf) >= self.queue_frames
+                                                                  for s in self.streams):
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cond.wait(left)
+                batch = self._take()
+                self._cond.notify_all()
+            self.batches_formed += 1
+            self.frames_batched += len(batch)
+            yield batch
+
+def run_streams(specs: List[StreamSpec], cfg: dict, sites: dict, keep: set, out_root: str,
+                batch_size: int, queue_frames: int = 4, realtime: bool = False,
+                duration_sec: Optional[float] = None) -> dict:
+    """Process all streams with one detector -> host summary (also written to <out>/multistream_summary.json)."""
+    from src.detect.backends import backend_options
+    from src.detect.yolo_detector import YoloDetector
+    from src.process_video import store_events, open_event_store, write_15min_workbook
+    from src.track.batch import class_filter
+    from src.utils.pipeline import StagePipeline
+    from src.utils.profiling import RunProfiler
+
+    for spec in specs:
+        if spec.site not in sites:
+            raise SystemExit(f"❌ Stream '{spec.name}': site '{spec.site}' not calibrated")
+    ignored = [name for name, on in (("roi", cfg.get("roi", {}).get("enabled", False)),
+                                     ("cache", cfg.get("cache", {}).get("enabled", False)),
+                                     ("output.write_annotated_video",
+                                      cfg.get("output", {}).get("write_annotated_video", False))) if on]
+    if ignored:
+        print(f"⚠️  Not applied with several streams: {', '.join(ignored)}")
+    if cfg["tracker"].get("type", "bytetrack") != "native":
+        print("   Tracking each stream with the native ByteTracker (tracker.native settings)")
+
+    det_cfg = cfg["detector"]
+    t_start = time.perf_counter()
+    detector = YoloDetector(model_name=det_cfg["model"], conf=float(det_cfg["conf"]), iou=float(det_cfg["iou"]),
+                            imgsz=int(det_cfg["imgsz"]), **backend_options(det_cfg))
+    load_sec = time.perf_counter() - t_start
+    event_store = open_event_store(cfg)
+    streams = [Stream(spec, sites[spec.site], cfg, detector, os.path.join(out_root, spec.name), realtime,
+                      duration_sec) for spec in specs]
+    keep_table = class_filter(detector.names, keep) if keep else None
+    profiler = RunProfiler()
+
+    def detect_stage(items):
+        imgs = [pkt.frame_bgr for _, pkt, on in items if on]
+        t0 = time.perf_counter()
+        dets = iter(detector.detect_arrays(imgs) if imgs else [])
+        profiler.add("inference", time.perf_counter() - t0, len(imgs))
+        return [(s, pkt, next(dets) if on else None) for s, pkt, on in items]
+
+    def count_stage(items):
+        t_track = t_count = 0.0
+        for s, pkt, dets in items:
+            t0 = time.perf_counter()
+            tracked = s.tracker.update(dets)
+            t1 = time.perf_counter()
+            if keep_table is not None:
+                tracked = tracked.only(keep_table)
+            evs = s.counter.update(pkt.t_sec, tracked, rule_name=cfg["counting"]["rule"])
+            s.events.extend(evs)
+            s.aggregator.add(evs)
+            s.aggregator.advance(pkt.t_sec)
+            s.processed += 1
+            s.inferred += dets is not None
+            if s.source is not None:
+                s.source.mark_processed(pkt)
+            t_track += t1 - t0
+            t_count += time.perf_counter() - t1
+        profiler.add("tracking", t_track, len(items))
+        profiler.add("counting", t_count, len(items))
+
+    scheduler = MultiStreamScheduler(streams, batch_size, queue_frames)
+    engine_cfg = cfg.get("engine", {})
+    runner = StagePipeline(scheduler.batches(), [("inference", detect_stage), ("count", count_stage)],
+                           queue_size=int(engine_cfg.get("queue_size", 4)), profiler=profiler)
+    prev_sigint = None
+    if threading.current_thread() is threading.main_thread():
+        # Ctrl-C stops reading; frames already queued are counted and every stream writes its outputs
+        prev_sigint = signal.signal(signal.SIGINT, lambda *_: scheduler.stop())
+    t_run = time.perf_counter()
+    try:
+        scheduler.start()
+        runner.run()
+    finally:
+        scheduler.stop()
+        scheduler.join()
+        if prev_sigint is not None:
+            signal.signal(signal.SIGINT, prev_sigint)
+    elapsed = time.perf_counter() - t_run
+
+    total = sum(s.processed for s in streams)
+    rows = []
+    for s in streams:
+        s.aggregator.flush()
+        df_counts, csv_path, xlsx_path = write_15min_workbook(s.paths.counts_dir, s.aggregator, s.sinks,
+                                                              s.closed_15)
+        store_files = store_events(event_store, s.events, s.site_cfg["site_id"], s.origin, s.spec.input, s.live)
+        row = {
+            "name": s.spec.name,
+            "site_id": s.site_cfg["site_id"],
+            "input": s.spec.input,
+            "priority": s.spec.priority,
+            "events_total": len(s.events),
+            "frames_processed": s.processed,
+            "frames_inferred": s.inferred,
+            "frames_per_sec": round(s.processed / elapsed, 3) if elapsed > 0 else None,
+            "share": round(s.processed / total, 4) if total else None,
+            "error": s.error,
+        }
+        rows.append(row)
+        summary = {
+            "run_at": datetime.utcnow().isoformat() + "Z",
+            "input_video": s.spec.input if s.live else os.path.abspath(s.spec.input),
+            "site_id": s.site_cfg["site_id"],
+            "meta": s.meta,
+            "config": cfg,
+            "events_total": len(s.events),
+            "counts_rows": int(df_counts.shape[0]),
+            "perf": dict(mode="multistream", streams=len(streams), batch_size=scheduler.batch_size,
+                         frames_processed=s.processed, elapsed_sec=round(elapsed, 3),
+                         frames_per_sec=row["frames_per_sec"], share=row["share"]),
+            "outputs": {
+                "counts_csv": os.path.abspath(csv_path) if csv_path else None,
+                "counts_xlsx": os.path.abspath(xlsx_path),
+                "counts_by_resolution": {name: os.path.abspath(sink.path) for name, sink in s.sinks.items()},
+                "event_store": [os.path.abspath(p) for p in store_files] if store_files else None,
+            },
+        }
+        if s.gate is not None:
+            summary["inference_filters"] = {"motion_gate": s.gate.stats(), "frames_inferred": s.inferred}
+        if s.source is not None:
+            summary["live"] = s.source.stats()
+        write_json(summary, os.path.join(s.paths.out_dir, "run_summary.json"))
+
+    host = {
+        "run_at": datetime.utcnow().isoformat() + "Z",
+        "streams": rows,
+        "model": det_cfg["model"],
+        "model_load_sec": round(load_sec, 3),
+        "batch_size": scheduler.batch_size,
+        "batches": scheduler.batches_formed,
+        "mean_batch_fill": round(scheduler.frames_batched / scheduler.batches_formed / scheduler.batch_size, 3)
+        if scheduler.batches_formed else None,
+        "frames_processed": total,
+        "elapsed_sec": round(elapsed, 3),
+        "frames_per_sec": round(total / elapsed, 3) if elapsed > 0 else None,
+        "threaded": runner.threaded,
+        "profile": profiler.summary(total, time.perf_counter() - t_start),
+    }
+    write_json(host, os.path.join(out_root, "multistream_summary.json"))
+    return host
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Count several camera streams in one process with one shared model")
+    ap.add_argument("--streams", default=None, help="YAML file with a `streams:` list (see module docstring)")
+    ap.add_argument("--stream", action="append", default=[], help="SITE=INPUT; repeat for more streams")
+    ap.add_argument("--config", default="configs/pipeline.yaml")
+    ap.add_argument("--sites", default="configs/sites.yaml")
+    ap.add_argument("--classes", default="configs/classes.yaml")
+    ap.add_argument("--out", default="out/multistream")
+    ap.add_argument("--batch_size", type=int, default=None,
+                    help="Frames per inference call across streams (default: max(detector.batch_size, streams))")
+    ap.add_argument("--queue_frames", type=int, default=4, help="Frames read ahead per stream")
+    ap.add_argument("--realtime", action="store_true", help="Replay files as live streams at their native rate")
+    ap.add_argument("--duration", type=float, default=None, help="Live streams: stop after this many seconds")
+    args = ap.parse_args(argv)
+
+    specs = parse_streams(load_yaml(args.streams) if args.streams else None, args.stream)
+    if not specs:
+        raise SystemExit("❌ No streams: pass --streams FILE or --stream SITE=INPUT")
+    cfg = load_yaml(args.config)
+    sites = (load_yaml(args.sites) or {}).get("sites", {})
+    keep = set(load_yaml(args.classes).get("keep_classes", []))
+    batch_size = args.batch_size or max(int(cfg["detector"].get("batch_size", 1)), len(specs))
+
+    host = run_streams(specs, cfg, sites, keep, args.out, batch_size, args.queue_frames, args.realtime,
+                       args.duration)
+    print(f"✅ {len(specs)} streams, {host['frames_processed']} frames in {host['elapsed_sec']}s "
+          f"({host['frames_per_sec']} frames/s, batches {(host['mean_batch_fill'] or 0):.0%} full)")
+    for r in host["streams"]:
+        flag = f"  ⚠️  {r['error']}" if r["error"] else ""
+        print(f"   {r['name']:16} {r['frames_processed']:>7} frames  {r['events_total']:>5} events  "
+              f"share {(r['share'] or 0):.1%}{flag}")
+    print(f"   Summary: {os.path.join(args.out, 'multistream_summary.json')}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Time-sharded processing of a single long video.
+
+The video is split into N contiguous frame ranges ("owned" ranges) on the
+sampling step grid. Each shard starts decoding `shard_overlap_sec` earlier than
+its owned range so ByteTrack and the counter have established tracks by the
+time the owned range begins; events raised during that warm-up belong to the
+previous shard and are dropped. Every crossing therefore has exactly one owner
+and the merged event list needs no cross-shard de-duplication.
+
+Tolerance vs a sequential run: sampled frames and timestamps are identical, so
+differences can only come from track identity right after a shard boundary
+(a fresh tracker may assign IDs or confirm tracks differently than one that
+has run since frame 0). They are confined to the 15-minute buckets containing
+a boundary and are typically 0-1 vehicles per boundary when the overlap is
+longer than the time a vehicle needs to reach the line. count_once_per_video
+also only holds within a shard: a vehicle counted just before a boundary that
+crosses the line again inside the next shard's owned range is counted again.
+"""
+from __future__ import annotations
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Set, Tuple
+
+from tqdm import tqdm
+
+from src.ingest.video_reader import probe_video
+from src.utils.threads import limit_threads
+
+def plan_shards(total_frames: int, step: int, n: int, overlap_frames: int) -> List[Dict]:
+    """Split [0, total_frames) into n step-aligned owned ranges with warm-up starts."""
+    if total_frames <= 0:
+        raise RuntimeError("Video reports no frame count; --shards needs a seekable file")
+    bounds = [int(round(total_frames * k / n / step)) * step for k in range(n + 1)]
+    shards = []
+    for k in range(n):
+        start, end = bounds[k], bounds[k + 1]
+        if end <= start:
+            continue
+        warmup_from = max(0, (start - overlap_frames) // step * step)
+        shards.append(dict(index=len(shards), start_frame=start,
+                           # last shard reads to the real end of stream (frame counts can be off)
+                           end_frame=None if k == n - 1 else end,
+                           warmup_from=warmup_from))
+    return shards
+
+def run_shard(video_path: str, cfg: dict, site_cfg: dict, keep: Set[str], batch_size: int,
+              shard: Dict, tracker=None) -> Dict:
+    """Process one shard; a loaded `tracker` built from the same config is reset and reused."""
+    from src.process_video import build_counter, build_tracker, count_frames, open_frames, setup_inference_filters
+
+    t0 = time.perf_counter()
+    frame_iter, meta = open_frames(video_path, cfg, start_frame=shard["warmup_from"],
+                                   end_frame=shard["end_frame"])
+    if tracker is None:
+        tracker = build_tracker(cfg)
+    else:
+        tracker.reset()
+    counter = build_counter(site_cfg, cfg, scale=meta["scale"])
+    roi, gate, _ = setup_inference_filters(tracker, site_cfg, cfg, meta)
+    events, processed, _ = count_frames(frame_iter, tracker, counter, cfg, keep, batch_size, roi=roi, gate=gate)
+
+    # same expression the reader uses for t_sec, so the comparison is exact
+    t_owned = shard["start_frame"] / float(meta["src_fps"])
+    owned = [e for e in events if e.t_sec >= t_owned]
+    return dict(shard, meta=meta, events=owned, frames_processed=processed,
+                warmup_events_dropped=len(events) - len(owned),
+                elapsed_sec=round(time.perf_counter() - t0, 3))
+
+def merge_shard_events(results: List[Dict]) -> List:
+    """Concatenate per-shard owned events in time order."""
+    events = []
+    for r in sorted(results, key=lambda r: r["start_frame"]):
+        events.extend(r["events"])
+    events.sort(key=lambda e: e.t_sec)
+    return events
+
+def run_sharded(video_path: str, cfg: dict, site_cfg: dict, keep: Set[str], batch_size: int,
+                n_shards: int, workers: Optional[int] = None) -> Tuple[List, int, dict, List[Dict]]:
+    """Returns (events, frames_processed, meta, per-shard info)."""
+    probe = probe_video(video_path)
+    step = max(1, int(round(probe["src_fps"] / float(cfg["fps_infer"]))))
+    overlap_sec = float(cfg.get("engine", {}).get("shard_overlap_sec", 10.0))
+    overlap_frames = int(round(overlap_sec * probe["src_fps"]))
+    shards = plan_shards(probe["total_frames"], step, n_shards, overlap_frames)
+
+    workers = workers or len(shards)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+                             initializer=limit_threads, initargs=(threads,)) as pool:
+        futs = [pool.submit(run_shard, video_path, cfg, site_cfg, keep, batch_size, sh) for sh in shards]
+        for fut in tqdm(as_completed(futs), total=len(futs), desc="Shards"):
+            results.append(fut.result())
+
+    results.sort(key=lambda r: r["index"])
+    events = merge_shard_events(results)
+    processed = sum(r["frames_processed"] for r in results)
+    meta = dict(results[0]["meta"], shard_overlap_sec=overlap_sec)
+    info = [dict({k: v for k, v in r.items() if k not in ("events", "meta")}, events=len(r["events"]))
+            for r in results]
+    return events, processed, meta, info
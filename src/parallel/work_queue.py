@@ -0,0 +1,235 @@
+"""
+Work queue for distributed processing (src/parallel/distributed.py).
+
+Jobs are leased, not popped: a worker that takes a job holds it for
+`lease_sec` and must heartbeat() to keep it. A job whose lease runs out
+(worker crashed, node lost) goes back to the queue on the next lease() call
+by any worker, until it has failed `max_attempts` times. A worker that is
+stopped on purpose release()s its job, which does not count as an attempt.
+Every lease gets a
+fresh token; heartbeat / complete / fail with an old token are refused, so a
+job has at most one accepted result however often it was retried.
+
+Backends are chosen by URL:
+
+    sqlite:///shared/traffic/queue.db     SqliteWorkQueue (one file, safe for many processes on one host;
+                                          across nodes only on a filesystem with working locks)
+
+Other brokers plug in with register_backend("redis", factory) where
+factory(url) returns a WorkQueue subclass.
+"""
+from __future__ import annotations
+import abc
+import json
+import os
+import sqlite3
+import time
+import uuid
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+STATUSES = ("queued", "leased", "done", "failed")
+
+class Lease:
+    __slots__ = ("job_id", "token", "payload", "attempt")
+
+    def __init__(self, job_id: str, token: str, payload: dict, attempt: int):
+        self.job_id = job_id
+        self.token = token
+        self.payload = payload
+        self.attempt = attempt
+
+class WorkQueue(abc.ABC):
+    """Interface every backend implements. Payloads and results are JSON-serialisable dicts."""
+
+    @abc.abstractmethod
+    def submit(self, jobs: List[Tuple[str, dict]], max_attempts: int = 3, force: bool = False) -> int:
+        """Add (job_id, payload) jobs; existing ids are kept unless `force`. Returns how many were queued."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def lease(self, worker: str, lease_sec: float) -> Optional[Lease]:
+        """Requeue expired leases, then take the oldest queued job (None when there is none)."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def heartbeat(self, lease: Lease, lease_sec: float) -> bool:
+        """Extend a lease; False when it was lost (expired and requeued)."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def complete(self, lease: Lease, result: dict) -> bool:
+        """Store the job's result; False (result dropped) when the lease was lost."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def fail(self, lease: Lease, error: str) -> bool:
+        """Give a job back after an error: requeued, or failed for good after max_attempts."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def release(self, lease: Lease) -> bool:
+        """Give a job back unfinished (worker stopped): requeued without using up an attempt."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def counts(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def jobs(self, status: Optional[str] = None) -> List[dict]:
+        """Job records without results: job_id, status, attempts, worker, error, timestamps, payload."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def results(self) -> Iterator[Tuple[str, dict, dict]]:
+        """(job_id, payload, result) of every done job."""
+        raise NotImplementedError
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT UNIQUE NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    worker TEXT,
+    token TEXT,
+    lease_expires REAL,
+    submitted_at REAL,
+    started_at REAL,
+    finished_at REAL,
+    error TEXT,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, seq);
+"""
+
+class SqliteWorkQueue(WorkQueue):
+    def __init__(self, path: str, busy_timeout_sec: float = 30.0):
+        self.path = path
+        self.busy_timeout_sec = busy_timeout_sec
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # one short-lived connection per call: safe from heartbeat threads and forked workers
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_sec, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _write(self, sql_fn: Callable[[sqlite3.Connection], object]):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")  # take the write lock up front: no lease races
+            out = sql_fn(conn)
+            conn.execute("COMMIT")
+            return out
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def submit(self, jobs: List[Tuple[str, dict]], max_attempts: int = 3, force: bool = False) -> int:
+        now = time.time()
+
+        def tx(conn):
+            queued = 0
+            for job_id, payload in jobs:
+                if force:
+                    conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+                cur = conn.execute("INSERT OR IGNORE INTO jobs (job_id, payload, max_attempts, submitted_at) "
+                                   "VALUES (?, ?, ?, ?)", (job_id, json.dumps(payload), int(max_attempts), now))
+                queued += cur.rowcount
+            return queued
+        return self._write(tx)
+
+    def _requeue_expired(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("UPDATE jobs SET status = 'failed', token = NULL, error = 'lease expired', finished_at = ? "
+                     "WHERE status = 'leased' AND lease_expires < ? AND attempts >= max_attempts", (now, now))
+        conn.execute("UPDATE jobs SET status = 'queued', token = NULL, error = 'lease expired' "
+                     "WHERE status = 'leased' AND lease_expires < ?", (now,))
+
+    def lease(self, worker: str, lease_sec: float) -> Optional[Lease]:
+        def tx(conn):
+            now = time.time()
+            self._requeue_expired(conn, now)
+            row = conn.execute("SELECT job_id, payload, attempts FROM jobs WHERE status = 'queued' "
+                               "ORDER BY seq LIMIT 1").fetchone()
+            if row is None:
+                return None
+            token = uuid.uuid4().hex
+            conn.execute("UPDATE jobs SET status = 'leased', worker = ?, token = ?, lease_expires = ?, "
+                         "attempts = attempts + 1, started_at = ? WHERE job_id = ?",
+                         (worker, token, now + lease_sec, now, row["job_id"]))
+            return Lease(row["job_id"], token, json.loads(row["payload"]), row["attempts"] + 1)
+        return self._write(tx)
+
+    def heartbeat(self, lease: Lease, lease_sec: float) -> bool:
+        return self._write(lambda conn: conn.execute(
+            "UPDATE jobs SET lease_expires = ? WHERE job_id = ? AND token = ? AND status = 'leased'",
+            (time.time() + lease_sec, lease.job_id, lease.token)).rowcount == 1)
+
+    def complete(self, lease: Lease, result: dict) -> bool:
+        return self._write(lambda conn: conn.execute(
+            "UPDATE jobs SET status = 'done', result = ?, error = NULL, token = NULL, finished_at = ? "
+            "WHERE job_id = ? AND token = ? AND status = 'leased'",
+            (json.dumps(result), time.time(), lease.job_id, lease.token)).rowcount == 1)
+
+    def fail(self, lease: Lease, error: str) -> bool:
+        return self._write(lambda conn: conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END, "
+            "error = ?, token = NULL, finished_at = ? WHERE job_id = ? AND token = ? AND status = 'leased'",
+            (error, time.time(), lease.job_id, lease.token)).rowcount == 1)
+
+    def release(self, lease: Lease) -> bool:
+        return self._write(lambda conn: conn.execute(
+            "UPDATE jobs SET status = 'queued', attempts = attempts - 1, error = 'released', token = NULL "
+            "WHERE job_id = ? AND token = ? AND status = 'leased'", (lease.job_id, lease.token)).rowcount == 1)
+
+    def counts(self) -> Dict[str, int]:
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        finally:
+            conn.close()
+        out = dict.fromkeys(STATUSES, 0)
+        out.update({r["status"]: r["n"] for r in rows})
+        return out
+
+    def jobs(self, status: Optional[str] = None) -> List[dict]:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT job_id, status, attempts, max_attempts, worker, lease_expires, submitted_at, started_at, "
+                "finished_at, error, payload FROM jobs" + (" WHERE status = ?" if status else "") + " ORDER BY seq",
+                (status,) if status else ()).fetchall()
+        finally:
+            conn.close()
+        return [dict(r, payload=json.loads(r["payload"])) for r in rows]
+
+    def results(self) -> Iterator[Tuple[str, dict, dict]]:
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT job_id, payload, result FROM jobs WHERE status = 'done' ORDER BY seq")
+            for r in rows:
+                yield r["job_id"], json.loads(r["payload"]), json.loads(r["result"])
+        finally:
+            conn.close()
+
+QUEUE_BACKENDS: Dict[str, Callable[[str], WorkQueue]] = {
+    "sqlite": lambda url: SqliteWorkQueue(url.split("://", 1)[1]),
+}
+
+def register_backend(scheme: str, factory: Callable[[str], WorkQueue]) -> None:
+    QUEUE_BACKENDS[scheme] = factory
+
+def open_queue(url: str) -> WorkQueue:
+    """sqlite:///path/queue.db (a bare path ending in .db works too), or a registered scheme."""
+    scheme = url.split("://", 1)[0] if "://" in url else ("sqlite" if url.endswith((".db", ".sqlite")) else None)
+    if scheme not in QUEUE_BACKENDS:
+        raise ValueError(f"Unknown work queue '{url}'; expected one of "
+                         f"{', '.join(s + '://...' for s in QUEUE_BACKENDS)}")
+    return QUEUE_BACKENDS[scheme](url if "://" in url else f"sqlite://{url}")
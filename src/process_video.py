@@ -1,20 +1,37 @@
 """Main Phase 1 entrypoint - Video processing pipeline orchestrator."""
 from __future__ import annotations
 import argparse
+import math
 import os
+import signal
+import threading
+import time
 from datetime import datetime
-from tqdm import tqdm
+from typing import Callable, Iterable, List, Optional, Set, Tuple
 
 from src.utils.config import load_yaml, ensure_dirs
-from src.ingest.video_reader import iter_video_frames
-from src.track.tracker import UltralyticsByteTracker
+from src.ingest.video_reader import iter_video_frames, probe_video
+from src.ingest.live_stream import LiveFrameSource, is_live_source
+from src.ingest.adaptive_stride import AdaptiveStride, build_adaptive_stride
+from src.detect.backends import backend_options
+from src.detect.roi import (MotionGate, RegionOfInterest, build_motion_gate, roi_imgsz, shift_arrays,
+                            shift_tracked, site_roi)
+from src.detect.yolo_detector import YoloDetector
+from src.track.batch import TrackBatch, class_filter
+from src.track.bytetrack import ByteTracker
+from src.track.tracker import NativeByteTracker, UltralyticsByteTracker
+from src.track.cache import TrackCache, TrackCacheWriter, cache_key
 from src.count.counter import LineCrossingCounter
-from src.aggregate.time_bucketing import events_to_15min_counts
-from src.export.csv_writer import write_csv
-from src.export.excel_writer import write_xlsx
+from src.count.zones import ZoneCounter, parse_zones
+from src.aggregate.online import OnlineAggregator, parse_recording_start, row_columns
+from src.export.csv_writer import CsvRowAppender
 from src.export.json_summary import write_json
+from src.utils.pipeline import StagePipeline, batched
+from src.utils.checkpoint import Checkpointer, WarmupCounter, checkpoint_key, load_checkpoint
+from src.utils.host_profile import apply_profile_threads, load_host_profile
+from src.utils.profiling import RunProfiler, code_profiler, write_prometheus
 
-def main():
+def build_arg_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser()
     ap.add_argument("--input", required=True, help="Path to video file")
     ap.add_argument("--site", required=True, help="site key in configs/sites.yaml (e.g., site_01)")
@@ -22,12 +39,416 @@ def main():
     ap.add_argument("--sites", default="configs/sites.yaml")
     ap.add_argument("--classes", default="configs/classes.yaml")
     ap.add_argument("--out", default="out")
-    args = ap.parse_args()
+    ap.add_argument("--batch_size", type=int, default=None,
+                    help="Frames per inference call (overrides the host profile and detector.batch_size; 1 = single-frame mode)")
+    ap.add_argument("--shards", type=int, default=1,
+                    help="Split the video into N time ranges processed in parallel worker processes")
+    ap.add_argument("--realtime", action="store_true",
+                    help="Treat --input as a live stream: replay a file at its native rate (RTSP/HTTP/device inputs are always live)")
+    ap.add_argument("--duration", type=float, default=None, help="Live mode: stop after this many seconds")
+    ap.add_argument("--start", default=None,
+                    help="Recording start 'YYYY-MM-DD HH:MM' for clock-aligned buckets (default: from siteNN_YYYYMMDD_HHMM file name)")
+    ap.add_argument("--profile", default=None,
+                    help="Save a profile of the frame loop here (.prof for cProfile, .html/.txt for pyinstrument); "
+                         "stages then run on one thread so the profiler sees all of them")
+    ap.add_argument("--profiler", choices=("cprofile", "pyinstrument"), default="cprofile")
+    ap.add_argument("--resume", action="store_true",
+                    help="Continue from this input's last checkpoint (see checkpoint: in the config); "
+                         "also turns checkpointing on")
+    ap.add_argument("--metrics_file", default=None,
+                    help="Write run metrics in Prometheus text format (overrides profiling.prometheus_file)")
+    return ap
 
+def open_live(source: str, cfg: dict, realtime: bool = False,
+              duration_sec: Optional[float] = None) -> LiveFrameSource:
+    live_cfg = cfg.get("live", {})
+    ingest_cfg = cfg.get("ingest", {})
+    max_reconnects = live_cfg.get("max_reconnects")
+    return LiveFrameSource(
+        source, fps_infer=float(cfg["fps_infer"]), realtime=realtime,
+        backoff_initial_sec=float(live_cfg.get("reconnect_backoff_sec", 1.0)),
+        backoff_max_sec=float(live_cfg.get("reconnect_backoff_max_sec", 30.0)),
+        max_reconnects=int(max_reconnects) if max_reconnects is not None else None,
+        duration_sec=duration_sec,
+        resize_to=int(cfg["detector"]["imgsz"]) if ingest_cfg.get("resize_to_imgsz", False) else None
+    )
+
+def open_frames(video_path: str, cfg: dict, start_frame: int = 0, end_frame: Optional[int] = None,
+                stride: Optional[Callable[[], int]] = None):
+    ingest_cfg = cfg.get("ingest", {})
+    return iter_video_frames(
+        video_path, fps_infer=float(cfg["fps_infer"]),
+        decode_mode=ingest_cfg.get("decode_mode", "read"),
+        resize_to=int(cfg["detector"]["imgsz"]) if ingest_cfg.get("resize_to_imgsz", False) else None,
+        start_frame=start_frame, end_frame=end_frame, stride=stride
+    )
+
+def site_line(site_cfg: dict, scale: float = 1.0) -> Tuple[tuple, tuple]:
+    # counting line is calibrated on source pixels; follow any decode-time resize
+    p1 = tuple(v * scale for v in site_cfg["line"]["p1"])
+    p2 = tuple(v * scale for v in site_cfg["line"]["p2"])
+    return p1, p2
+
+def build_tracker(cfg: dict):
+    """tracker.type: bytetrack -> Ultralytics model.track; native -> YoloDetector + vectorized ByteTrack."""
+    det_cfg = cfg["detector"]
+    if cfg["tracker"].get("type", "bytetrack") == "native":
+        detector = YoloDetector(
+            model_name=det_cfg["model"],
+            conf=float(det_cfg["conf"]),
+            iou=float(det_cfg["iou"]),
+            imgsz=int(det_cfg["imgsz"]),
+            **backend_options(det_cfg)
+        )
+        return NativeByteTracker(detector, ByteTracker.from_config(cfg["tracker"]))
+    return UltralyticsByteTracker(
+        model_name=det_cfg["model"],
+        conf=float(det_cfg["conf"]),
+        iou=float(det_cfg["iou"]),
+        imgsz=int(det_cfg["imgsz"]),
+        tracker_cfg=cfg["tracker"]["cfg"],
+        **backend_options(det_cfg)
+    )
+
+def uses_zones(site_cfg: dict, cfg: dict) -> bool:
+    """Multi-zone engine for zone lists, directional lines and roi_entry; plain line otherwise."""
+    return bool(site_cfg.get("zones")) or site_cfg.get("direction", "any") != "any" \
+        or cfg["counting"]["rule"] == "roi_entry"
+
+def count_keys(site_cfg: dict, cfg: dict) -> Tuple[str, ...]:
+    """Extra columns the 15-minute table is split by."""
+    return ("zone_id", "direction") if uses_zones(site_cfg, cfg) else ()
+
+def build_counter(site_cfg: dict, cfg: dict, scale: float = 1.0):
+    counter_cfg = cfg["counting"]
+    idle = counter_cfg.get("track_idle_sec", 60)
+    max_idle_sec = float(idle) if idle is not None else None
+    if uses_zones(site_cfg, cfg):
+        zones = parse_zones(site_cfg, scale)
+        if counter_cfg["rule"] == "roi_entry" and not any(z.kind == "polygon" for z in zones):
+            raise SystemExit(f"❌ counting.rule is roi_entry but site '{site_cfg['site_id']}' has no polygon zone")
+        return ZoneCounter(
+            site_id=site_cfg["site_id"],
+            zones=zones,
+            min_track_age_frames=int(counter_cfg["min_track_age_frames"]),
+            count_once_per_video=bool(counter_cfg["count_once_per_video"]),
+            max_idle_sec=max_idle_sec
+        )
+    p1, p2 = site_line(site_cfg, scale)
+    return LineCrossingCounter(
+        site_id=site_cfg["site_id"],
+        p1=p1, p2=p2,
+        min_track_age_frames=int(counter_cfg["min_track_age_frames"]),
+        count_once_per_video=bool(counter_cfg["count_once_per_video"]),
+        max_idle_sec=max_idle_sec
+    )
+
+def build_aggregator(cfg: dict, site_cfg: dict, counts_dir: str, origin: Optional[datetime]):
+    """OnlineAggregator that streams each closed bucket to counts_<N>min.csv / counts_daily.csv."""
+    agg_cfg = cfg.get("aggregation", {})
+    extra_keys = count_keys(site_cfg, cfg)
+    # 15 min is always kept: counts_15min.csv / .xlsx are the standard deliverable
+    minutes = sorted({15, *(int(m) for m in agg_cfg.get("bucket_minutes", [15]))})
+    daily = bool(agg_cfg.get("daily", True)) and origin is not None
+    sinks = {f"{m}min": CsvRowAppender(os.path.join(counts_dir, f"counts_{m}min.csv"),
+                                       row_columns(extra_keys, with_clock=origin is not None))
+             for m in minutes}
+    if daily:
+        sinks["daily"] = CsvRowAppender(os.path.join(counts_dir, "counts_daily.csv"),
+                                        row_columns(extra_keys, daily=True))
+    closed_15: List[dict] = []
+
+    def on_close(name, rows):
+        sinks[name].write(rows)
+        if name == "15min":
+            closed_15.extend(rows)
+
+    agg = OnlineAggregator(minutes, origin=origin, extra_keys=extra_keys, daily=daily, on_close=on_close)
+    return agg, sinks, closed_15
+
+def source_roi(site_cfg: dict, cfg: dict, width: int, height: int) -> Optional[RegionOfInterest]:
+    """Site ROI in source pixels when roi.enabled, else None."""
+    roi_cfg = cfg.get("roi", {})
+    if not roi_cfg.get("enabled", False):
+        return None
+    return site_roi(site_cfg, width, height, pad_px=float(roi_cfg.get("pad_px", 150)))
+
+def setup_inference_filters(tracker, site_cfg: dict, cfg: dict, meta: dict):
+    """
+    ROI crop and motion gate for one run -> (roi in decoded-frame pixels, gate, info).
+    The detector imgsz follows the crop so objects keep their full-frame pixel size.
+    """
+    roi, info = None, {}
+    src_roi = source_roi(site_cfg, cfg, meta["width"], meta["height"])
+    if src_roi is not None:
+        fw, fh = meta["frame_width"], meta["frame_height"]
+        roi = src_roi.scaled(meta["scale"], fw, fh)
+        full_imgsz = int(cfg["detector"]["imgsz"])
+        imgsz = roi_imgsz(full_imgsz, roi, fw, fh)
+        if hasattr(tracker, "detector"):
+            tracker.detector.imgsz = imgsz
+        tracker.imgsz = imgsz
+        # letterboxed input pixels (rect inference pads each side to a multiple of 32)
+        full_px = full_imgsz * math.ceil(min(fw, fh) * full_imgsz / max(fw, fh) / 32) * 32
+        roi_px = imgsz * math.ceil(min(roi.width, roi.height) * imgsz / max(roi.width, roi.height) / 32) * 32
+        info["roi"] = {"box": src_roi.as_list(), "imgsz": imgsz,
+                       "input_pixel_frac": round(roi_px / float(full_px), 4)}
+    return roi, build_motion_gate(cfg), info
+
+def inference_filter_stats(info: dict, gate: Optional[MotionGate], stats: dict, processed: int) -> dict:
+    """Skip rate and estimated speed-up of ROI + gate vs full-frame inference on every frame."""
+    out = dict(info)
+    speedup = 1.0 / info["roi"]["input_pixel_frac"] if "roi" in info else 1.0
+    if gate is not None:
+        out["motion_gate"] = gate.stats()
+    inferred = stats.get("frames_inferred", 0)
+    spent = stats.get("infer_sec", 0.0) + stats.get("gate_sec", 0.0)
+    if inferred and spent > 0:
+        # skipped frames would have cost as much as the ones that ran
+        speedup *= (stats["infer_sec"] / inferred * processed) / spent
+    out.update(frames_inferred=inferred,
+               skip_rate=round(1.0 - inferred / processed, 4) if processed else 0.0,
+               gate_ms_per_frame=round(1000.0 * stats.get("gate_sec", 0.0) / processed, 3) if processed else None,
+               est_speedup=round(speedup, 2))
+    return out
+
+def inference_filter_key(site_cfg: dict, cfg: dict, width: int, height: int) -> dict:
+    """ROI / motion gate settings a track cache was recorded with."""
+    extra = {}
+    src_roi = source_roi(site_cfg, cfg, width, height)
+    if src_roi is not None:
+        extra["roi"] = src_roi.as_list()
+    if cfg.get("motion_gate", {}).get("enabled", False):
+        extra["motion_gate"] = cfg["motion_gate"]
+    if cfg.get("adaptive_stride", {}).get("enabled", False):
+        extra["adaptive_stride"] = cfg["adaptive_stride"]
+    return extra
+
+def open_cache_writer(video_path: str, cfg: dict, extra: Optional[dict] = None) -> Optional[TrackCacheWriter]:
+    cache_cfg = cfg.get("cache", {})
+    if not cache_cfg.get("enabled", False):
+        return None
+    key, inputs = cache_key(video_path, cfg)
+    return TrackCacheWriter(cache_cfg.get("dir", "cache/tracks"), key, inputs, recorded_with=extra)
+
+def open_event_store(cfg: dict):
+    store_cfg = cfg.get("store", {})
+    if not store_cfg.get("enabled", False):
+        return None
+    from src.store.events import EventStore
+    return EventStore(store_cfg.get("dir", "store/events"))
+
+def store_events(store, events: List, site_id: str, origin: Optional[datetime], source: str,
+                 live: bool = False) -> Optional[List[str]]:
+    """Replace this input's events in the event store -> files written (None when not stored)."""
+    if store is None:
+        return None
+    if origin is None:
+        print("⚠️  Events not stored: recording start unknown (use --start or a siteNN_YYYYMMDD_HHMM file name)")
+        return None
+    from src.store.events import video_id
+    vid = f"live-{origin:%Y%m%dT%H%M%S}" if live else video_id(source)
+    return store.write_run(events, site_id, origin, vid, source=source)
+
+def write_15min_workbook(counts_dir: str, aggregator: OnlineAggregator, sinks: dict, closed_15: List[dict]):
+    """The CSVs are streamed as buckets close; the workbook is written once at the end."""
+    import pandas as pd
+    from src.export.excel_writer import write_xlsx
+
+    csv_15 = sinks["15min"]
+    df_counts = pd.DataFrame(closed_15, columns=csv_15.columns)
+    xlsx_path = os.path.join(counts_dir, "counts_15min.xlsx")
+    write_xlsx(df_counts, xlsx_path)
+    return df_counts, csv_15.path, xlsx_path
+
+def recording_start(args, meta: dict) -> Optional[datetime]:
+    if getattr(args, "start", None):
+        return datetime.strptime(args.start, "%Y-%m-%d %H:%M")
+    if meta.get("start_epoch") is not None:
+        return datetime.fromtimestamp(meta["start_epoch"])
+    return parse_recording_start(args.input)
+
+class EventTally:
+    """Stands in for the events list when only their number is needed (len())."""
+
+    def __init__(self):
+        self.total = 0
+
+    def extend(self, evs) -> None:
+        self.total += len(evs)
+
+    def __len__(self) -> int:
+        return self.total
+
+def count_frames(frame_iter: Iterable, tracker, counter, cfg: dict, keep: Set[str], batch_size: int,
+                 on_frame: Optional[Callable] = None, progress=None, on_counted: Optional[Callable] = None,
+                 aggregator: Optional[OnlineAggregator] = None, cache_writer: Optional[TrackCacheWriter] = None,
+                 roi: Optional[RegionOfInterest] = None, gate: Optional[MotionGate] = None,
+                 stats: Optional[dict] = None, stride_controller: Optional[AdaptiveStride] = None,
+                 profiler: Optional[RunProfiler] = None, checkpointer: Optional[Checkpointer] = None,
+                 keep_events: bool = True):
+    """
+    Run infer -> count over `frame_iter` as pipelined stages.
+    `on_frame(pkt, tracked)` is called from the count stage and must only hand the
+    frame off (AnnotationSink.submit); drawing and encoding happen on the sink's thread.
+    Events are also fed to `aggregator` as they happen, closing buckets on the go;
+    `cache_writer` records the unfiltered tracker output for `python -m src.recount`.
+    With `roi` the detector sees only that crop; with `gate` frames without
+    motion skip inference. `stats` (if given) receives inference/gate timings.
+    `stride_controller` is shown every frame's tracks (and the tracker's unconfirmed
+    ones) to pick the reader's next step.
+    `profiler` receives per-stage busy time, per-frame latency and queue depths.
+    `checkpointer` saves tracker, gate and counter state every few minutes of video.
+    With `keep_events` False the returned events are an EventTally (their number only).
+
+    Returns (events, frames_processed, runner).
+    """
+    rule = cfg["counting"]["rule"]
+    engine_cfg = cfg.get("engine", {})
+    keep_table = class_filter(tracker.names, keep) if keep else None
+    events = [] if keep_events else EventTally()
+    processed = 0
+    if stats is None:
+        stats = {}
+    stats.update(frames_inferred=0, infer_sec=0.0, gate_sec=0.0)
+    if profiler is None:
+        profiler = RunProfiler()
+
+    def decoded():
+        for pkt in profiler.timed_iter(frame_iter, "decode"):
+            profiler.frame_in(pkt.frame_index)
+            yield pkt
+
+    # Stages run on their own threads: decode (-> gate) -> infer -> count
+    # (detect -> track instead of infer for the native tracker).
+    # Each item is a batch of frames so batched inference keeps working.
+    def gate_stage(pkts):
+        t0 = time.perf_counter()
+        out = []
+        for pkt in pkts:
+            img = roi.crop(pkt.frame_bgr) if roi is not None else pkt.frame_bgr
+            out.append((pkt, img, gate.check(img) if gate is not None else True))
+            if gate is not None and checkpointer is not None and checkpointer.due("gate", pkt.t_sec):
+                checkpointer.capture(pkt.frame_index, "gate", gate.snapshot())
+        dt = time.perf_counter() - t0
+        stats["gate_sec"] += dt
+        profiler.add("gate", dt)
+        return out
+
+    def run_active(items, fn, stage):
+        """fn over the images of active frames (one call); None for skipped frames."""
+        active = [img for _, img, on in items if on]
+        t0 = time.perf_counter()
+        results = iter(fn(active) if active else [])
+        dt = time.perf_counter() - t0
+        stats["infer_sec"] += dt
+        profiler.add(stage, dt)
+        stats["frames_inferred"] += len(active)
+        return [(pkt, next(results) if on else None) for pkt, _, on in items]
+
+    def detect_stage(items):
+        out = run_active(items, tracker.detect, "inference")
+        if roi is not None:
+            out = [(pkt, shift_arrays(d, roi.x1, roi.y1) if d is not None else None) for pkt, d in out]
+        return out
+
+    def track_stage(items):
+        # a skipped frame leaves the tracks as they are: none is moved, lost or aged (as with Ultralytics)
+        with profiler.section("tracking"):
+            out = []
+            for pkt, dets in items:
+                out.append((pkt, tracker.update(dets)))
+                if checkpointer is not None and checkpointer.due("tracker", pkt.t_sec):
+                    checkpointer.capture(pkt.frame_index, "tracker", tracker.snapshot())
+            return out
+
+    def infer_stage(items):
+        out = []
+        # Ultralytics runs detection and tracking in one call; reported as inference
+        for pkt, tracked in run_active(items, tracker.track_frames, "inference"):
+            if tracked is None:
+                tracked = TrackBatch.empty(tracker.names)
+            elif roi is not None:
+                tracked = shift_tracked(tracked, roi.x1, roi.y1)
+            out.append((pkt, tracked))
+        return out
+
+    def count_stage(items):
+        nonlocal processed
+        clock = time.perf_counter
+        t_cache = t_count = t_agg = t_ann = 0.0
+        for pkt, tracked in items:
+            t0 = clock()
+            if cache_writer is not None:
+                cache_writer.add(pkt.t_sec, pkt.frame_index, tracked)
+            t1 = clock()
+            # filter classes (Phase 1)
+            if keep_table is not None:
+                tracked = tracked.only(keep_table)
+            if stride_controller is not None:
+                stride_controller.observe(pkt.t_sec, tracked, getattr(tracker, "pending_tracks", 0))
+
+            evs = counter.update(pkt.t_sec, tracked, rule_name=rule)
+            events.extend(evs)
+            t2 = clock()
+            if aggregator is not None:
+                aggregator.add(evs)
+                aggregator.advance(pkt.t_sec)
+            t3 = clock()
+            if on_frame is not None:
+                on_frame(pkt, tracked)
+            t4 = clock()
+            if checkpointer is not None and checkpointer.due("count", pkt.t_sec):
+                with profiler.section("checkpoint"):
+                    checkpointer.save(pkt, counter, events)
+            t_cache += t1 - t0
+            t_count += t2 - t1
+            t_agg += t3 - t2
+            t_ann += t4 - t3
+            profiler.frame_out(pkt.frame_index)
+            if on_counted is not None:
+                on_counted(pkt)
+        profiler.add("counting", t_count, len(items))
+        if cache_writer is not None:
+            profiler.add("track_cache", t_cache, len(items))
+        if aggregator is not None:
+            profiler.add("aggregation", t_agg, len(items))
+        if on_frame is not None:
+            profiler.add("annotation", t_ann, len(items))
+        processed += len(items)
+        if progress is not None:
+            progress.update(len(items))
+
+    if getattr(tracker, "separate_stages", False):
+        stages = [("detect", detect_stage), ("track", track_stage), ("count", count_stage)]
+    else:
+        stages = [("infer", infer_stage), ("count", count_stage)]
+    if roi is not None or gate is not None:
+        stages.insert(0, ("gate", gate_stage))
+    else:
+        first_name, first_fn = stages[0]
+        stages[0] = (first_name, lambda pkts: first_fn([(pkt, pkt.frame_bgr, True) for pkt in pkts]))
+
+    runner = StagePipeline(batched(decoded(), batch_size), stages,
+                           queue_size=int(engine_cfg.get("queue_size", 4)),
+                           threaded=bool(engine_cfg.get("threaded", True)), profiler=profiler)
+    runner.run()
+    return events, processed, runner
+
+def main(argv=None):
+    run(build_arg_parser().parse_args(argv))
+
+def run(args, tracker=None, progress=None) -> dict:
+    """
+    One processing run. A long-lived caller (src/server.py) can pass a loaded
+    `tracker` built from the same config, which is reset and reused instead of
+    loading the model again, and a `progress` object with update(n) in place of
+    the tqdm bar.
+    """
     cfg = load_yaml(args.config)
     sites_doc = load_yaml(args.sites)
     sites = (sites_doc or {}).get("sites", {})
-    
+
     # Validate site calibration
     if args.site not in sites:
         raise SystemExit(
@@ -36,103 +457,269 @@ def main():
             f"  python -m src.tools.calibrate_site --video {args.input} --site {args.site}\n"
             f"Then rerun processing."
         )
-    
+
     keep = set(load_yaml(args.classes).get("keep_classes", []))
 
     site_cfg = sites[args.site]
     site_id = site_cfg["site_id"]
-    p1 = tuple(site_cfg["line"]["p1"])
-    p2 = tuple(site_cfg["line"]["p2"])
 
     paths = ensure_dirs(args.out)
 
-    fps_infer = float(cfg["fps_infer"])
-    frame_iter, meta = iter_video_frames(args.input, fps_infer=fps_infer)
-
     det_cfg = cfg["detector"]
-    trk_cfg = cfg["tracker"]
-    counter_cfg = cfg["counting"]
     out_cfg = cfg["output"]
+    # tuned thread counts and batch size for this host (python -m src.tools.autotune)
+    host_profile = load_host_profile(cfg)
+    apply_profile_threads(host_profile)
+    profile_batch = host_profile["settings"]["batch_size"] if host_profile is not None else None
+    batch_size = max(1, int(args.batch_size or profile_batch or det_cfg.get("batch_size", 1)))
+    shards = max(1, int(getattr(args, "shards", 1) or 1))
 
-    tracker = UltralyticsByteTracker(
-        model_name=det_cfg["model"],
-        conf=float(det_cfg["conf"]),
-        iou=float(det_cfg["iou"]),
-        imgsz=int(det_cfg["imgsz"]),
-        tracker_cfg=trk_cfg["cfg"]
-    )
-
-    counter = LineCrossingCounter(
-        site_id=site_id,
-        p1=p1, p2=p2,
-        min_track_age_frames=int(counter_cfg["min_track_age_frames"]),
-        count_once_per_video=bool(counter_cfg["count_once_per_video"])
-    )
-
-    # Optional annotated writer
-    writer = None
+    live = is_live_source(args.input) or bool(getattr(args, "realtime", False))
+    native = cfg["tracker"].get("type", "bytetrack") == "native"
+    adaptive = bool(cfg.get("adaptive_stride", {}).get("enabled", False))
+    if adaptive and (live or shards > 1):
+        print("⚠️  adaptive_stride applies to single-process file runs; using fixed fps_infer")
+        adaptive = False
+    ckpt_cfg = cfg.get("checkpoint", {})
+    resume = bool(getattr(args, "resume", False))
+    checkpointing = resume or bool(ckpt_cfg.get("enabled", False))
+    if checkpointing and (live or shards > 1 or adaptive):
+        print("⚠️  Checkpoints apply to single-process file runs without adaptive_stride; running without them")
+        checkpointing = resume = False
     ann_path = None
-    if out_cfg.get("write_annotated_video", False):
-        import cv2
-        from src.export.video_annotator import draw_line, draw_tracks
-        ann_path = os.path.join(paths.annotated_dir, f"{site_id}_annotated.mp4")
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-        writer = cv2.VideoWriter(ann_path, fourcc, float(out_cfg.get("annotated_fps", 20)),
-                                 (meta["width"], meta["height"]))
-    else:
-        draw_line = draw_tracks = None
+    cache_path = None
+    shard_info = None
+    stage_timings = None
+    filter_summary = None
+    annotation_stats = None
+    infer_stats: dict = {}
+    source = None
+    stride_ctl = None
+    checkpointer = None
+    ckpt = None
+    profiler = RunProfiler()
+    profile_path = getattr(args, "profile", None)
+    event_store = open_event_store(cfg)  # before the run, so a missing pyarrow fails fast
+    t_start = time.perf_counter()
 
-    events = []
-    processed = 0
-
-    for pkt in tqdm(frame_iter, desc="Processing"):
-        tracked = tracker.track_frame(pkt.frame_bgr)
-        # filter classes (Phase 1)
-        if keep:
-            tracked = [o for o in tracked if o.cls_name in keep]
+    if shards > 1 and live:
+        raise SystemExit("❌ --shards needs a finished video file, not a live stream")
+    if shards > 1:
+        from src.parallel.shards import run_sharded
+        if out_cfg.get("write_annotated_video", False):
+            print("⚠️  Annotated video is not written in --shards mode")
+        if profile_path:
+            print("⚠️  --profile is not supported with --shards; profile a single-process run instead")
+        events, processed, meta, shard_info = run_sharded(
+            args.input, cfg, site_cfg, keep, batch_size, shards)
+        origin = recording_start(args, meta)
+        aggregator, sinks, closed_15 = build_aggregator(cfg, site_cfg, paths.counts_dir, origin)
+        aggregator.add(events)
+        threaded = bool(cfg.get("engine", {}).get("threaded", True))
+    else:
+        # before a live source starts: frames that arrive while the model loads are dropped
+        if tracker is None:
+            tracker = build_tracker(cfg)
+        else:
+            tracker.reset()
+        if live:
+            source = open_live(args.input, cfg, realtime=True, duration_sec=getattr(args, "duration", None))
+            meta = source.start()
+            frame_iter = iter(source)
+            # a short queue keeps latency low; the source drops frames instead
+            cfg_run = dict(cfg, engine=dict(cfg.get("engine", {}),
+                                            queue_size=int(cfg.get("live", {}).get("queue_size", 1))))
+        elif adaptive:
+            # the reader asks the controller (built once meta is known) for each next step
+            frame_iter, meta = open_frames(args.input, cfg, stride=lambda: stride_ctl())
+            # decisions reach the reader only after the queued frames; keep that lag short
+            cfg_run = dict(cfg, engine=dict(cfg.get("engine", {}), queue_size=1))
+        else:
+            start_frame = 0
+            if checkpointing:
+                ckpt_path = os.path.join(ckpt_cfg.get("dir", "checkpoints"), "{}_{}.npz".format(
+                    site_id, checkpoint_key(args.input, cfg, site_cfg, keep, getattr(args, "start", None))))
+                ckpt = load_checkpoint(ckpt_path) if resume else None
+                if resume and ckpt is None:
+                    print("⚠️  --resume: no checkpoint for this video and config; starting from the beginning")
+                if ckpt is not None:
+                    start_frame = ckpt["frame_index"] + 1
+                    if not native:
+                        # Ultralytics' tracker cannot be restored: rebuild tracks over a short overlap
+                        overlap = float(ckpt_cfg.get("resume_overlap_sec", 10))
+                        src_fps = probe_video(args.input)["src_fps"]
+                        start_frame = max(0, start_frame - int(round(overlap * src_fps)))
+            frame_iter, meta = open_frames(args.input, cfg, start_frame=start_frame)
+            cfg_run = cfg
+        if profile_path:
+            # cProfile / pyinstrument only see the calling thread
+            cfg_run = dict(cfg_run, engine=dict(cfg_run.get("engine", {}), threaded=False))
+        counter = build_counter(site_cfg, cfg, scale=meta["scale"])
+        origin = recording_start(args, meta)
+        aggregator, sinks, closed_15 = build_aggregator(cfg, site_cfg, paths.counts_dir, origin)
+        roi, gate, filter_info = setup_inference_filters(tracker, site_cfg, cfg, meta)
+        if ckpt is not None and (cfg.get("cache", {}).get("enabled", False) or
+                                 out_cfg.get("write_annotated_video", False)):
+            print("⚠️  Resumed run: track cache and annotated video cover whole runs and are not written")
+        cache_writer = open_cache_writer(
+            args.input, cfg, inference_filter_key(site_cfg, cfg, meta["width"], meta["height"])) \
+            if not live and ckpt is None else None
+        zones = parse_zones(site_cfg, meta["scale"])
+        stride_ctl = build_adaptive_stride(cfg, meta["src_fps"], zones) if adaptive else None
 
-        evs = counter.update(pkt.t_sec, tracked, rule_name=counter_cfg["rule"])
-        events.extend(evs)
+        # Optional annotated video: live -> background sink fed from the count stage;
+        # deferred -> rendered from the track cache after the run
+        ann_sink = None
+        on_frame = None
+        if out_cfg.get("write_annotated_video", False) and ckpt is None:
+            ann_path = os.path.join(paths.annotated_dir, f"{site_id}_annotated.mp4")
+            ann_mode = out_cfg.get("annotated_mode", "live")
+            if ann_mode == "deferred" and cache_writer is None:
+                print("⚠️  annotated_mode: deferred needs cache.enabled and a video file; drawing during the run")
+                ann_mode = "live"
+            if ann_mode == "live":
+                from src.export.annotation_sink import build_annotation_sink
+                ann_sink = build_annotation_sink(ann_path, out_cfg, (meta["frame_width"], meta["frame_height"]),
+                                                 float(cfg["fps_infer"]), zones=zones, roi=roi).start()
+                on_frame = lambda pkt, tracked: ann_sink.submit(pkt.frame_bgr, tracked)
 
-        if writer is not None:
-            frame = pkt.frame_bgr.copy()
-            draw_line(frame, p1, p2)
-            draw_tracks(frame, tracked)
-            writer.write(frame)
+        if checkpointing:
+            parts = (("tracker",) + (("gate",) if gate is not None else ())) if native else ()
+            if ckpt is not None:
+                if native:
+                    tracker.restore(ckpt["parts"]["tracker"])
+                    counter.restore(ckpt["parts"]["counter"])
+                    if gate is not None:
+                        gate.restore(ckpt["parts"]["gate"])
+                else:
+                    counter = WarmupCounter(counter, until=ckpt["t_sec"])
+                aggregator.add(ckpt["events"])
+                aggregator.advance(ckpt["t_sec"])
+                print(f"⏭️  Resuming after {ckpt['t_sec']:.1f}s (frame {ckpt['frame_index']}) "
+                      f"with {len(ckpt['events'])} events from the checkpoint")
+            checkpointer = Checkpointer(ckpt_path, float(ckpt_cfg.get("interval_sec", 300)), parts=parts,
+                                        prior_events=ckpt["events"] if ckpt is not None else None,
+                                        not_before=ckpt["t_sec"] if ckpt is not None else -1.0)
 
-        processed += 1
+        # live: Ctrl-C ends the stream and the run still writes its outputs
+        prev_sigint = None
+        if source is not None and threading.current_thread() is threading.main_thread():
+            prev_sigint = signal.signal(signal.SIGINT, lambda *_: source.stop())
 
-    if writer is not None:
-        writer.release()
+        if progress is None:
+            from tqdm import tqdm
+            pbar = tqdm(desc="Processing", unit="frame")
+        else:
+            pbar = progress
+        try:
+            with code_profiler(profile_path, getattr(args, "profiler", "cprofile")):
+                events, processed, runner = count_frames(
+                    frame_iter, tracker, counter, cfg_run, keep, batch_size, on_frame=on_frame, progress=pbar,
+                    on_counted=source.mark_processed if source is not None else None, aggregator=aggregator,
+                    cache_writer=cache_writer, roi=roi, gate=gate, stats=infer_stats, stride_controller=stride_ctl,
+                    profiler=profiler, checkpointer=checkpointer,
+                    # a live run may go on for days: keep only the number of events unless they are stored
+                    keep_events=not live or event_store is not None)
+        finally:
+            if progress is None:
+                pbar.close()
+            if ann_sink is not None:
+                annotation_stats = ann_sink.close()
+            if source is not None:
+                source.stop()
+            if prev_sigint is not None:
+                signal.signal(signal.SIGINT, prev_sigint)
+        threaded = runner.threaded
+        if ckpt is not None:
+            events = ckpt["events"] + events
+        if hasattr(tracker, "timings"):
+            stage_timings = tracker.timings()
+        if roi is not None or gate is not None:
+            filter_summary = inference_filter_stats(filter_info, gate, infer_stats, processed)
+        if cache_writer is not None:
+            with profiler.section("export"):
+                cache_path = cache_writer.close(meta)
+        if ann_path is not None and ann_sink is None:
+            from src.tools.render_annotated import render_from_cache
+            annotation_stats = render_from_cache(args.input, TrackCache(cache_path), site_cfg, out_cfg, keep, ann_path)
+        if annotation_stats is not None:
+            # drawn / encoded on the sink's thread
+            profiler.add("annotation", annotation_stats["draw_sec"], 0)
+            profiler.add("encoding", annotation_stats["encode_sec"], annotation_stats["frames_written"])
 
-    df_counts = events_to_15min_counts(events)
+    with profiler.section("aggregation"):
+        aggregator.flush()
+    elapsed = time.perf_counter() - t_start
 
-    csv_path = os.path.join(paths.counts_dir, "counts_15min.csv")
-    xlsx_path = os.path.join(paths.counts_dir, "counts_15min.xlsx")
-    write_csv(df_counts, csv_path)
-    write_xlsx(df_counts, xlsx_path)
+    with profiler.section("export"):
+        df_counts, csv_path, xlsx_path = write_15min_workbook(paths.counts_dir, aggregator, sinks, closed_15)
+        store_files = store_events(event_store, events, site_id, origin, args.input, live)
 
     summary = {
         "run_at": datetime.utcnow().isoformat() + "Z",
-        "input_video": os.path.abspath(args.input),
+        "input_video": args.input if is_live_source(args.input) else os.path.abspath(args.input),
         "site_id": site_id,
         "meta": meta,
         "config": cfg,
         "events_total": len(events),
         "counts_rows": int(df_counts.shape[0]),
+        "perf": {
+            "mode": "batched" if batch_size > 1 else "single",
+            "batch_size": batch_size,
+            "threaded": threaded,
+            "shards": shards,
+            "host_profile": host_profile["path"] if host_profile is not None else None,
+            "frames_processed": processed,
+            "elapsed_sec": round(elapsed, 3),
+            "frames_per_sec": round(processed / elapsed, 3) if elapsed > 0 else None
+        },
         "outputs": {
-            "counts_csv": os.path.abspath(csv_path),
+            "counts_csv": os.path.abspath(csv_path) if csv_path else None,
             "counts_xlsx": os.path.abspath(xlsx_path),
-            "annotated_video": os.path.abspath(ann_path) if ann_path else None
+            "counts_by_resolution": {name: os.path.abspath(sink.path) for name, sink in sinks.items()},
+            "annotated_video": os.path.abspath(ann_path) if ann_path else None,
+            "track_cache": os.path.abspath(cache_path) if cache_path else None,
+            "event_store": [os.path.abspath(p) for p in store_files] if store_files else None
         }
     }
+    if stage_timings is not None:
+        summary["perf"].update(stage_timings)
+    if filter_summary is not None:
+        summary["inference_filters"] = filter_summary
+    if annotation_stats is not None:
+        summary["annotation"] = annotation_stats
+    if stride_ctl is not None:
+        summary["adaptive_stride"] = stride_ctl.stats()
+    if shard_info is not None:
+        summary["shards"] = shard_info
+    if source is not None:
+        summary["live"] = source.stats()
+    if checkpointer is not None:
+        summary["checkpoint"] = dict(checkpointer.stats(), resumed_from={
+            "frame_index": ckpt["frame_index"], "t_sec": ckpt["t_sec"], "events": len(ckpt["events"]),
+            "first_frame": start_frame} if ckpt is not None else None)
+    wall = time.perf_counter() - t_start
+    summary["profile"] = profiler.summary(processed, wall)
+    metrics_path = getattr(args, "metrics_file", None) or cfg.get("profiling", {}).get("prometheus_file")
+    if metrics_path:
+        summary["outputs"]["metrics"] = os.path.abspath(write_prometheus(
+            summary["profile"], metrics_path, labels={"site_id": site_id, "input": os.path.basename(args.input)},
+            frames=processed, elapsed_sec=wall))
+    if profile_path and shards == 1:
+        summary["outputs"]["profile"] = os.path.abspath(profile_path)
     write_json(summary, os.path.join(paths.out_dir, "run_summary.json"))
+    if checkpointer is not None:
+        checkpointer.remove()  # run complete: the next run of this video starts from the beginning
 
     print("✅ Done")
-    print(f"CSV : {csv_path}")
+    for sink in sinks.values():
+        print(f"CSV : {sink.path}")
     print(f"XLSX: {xlsx_path}")
     if ann_path:
         print(f"MP4 : {ann_path}")
+    if store_files:
+        print(f"Events stored: {os.path.dirname(os.path.dirname(store_files[0]))}")
+    return summary
 
 if __name__ == "__main__":
     main()
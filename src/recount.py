@@ -0,0 +1,224 @@
+"""
+Re-count a processed video from its track cache, without running YOLO again.
+
+process_video stores the tracker output (cache: section of configs/pipeline.yaml);
+after recalibrating a site line or changing counting settings, replay it here:
+
+    python -m src.recount --input data/raw_videos/site01_20260118_1800.mp4 --site site01 --out out/
+
+This writes the same counts_*.csv / counts_15min.xlsx / run_summary.json as
+process_video. To compare candidate lines in a single pass, give --line once per
+candidate (source-pixel coordinates, as in sites.yaml):
+
+    python -m src.recount --input ... --site site01 --out out/lines \\
+        --line low=100,420,1180,420 --line high=100,360,1180,360
+
+Candidates are counted with the site's direction and counting settings next to
+the calibrated line ("site") and written to candidates_summary.csv and
+candidates_15min.csv instead of the regular outputs.
+"""
+from __future__ import annotations
+import argparse
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from src.utils.config import load_yaml, ensure_dirs
+from src.track.batch import class_filter
+from src.track.cache import TrackCache, cache_key, has_cache
+from src.aggregate.time_bucketing import events_to_15min_counts
+from src.count.zones import parse_zones
+from src.export.csv_writer import write_csv
+from src.export.json_summary import write_json
+from src.process_video import (build_aggregator, build_counter, count_keys, open_event_store, recording_start,
+                               store_events, write_15min_workbook)
+
+def parse_line_arg(text: str, index: int) -> Tuple[str, Dict]:
+    """'[name=]x1,y1,x2,y2' -> (name, {"p1": [x1, y1], "p2": [x2, y2]})"""
+    name, _, coords = text.rpartition("=")
+    try:
+        x1, y1, x2, y2 = (float(v) for v in coords.split(","))
+    except ValueError:
+        raise SystemExit(f"❌ --line expects [name=]x1,y1,x2,y2, got '{text}'")
+    return name or f"line{index}", {"p1": [x1, y1], "p2": [x2, y2]}
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="Re-count a video from its cached tracker output")
+    ap.add_argument("--input", required=True, help="Video that was processed with the track cache enabled")
+    ap.add_argument("--site", required=True, help="site key in configs/sites.yaml")
+    ap.add_argument("--config", default="configs/pipeline.yaml")
+    ap.add_argument("--sites", default="configs/sites.yaml")
+    ap.add_argument("--classes", default="configs/classes.yaml")
+    ap.add_argument("--out", default="out")
+    ap.add_argument("--cache_dir", default=None, help="Override cache.dir from the pipeline config")
+    ap.add_argument("--start", default=None,
+                    help="Recording start 'YYYY-MM-DD HH:MM' for clock-aligned buckets (default: from file name)")
+    ap.add_argument("--line", action="append", default=[],
+                    help="Candidate line [name=]x1,y1,x2,y2; repeat to compare several in one pass")
+    return ap
+
+def inside_roi(site_cfg: dict, roi: List[int]) -> bool:
+    """True when every line end / polygon corner of the site lies in the ROI box [x1, y1, x2, y2]."""
+    pts = np.concatenate([z.points for z in parse_zones(site_cfg)])
+    return bool(((pts >= roi[:2]) & (pts <= roi[2:])).all())
+
+def main(argv=None):
+    run(build_arg_parser().parse_args(argv))
+
+def run(args) -> dict:
+    cfg = load_yaml(args.config)
+    sites = (load_yaml(args.sites) or {}).get("sites", {})
+    if args.site not in sites:
+        raise SystemExit(f"❌ Site '{args.site}' not calibrated (see python -m src.tools.calibrate_site)")
+    site_cfg = sites[args.site]
+    keep = set(load_yaml(args.classes).get("keep_classes", []))
+
+    cache_dir = args.cache_dir or cfg.get("cache", {}).get("dir", "cache/tracks")
+    key, _ = cache_key(args.input, cfg)
+    if not has_cache(cache_dir, key):
+        raise SystemExit(
+            f"❌ No track cache for this video and detector/tracker settings in {cache_dir}.\n"
+            f"Run python -m src.process_video --input {args.input} --site {args.site} with cache.enabled: true first."
+        )
+    cache = TrackCache.open(cache_dir, key)
+    meta = cache.meta
+    roi = cache.recorded_with.get("roi")
+    if roi:
+        counted = [("site", site_cfg)] + [(name, {"line": line}) for name, line in
+                                          (parse_line_arg(spec, i) for i, spec in enumerate(args.line or []))]
+        outside = [name for name, site in counted if not inside_roi(site, roi)]
+        if outside:
+            raise SystemExit(
+                f"❌ Tracks were recorded inside ROI {roi} (source px) and {', '.join(outside)} leaves it: "
+                f"vehicles there were never detected.\n"
+                f"Rerun python -m src.process_video --input {args.input} --site {args.site} to record them.")
+        print(f"⚠️  Tracks were recorded inside ROI {roi} (source px); vehicles outside it are not counted")
+    paths = ensure_dirs(args.out)
+    t_start = time.perf_counter()
+
+    if args.line:
+        candidates = [("site", site_cfg)]
+        for i, spec in enumerate(args.line):
+            name, line = parse_line_arg(spec, i)
+            # a candidate is a single line; the site's zone list (if any) does not apply to it
+            cand = {k: v for k, v in site_cfg.items() if k != "zones"}
+            candidates.append((name, dict(cand, line=line)))
+        return _run_candidates(args, cfg, cache, candidates, keep, paths, t_start)
+
+    rule = cfg["counting"]["rule"]
+    counter = build_counter(site_cfg, cfg, scale=meta["scale"])
+    origin = recording_start(args, meta)
+    aggregator, sinks, closed_15 = build_aggregator(cfg, site_cfg, paths.counts_dir, origin)
+    event_store = open_event_store(cfg)
+    events: List = []
+    keep_table = class_filter(cache.names, keep)
+    for t_sec, _, tracked in tqdm(cache.iter_frames(), total=cache.n_frames, desc="Recount", unit="frame"):
+        if keep:
+            tracked = tracked.only(keep_table)
+        evs = counter.update(t_sec, tracked, rule_name=rule)
+        events.extend(evs)
+        aggregator.add(evs)
+        aggregator.advance(t_sec)
+    aggregator.flush()
+    elapsed = time.perf_counter() - t_start
+
+    df_counts, csv_path, xlsx_path = write_15min_workbook(paths.counts_dir, aggregator, sinks, closed_15)
+    # the recount replaces what the original run stored for this video
+    store_files = store_events(event_store, events, site_cfg["site_id"], origin, args.input)
+    summary = {
+        "run_at": datetime.utcnow().isoformat() + "Z",
+        "input_video": os.path.abspath(args.input),
+        "site_id": site_cfg["site_id"],
+        "meta": meta,
+        "config": cfg,
+        "events_total": len(events),
+        "counts_rows": int(df_counts.shape[0]),
+        "perf": {
+            "mode": "recount",
+            "frames_processed": cache.n_frames,
+            "elapsed_sec": round(elapsed, 3),
+            "frames_per_sec": round(cache.n_frames / elapsed, 3) if elapsed > 0 else None
+        },
+        "outputs": {
+            "counts_csv": os.path.abspath(csv_path) if csv_path else None,
+            "counts_xlsx": os.path.abspath(xlsx_path),
+            "counts_by_resolution": {name: os.path.abspath(sink.path) for name, sink in sinks.items()},
+            "track_cache": os.path.abspath(cache.path),
+            "event_store": [os.path.abspath(p) for p in store_files] if store_files else None
+        }
+    }
+    write_json(summary, os.path.join(paths.out_dir, "run_summary.json"))
+
+    print(f"✅ Recounted {cache.n_frames} frames in {elapsed:.1f}s")
+    for sink in sinks.values():
+        print(f"CSV : {sink.path}")
+    print(f"XLSX: {xlsx_path}")
+    return summary
+
+def _run_candidates(args, cfg: dict, cache: TrackCache, candidates: List[Tuple[str, dict]],
+                    keep: set, paths, t_start: float) -> dict:
+    rule = cfg["counting"]["rule"]
+    scale = cache.meta["scale"]
+    counters = [(name, build_counter(site, cfg, scale=scale)) for name, site in candidates]
+    events: Dict[str, List] = {name: [] for name, _ in candidates}
+    keep_table = class_filter(cache.names, keep)
+    for t_sec, _, tracked in tqdm(cache.iter_frames(), total=cache.n_frames, desc="Recount", unit="frame"):
+        if keep:
+            tracked = tracked.only(keep_table)
+        for name, counter in counters:
+            events[name].extend(counter.update(t_sec, tracked, rule_name=rule))
+    elapsed = time.perf_counter() - t_start
+
+    summary_rows, bucket_frames = [], []
+    for name, site in candidates:
+        evs = events[name]
+        by_cls: Dict[str, int] = {}
+        for e in evs:
+            by_cls[e.cls_name] = by_cls.get(e.cls_name, 0) + 1
+        line = site.get("line", {})
+        summary_rows.append(dict(candidate=name, p1=line.get("p1"), p2=line.get("p2"),
+                                 total=len(evs), **dict(sorted(by_cls.items()))))
+        df = events_to_15min_counts(evs, extra_keys=count_keys(site, cfg))
+        df.insert(0, "candidate", name)
+        bucket_frames.append(df)
+
+    df_summary = pd.DataFrame(summary_rows).fillna(0)
+    summary_path = os.path.join(paths.counts_dir, "candidates_summary.csv")
+    buckets_path = os.path.join(paths.counts_dir, "candidates_15min.csv")
+    write_csv(df_summary, summary_path)
+    write_csv(pd.concat(bucket_frames, ignore_index=True), buckets_path)
+
+    summary = {
+        "run_at": datetime.utcnow().isoformat() + "Z",
+        "input_video": os.path.abspath(args.input),
+        "site_id": candidates[0][1]["site_id"],
+        "meta": cache.meta,
+        "config": cfg,
+        "candidates": summary_rows,
+        "perf": {
+            "mode": "recount_candidates",
+            "candidates": len(candidates),
+            "frames_processed": cache.n_frames,
+            "elapsed_sec": round(elapsed, 3)
+        },
+        "outputs": {
+            "candidates_summary_csv": os.path.abspath(summary_path),
+            "candidates_15min_csv": os.path.abspath(buckets_path),
+            "track_cache": os.path.abspath(cache.path)
+        }
+    }
+    write_json(summary, os.path.join(paths.out_dir, "run_summary.json"))
+
+    print(f"✅ Compared {len(candidates)} lines over {cache.n_frames} frames in {elapsed:.1f}s")
+    print(df_summary.to_string(index=False))
+    print(f"CSV : {summary_path}")
+    print(f"CSV : {buckets_path}")
+    return summary
+
+if __name__ == "__main__":
+    main()
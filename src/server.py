@@ -0,0 +1,448 @@
+"""
+Warm worker: runs process_video jobs from a queue and keeps the loaded models
+between them, so a job does not pay for model loading / export / warm-up.
+
+    python -m src.server serve --port 8765
+    python -m src.server serve --socket /tmp/traffic.sock --warm configs/pipeline.yaml
+    python -m src.server submit -- --input data/raw_videos/site01_20260118_1800.mp4 --site site01 --out out/
+    python -m src.server status [JOB_ID]
+
+A job takes the same arguments as `python -m src.process_video` (paths are
+resolved on the server, relative to its working directory). Jobs run one at a
+time; one model is kept per detector + tracker config (--max_models, least
+recently used is dropped).
+
+HTTP API (JSON; also over the Unix socket):
+    POST   /jobs              {"args": ["--input", "...", "--site", "site01"]}
+                              or {"input": "...", "site": "site01", "batch_size": 8}
+    GET    /jobs              all jobs
+    GET    /jobs/<id>         status, progress and, when done, the run summary
+    GET    /jobs/<id>/events  progress as NDJSON lines until the job ends (last line = final job)
+    DELETE /jobs/<id>         cancel a queued job
+    GET    /health            models loaded, queue length
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import http.client
+import io
+import itertools
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Union
+
+from src.utils.config import load_yaml
+from src.utils.hashing import obj_sha256
+
+FINISHED = ("done", "failed", "cancelled")
+PROGRESS_INTERVAL_SEC = 0.5
+
+def job_argv(spec: Union[List, Dict]) -> List[str]:
+    """Job arguments as a process_video argv: a list as is, or {"input": ..., "batch_size": 8, "realtime": true}."""
+    if isinstance(spec, list):
+        return [str(v) for v in spec]
+    argv = []
+    for key, value in spec.items():
+        if value is None or value is False:
+            continue
+        argv.append(f"--{key}")
+        if value is not True:
+            argv.append(str(value))
+    return argv
+
+def model_key(cfg: dict) -> str:
+    """Jobs whose detector and tracker settings match share a loaded model."""
+    return obj_sha256({"detector": cfg["detector"], "tracker": cfg["tracker"]})
+
+class ModelCache:
+    """Loaded trackers per model_key (least recently used dropped past max_models)."""
+
+    def __init__(self, max_models: int = 2):
+        self.max_models = max(1, max_models)
+        self._models: "OrderedDict[str, object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cfg: dict):
+        key = model_key(cfg)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+        tracker = self._load(cfg)
+        with self._lock:
+            self._models[key] = tracker
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+        return tracker
+
+    @staticmethod
+    def _load(cfg: dict):
+        import numpy as np
+        from src.process_video import build_tracker
+
+        t0 = time.perf_counter()
+        tracker = build_tracker(cfg)
+        # first inference initialises the backend (CUDA context, ONNX / OpenVINO graph)
+        imgsz = int(cfg["detector"]["imgsz"])
+        tracker.track_frames([np.zeros((imgsz, imgsz, 3), dtype=np.uint8)])
+        tracker.reset()
+        print(f"🔥 Loaded {cfg['detector']['model']} ({cfg['tracker'].get('type', 'bytetrack')}) "
+              f"in {time.perf_counter() - t0:.1f}s")
+        return tracker
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+class Job:
+    _ids = itertools.count(1)
+
+    def __init__(self, argv: List[str]):
+        self.id = f"{datetime.now():%Y%m%d%H%M%S}-{next(self._ids)}"
+        self.argv = argv
+        self.status = "queued"
+        self.frames = 0
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.summary: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.changed = threading.Condition()
+
+    def update(self, n: int = 1) -> None:
+        """Progress hook for process_video.run (the tqdm interface it uses)."""
+        with self.changed:
+            self.frames += n
+            self.changed.notify_all()
+
+    def set_status(self, status: str, **fields) -> None:
+        with self.changed:
+            self.status = status
+            for k, v in fields.items():
+                setattr(self, k, v)
+            self.changed.notify_all()
+
+    def as_dict(self, with_summary: bool = True) -> dict:
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else None
+        out = {
+            "id": self.id,
+            "status": self.status,
+            "args": self.argv,
+            "frames": self.frames,
+            "elapsed_sec": round(elapsed, 3) if elapsed is not None else None,
+            "frames_per_sec": round(self.frames / elapsed, 2) if elapsed else None,
+            "submitted_at": datetime.utcfromtimestamp(self.submitted_at).isoformat() + "Z",
+            "error": self.error,
+        }
+        if with_summary and self.summary is not None:
+            out["summary"] = self.summary
+        return out
+
+class Worker:
+    """Job queue and the thread that runs the jobs, one at a time."""
+
+    def __init__(self, max_models: int = 2, keep_jobs: int = 200):
+        self.models = ModelCache(max_models)
+        self.keep_jobs = keep_jobs
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._loop, name="job-worker", daemon=True)
+
+    def start(self) -> "Worker":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Cancel queued jobs and wait for the running one to finish."""
+        for job in list(self.jobs.values()):
+            self.cancel(job)
+        self._queue.put(None)
+        if self._thread.is_alive():
+            if any(j.status == "running" for j in list(self.jobs.values())):
+                print("⏳ Waiting for the running job to finish (Ctrl-C again to abort)")
+            self._thread.join()
+
+    def submit(self, argv: List[str]) -> Job:
+        parse_job_args(argv)  # bad arguments fail the request, not the queued job
+        job = Job(argv)
+        with self._lock:
+            self.jobs[job.id] = job
+            finished = [j for j in self.jobs.values() if j.status in FINISHED]
+            for old in finished[:max(0, len(finished) - self.keep_jobs)]:
+                del self.jobs[old.id]
+        self._queue.put(job)
+        return job
+
+    def cancel(self, job: Job) -> bool:
+        with job.changed:  # an RLock: set_status may take it again
+            if job.status != "queued":
+                return False
+            job.set_status("cancelled", finished_at=time.time())
+        return True
+
+    def queued(self) -> int:
+        return sum(1 for j in list(self.jobs.values()) if j.status == "queued")
+
+    def _loop(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with job.changed:
+                if job.status != "queued":  # cancelled while waiting
+                    continue
+                job.set_status("running", started_at=time.time())
+            self._run(job)
+
+    def _run(self, job: Job) -> None:
+        from src.process_video import run
+
+        print(f"▶️  Job {job.id}: {' '.join(job.argv)}")
+        try:
+            args = parse_job_args(job.argv)
+            tracker = None
+            if max(1, int(getattr(args, "shards", 1) or 1)) == 1:  # shards load their own models
+                tracker = self.models.get(load_yaml(args.config))
+            summary = run(args, tracker=tracker, progress=job)
+        except SystemExit as e:  # process_video reports bad input this way
+            job.set_status("failed", error=str(e.code), finished_at=time.time())
+        except Exception as e:
+            traceback.print_exc()
+            job.set_status("failed", error=f"{type(e).__name__}: {e}", finished_at=time.time())
+        else:
+            # round-trip so the job holds plain JSON (datetimes etc. as strings)
+            job.set_status("done", summary=json.loads(json.dumps(summary, default=str)), finished_at=time.time())
+        print(f"{'✅' if job.status == 'done' else '❌'} Job {job.id}: {job.status}"
+              + (f" ({job.error})" if job.error else ""))
+
+_parse_lock = threading.Lock()
+
+def parse_job_args(argv: List[str]) -> argparse.Namespace:
+    """process_video's own parser; its usage errors become ValueError instead of exiting."""
+    from src.process_video import build_arg_parser
+
+    err = io.StringIO()
+    with _parse_lock, contextlib.redirect_stderr(err):
+        try:
+            return build_arg_parser().parse_args(argv)
+        except SystemExit:
+            lines = err.getvalue().strip().splitlines()
+            raise ValueError(lines[-1].split("error: ", 1)[-1] if lines else "invalid arguments")
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "TrafficWorker/1"
+    worker: Worker  # set on the server class by make_server
+
+    def address_string(self) -> str:
+        # Unix-socket clients have no (host, port)
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, fmt, *args) -> None:
+        if not self.path.endswith("/events"):
+            super().log_message(fmt, *args)
+
+    def _send(self, code: int, body: dict) -> None:
+        data = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _job(self, job_id: str) -> Optional[Job]:
+        job = self.worker.jobs.get(job_id)
+        if job is None:
+            self._send(404, {"error": f"no job {job_id}"})
+        return job
+
+    def do_GET(self) -> None:
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+        if parts == ["health"]:
+            self._send(200, {"status": "ok", "models_loaded": len(self.worker.models),
+                             "jobs_queued": self.worker.queued()})
+        elif parts == ["jobs"]:
+            self._send(200, {"jobs": [j.as_dict(with_summary=False) for j in list(self.worker.jobs.values())]})
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self._job(parts[1])
+            if job is not None:
+                self._send(200, job.as_dict())
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "events":
+            job = self._job(parts[1])
+            if job is not None:
+                self._stream(job)
+        else:
+            self._send(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self) -> None:
+        if self.path.rstrip("/") != "/jobs":
+            self._send(404, {"error": f"unknown path {self.path}"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            spec = body.get("args", body) if isinstance(body, dict) else body
+            job = self.worker.submit(job_argv(spec))
+        except (ValueError, AttributeError) as e:
+            self._send(400, {"error": str(e)})
+            return
+        self._send(202, job.as_dict())
+
+    def do_DELETE(self) -> None:
+        parts = [p for p in self.path.split("/") if p]
+        if len(parts) != 2 or parts[0] != "jobs":
+            self._send(404, {"error": f"unknown path {self.path}"})
+            return
+        job = self._job(parts[1])
+        if job is None:
+            return
+        if self.worker.cancel(job):
+            self._send(200, job.as_dict())
+        else:
+            self._send(409, {"error": f"job {job.id} is {job.status}; only queued jobs can be cancelled"})
+
+    def _stream(self, job: Job) -> None:
+        """NDJSON until the job ends; the body is closed with the connection (HTTP/1.0)."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        last = None
+        try:
+            while True:
+                with job.changed:
+                    if job.status not in FINISHED and (job.status, job.frames) == last:
+                        job.changed.wait(PROGRESS_INTERVAL_SEC)
+                    state = (job.status, job.frames)
+                if state[0] in FINISHED:
+                    self.wfile.write((json.dumps(job.as_dict(), default=str) + "\n").encode("utf-8"))
+                    return
+                if state != last:
+                    self.wfile.write((json.dumps(job.as_dict(with_summary=False)) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+                    last = state
+                    time.sleep(PROGRESS_INTERVAL_SEC)  # at most one progress line per interval
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client stopped following; the job keeps running
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def make_server(worker: Worker, host: str = "127.0.0.1", port: int = 8765, socket_path: Optional[str] = None):
+    handler = type("BoundHandler", (Handler,), {"worker": worker})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)  # left over from a previous server
+        return UnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+# --- client ---
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: Optional[float] = None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+def _connect(args) -> http.client.HTTPConnection:
+    if args.socket:
+        return UnixHTTPConnection(args.socket)
+    return http.client.HTTPConnection(args.host, args.port)
+
+def request(args, method: str, path: str, body: Optional[dict] = None):
+    """-> (status, parsed JSON response)."""
+    conn = _connect(args)
+    try:
+        conn.request(method, path, body=json.dumps(body) if body is not None else None,
+                     headers={"Content-Type": "application/json"})
+        resp = conn.getresponse()
+        return resp.status, json.loads(resp.read() or b"{}")
+    except OSError as e:
+        raise SystemExit(f"❌ No worker at {args.socket or f'{args.host}:{args.port}'} ({e})")
+    finally:
+        conn.close()
+
+def follow(args, job_id: str) -> dict:
+    """Print a job's progress until it ends -> final job."""
+    conn = _connect(args)
+    conn.request("GET", f"/jobs/{job_id}/events")
+    resp = conn.getresponse()
+    final = {}
+    for line in resp:
+        final = json.loads(line)
+        if final["status"] == "running":
+            fps = final.get("frames_per_sec")
+            print(f"\r⏳ {final['frames']} frames" + (f" ({fps:.1f} fps)" if fps else ""), end="", flush=True)
+    conn.close()
+    print()
+    return final
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Warm worker for process_video jobs")
+    sub = ap.add_subparsers(dest="command", required=True)
+    for name in ("serve", "submit", "status"):
+        p = sub.add_parser(name)
+        p.add_argument("--host", default="127.0.0.1")
+        p.add_argument("--port", type=int, default=8765)
+        p.add_argument("--socket", default=None, help="Unix socket path instead of host:port")
+        if name == "serve":
+            p.add_argument("--max_models", type=int, default=2, help="Loaded models kept (one per detector config)")
+            p.add_argument("--warm", action="append", default=[],
+                           help="Pipeline config whose model is loaded at start (repeatable)")
+        elif name == "submit":
+            p.add_argument("--no_follow", action="store_true", help="Print the job id and return")
+            p.add_argument("job_args", nargs=argparse.REMAINDER, help="process_video arguments (after --)")
+        else:
+            p.add_argument("job_id", nargs="?", default=None)
+    args = ap.parse_args(argv)
+
+    if args.command == "serve":
+        worker = Worker(max_models=args.max_models)
+        for path in args.warm:
+            worker.models.get(load_yaml(path))
+        server = make_server(worker, args.host, args.port, args.socket)
+        worker.start()
+        print(f"✅ Worker listening on {args.socket or f'http://{args.host}:{args.port}'}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            worker.stop()
+            server.server_close()
+            if args.socket and os.path.exists(args.socket):
+                os.remove(args.socket)
+    elif args.command == "submit":
+        job_args = args.job_args[1:] if args.job_args[:1] == ["--"] else args.job_args
+        status, job = request(args, "POST", "/jobs", {"args": job_args})
+        if status != 202:
+            raise SystemExit(f"❌ {job.get('error')}")
+        print(f"Job {job['id']} queued")
+        if args.no_follow:
+            return
+        job = follow(args, job["id"])
+        if job.get("status") != "done":
+            raise SystemExit(f"❌ Job {job.get('id')} {job.get('status')}: {job.get('error')}")
+        outputs = job["summary"]["outputs"]
+        print(f"✅ Done: {job['summary']['events_total']} events, {job['frames_per_sec']} fps")
+        print(f"XLSX: {outputs['counts_xlsx']}")
+    else:
+        status, body = request(args, "GET", f"/jobs/{args.job_id}" if args.job_id else "/jobs")
+        if status != 200:
+            raise SystemExit(f"❌ {body.get('error')}")
+        json.dump(body, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
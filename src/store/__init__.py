@@ -0,0 +1 @@
+"""Event store package."""
@@ -0,0 +1,212 @@
+"""
+Event-level store: every CountEvent of every run, as Parquet files partitioned
+by site and date.
+
+    <root>/site_id=site01/date=2026-01-18/<video_id>.parquet
+
+Each processed video owns one file per date it covers, so re-running (or
+re-counting) a video replaces its events instead of adding them twice. Timestamps
+are the site's wall clock (recording start + offset in the video), without a
+time zone, like the clock-aligned buckets in counts_*.csv.
+
+Queries read only the partitions in range and can bucket at any size:
+
+    store = EventStore("store/events")
+    store.counts("1h", site="site01", start="2026-01-01", end="2026-02-01", classes=["car", "bus"])
+
+Needs pyarrow (pip install pyarrow).
+"""
+from __future__ import annotations
+import glob
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+import pandas as pd
+
+FILE_COLUMNS = ("ts", "t_sec", "track_id", "cls_name", "rule", "zone_id", "direction", "video_id", "source")
+DAY = pd.Timedelta(days=1)
+TimeLike = Union[str, datetime, pd.Timestamp, None]
+
+def _arrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("❌ The event store needs pyarrow: pip install pyarrow")
+    return pa, ds, pq
+
+def video_id(path: str) -> str:
+    """Stable id of an input video: file name and size (cheap, survives copies between disks)."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    return f"{name}-{os.path.getsize(path)}" if os.path.isfile(path) else name
+
+def parse_bucket(bucket: Union[str, int]) -> pd.Timedelta:
+    """'15min', '1h', '1d', '2W' or minutes as an int."""
+    text = str(bucket).strip()
+    if text.endswith("d"):
+        text = text[:-1] + "D"   # pandas deprecates the lower-case day unit
+    size = pd.Timedelta(minutes=int(text)) if text.isdigit() else pd.Timedelta(text)
+    if size <= pd.Timedelta(0):
+        raise ValueError(f"Bucket size must be positive, got '{bucket}'")
+    return size
+
+def _ts(value: TimeLike) -> Optional[pd.Timestamp]:
+    return pd.Timestamp(value) if value is not None else None
+
+def _last_date(end: pd.Timestamp) -> str:
+    """Last date partition that can hold ts < end."""
+    return (end - pd.Timedelta(milliseconds=1)).strftime("%Y-%m-%d")
+
+class EventStore:
+    def __init__(self, root: str):
+        self.root = root
+        self._pa, self._ds, self._pq = _arrow()
+        self._schema = self._pa.schema([
+            ("ts", self._pa.timestamp("ms")), ("t_sec", self._pa.float64()), ("track_id", self._pa.int64()),
+            ("cls_name", self._pa.string()), ("rule", self._pa.string()), ("zone_id", self._pa.string()),
+            ("direction", self._pa.string()), ("video_id", self._pa.string()), ("source", self._pa.string()),
+        ])
+        self._partitioning = self._ds.partitioning(
+            self._pa.schema([("site_id", self._pa.string()), ("date", self._pa.string())]), flavor="hive")
+
+    def _partition_dir(self, site_id: str, date: str) -> str:
+        return os.path.join(self.root, f"site_id={site_id}", f"date={date}")
+
+    def write_run(self, events: Sequence, site_id: str, origin: datetime, vid: str,
+                  source: Optional[str] = None) -> List[str]:
+        """
+        Store one video's events (replacing what an earlier run of it stored).
+        origin: recording start, so event times become wall-clock timestamps.
+        """
+        ts = pd.to_datetime([origin + timedelta(seconds=float(e.t_sec)) for e in events]).astype("datetime64[ms]")
+        df = pd.DataFrame({
+            "ts": ts,
+            "t_sec": [float(e.t_sec) for e in events],
+            "track_id": [int(e.track_id) for e in events],
+            "cls_name": [e.cls_name for e in events],
+            "rule": [e.rule for e in events],
+            "zone_id": [getattr(e, "zone_id", "line") for e in events],
+            "direction": [getattr(e, "direction", "any") for e in events],
+        })
+        df["video_id"] = vid
+        df["source"] = source or ""
+        df = df.sort_values("ts", kind="stable")
+        by_date: Dict[str, pd.DataFrame] = {d: g for d, g in df.groupby(df["ts"].dt.strftime("%Y-%m-%d"))}
+        if not by_date:
+            # keep an empty file so the run is on record
+            by_date[origin.strftime("%Y-%m-%d")] = df
+
+        # write everything next to its final name first, then swap, then drop dates the run no
+        # longer covers: a crash before the swaps leaves the old run intact, one after them at
+        # worst leaves old events on dates the new run has none (until the next re-run)
+        staged = []
+        for date, part in sorted(by_date.items()):
+            final = os.path.join(self._partition_dir(site_id, date), f"{vid}.parquet")
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            tmp = os.path.join(os.path.dirname(final), f".{vid}.parquet.tmp")  # dot files are not read
+            table = self._pa.Table.from_pandas(part.reset_index(drop=True), schema=self._schema, preserve_index=False)
+            self._pq.write_table(table, tmp)
+            staged.append((tmp, final))
+        for tmp, final in staged:
+            os.replace(tmp, final)
+        keep = {final for _, final in staged}
+        for old in glob.glob(os.path.join(self.root, f"site_id={site_id}", "date=*", f"{vid}.parquet")):
+            if old not in keep:
+                os.remove(old)
+                if not os.listdir(os.path.dirname(old)):
+                    os.rmdir(os.path.dirname(old))
+        return [final for _, final in staged]
+
+    def _dataset(self):
+        return self._ds.dataset(self.root, format="parquet", partitioning=self._partitioning,
+                                exclude_invalid_files=False)
+
+    def _filter(self, site, start: Optional[pd.Timestamp], end: Optional[pd.Timestamp], classes, zones):
+        field = self._ds.field
+        conds = []
+        if site:
+            sites = [site] if isinstance(site, str) else list(site)
+            conds.append(field("site_id").isin(sites))
+        if start is not None:
+            conds += [field("date") >= start.strftime("%Y-%m-%d"), field("ts") >= start.to_pydatetime()]
+        if end is not None:
+            conds += [field("date") <= _last_date(end), field("ts") < end.to_pydatetime()]
+        if classes:
+            conds.append(field("cls_name").isin(list(classes)))
+        if zones:
+            conds.append(field("zone_id").isin(list(zones)))
+        expr = None
+        for c in conds:
+            expr = c if expr is None else expr & c
+        return expr
+
+    def dates(self, site=None, start: TimeLike = None, end: TimeLike = None) -> List[str]:
+        """Date partitions in range (sorted)."""
+        pattern = os.path.join(self.root, f"site_id={site}" if isinstance(site, str) else "site_id=*", "date=*")
+        found = sorted({os.path.basename(p)[len("date="):] for p in glob.glob(pattern)})
+        start, end = _ts(start), _ts(end)
+        return [d for d in found if (start is None or d >= start.strftime("%Y-%m-%d"))
+                and (end is None or d <= _last_date(end))]
+
+    def events(self, site=None, start: TimeLike = None, end: TimeLike = None,
+               classes: Optional[Sequence[str]] = None, zones: Optional[Sequence[str]] = None,
+               columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Events with start <= ts < end, sorted by time."""
+        if not os.path.isdir(self.root):
+            return pd.DataFrame(columns=list(columns or ("site_id", "date") + FILE_COLUMNS))
+        table = self._dataset().to_table(columns=list(columns) if columns else None,
+                                         filter=self._filter(site, _ts(start), _ts(end), classes, zones))
+        df = table.to_pandas()
+        return df.sort_values("ts", kind="stable", ignore_index=True) if "ts" in df else df
+
+    def iter_events(self, site=None, start: TimeLike = None, end: TimeLike = None,
+                    classes: Optional[Sequence[str]] = None, zones: Optional[Sequence[str]] = None,
+                    columns: Optional[Sequence[str]] = None) -> Iterator[pd.DataFrame]:
+        """events(), one date partition at a time."""
+        for date in self.dates(site, start, end):
+            day = pd.Timestamp(date)
+            lo = max(day, _ts(start)) if start is not None else day
+            hi = min(day + DAY, _ts(end)) if end is not None else day + DAY
+            df = self.events(site, lo, hi, classes, zones, columns)
+            if len(df):
+                yield df
+
+    def iter_counts(self, bucket: Union[str, int] = "15min", by: Sequence[str] = (), site=None,
+                    start: TimeLike = None, end: TimeLike = None, classes: Optional[Sequence[str]] = None,
+                    zones: Optional[Sequence[str]] = None) -> Iterator[pd.DataFrame]:
+        """
+        Bucket counts as DataFrames in report layout (bucket_start, bucket_end, site_id,
+        *by, vehicle_class, count). Buckets that divide a day are computed one date
+        partition at a time, so memory stays flat over months of data.
+        """
+        size = parse_bucket(bucket)
+        cols = ["ts", "site_id", "cls_name", *[c for c in by if c not in ("site_id", "cls_name")]]
+        unknown = set(cols) - {"site_id", "date", *FILE_COLUMNS}
+        if unknown:
+            raise ValueError(f"Cannot group by {sorted(unknown)}; event columns are {list(FILE_COLUMNS)}")
+        if DAY % size == pd.Timedelta(0):
+            parts = self.iter_events(site, start, end, classes, zones, cols)
+        else:
+            parts = iter([self.events(site, start, end, classes, zones, cols)])
+        return (_bucket_counts(df, size, by) for df in parts if len(df))
+
+    def counts(self, bucket: Union[str, int] = "15min", by: Sequence[str] = (), **query) -> pd.DataFrame:
+        parts = list(self.iter_counts(bucket, by, **query))
+        if not parts:
+            return pd.DataFrame(columns=report_columns(by))
+        return pd.concat(parts, ignore_index=True)
+
+def report_columns(by: Sequence[str] = ()) -> List[str]:
+    return ["bucket_start", "bucket_end", "site_id", *[k for k in by if k != "site_id"], "vehicle_class", "count"]
+
+def _bucket_counts(df: pd.DataFrame, size: pd.Timedelta, by: Sequence[str]) -> pd.DataFrame:
+    # buckets are aligned to midnight (sizes over a day: to 1970-01-01)
+    keys = [df["ts"].dt.floor(size).rename("bucket_start"), df["site_id"],
+            *[df[k] for k in by if k != "site_id"], df["cls_name"].rename("vehicle_class")]
+    out = df.groupby(keys, sort=True, observed=True).size().rename("count").reset_index()
+    out.insert(1, "bucket_end", out["bucket_start"] + size)
+    for c in ("bucket_start", "bucket_end"):
+        out[c] = out[c].dt.strftime("%Y-%m-%d %H:%M:%S")
+    return out[report_columns(by)]
@@ -0,0 +1,77 @@
+"""
+Counts from the event store at any bucket size, without touching video.
+
+    python -m src.store.query --site site01 --from 2026-01-01 --to 2026-02-01 --bucket 1h
+    python -m src.store.query --site site01 --bucket 15min --classes car,bus --by zone_id,direction \\
+        --out reports/site01_jan.xlsx
+    python -m src.store.query --site site01 --from "2026-01-18 07:00" --to "2026-01-18 10:00" --events
+
+--from is inclusive, --to exclusive (dates or 'YYYY-MM-DD HH:MM', site clock).
+Reports are streamed to .csv / .xlsx one day at a time; without --out a
+preview is printed.
+"""
+from __future__ import annotations
+import argparse
+import os
+from typing import List, Optional
+
+import pandas as pd
+
+from src.export.csv_writer import write_csv_chunks
+from src.export.excel_writer import write_xlsx_chunks
+from src.store.events import FILE_COLUMNS, EventStore, report_columns
+from src.utils.config import load_yaml
+
+def _split(text: Optional[str]) -> List[str]:
+    return [v.strip() for v in text.split(",") if v.strip()] if text else []
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Query counts from the event store")
+    ap.add_argument("--config", default="configs/pipeline.yaml")
+    ap.add_argument("--store", default=None, help="Override store.dir from the pipeline config")
+    ap.add_argument("--site", default=None, help="Comma-separated site ids (default: all)")
+    ap.add_argument("--from", dest="start", default=None, help="Start (inclusive)")
+    ap.add_argument("--to", dest="end", default=None, help="End (exclusive)")
+    ap.add_argument("--bucket", default="15min", help="Bucket size: 5min, 15min, 1h, 1d, ... or minutes")
+    ap.add_argument("--classes", default=None, help="Comma-separated vehicle classes (default: all)")
+    ap.add_argument("--zones", default=None, help="Comma-separated zone ids (default: all)")
+    ap.add_argument("--by", default=None, help="Extra columns to split by, e.g. zone_id,direction")
+    ap.add_argument("--events", action="store_true", help="Export raw events instead of bucket counts")
+    ap.add_argument("--out", default=None, help="Write to .csv or .xlsx instead of printing")
+    args = ap.parse_args(argv)
+
+    root = args.store
+    if root is None:
+        root = (load_yaml(args.config).get("store") or {}).get("dir", "store/events")
+    if not os.path.isdir(root):
+        raise SystemExit(f"❌ No event store at {root} (enable store: in configs/pipeline.yaml and process videos)")
+    store = EventStore(root)
+    sites = _split(args.site) or None
+    query = dict(site=sites, start=args.start, end=args.end,
+                 classes=_split(args.classes) or None, zones=_split(args.zones) or None)
+
+    if args.events:
+        columns = ["site_id", *FILE_COLUMNS]
+        chunks = store.iter_events(**query, columns=columns)
+    else:
+        by = _split(args.by)
+        columns = report_columns(by)
+        try:
+            chunks = store.iter_counts(args.bucket, by, **query)
+        except ValueError as e:
+            raise SystemExit(f"❌ {e}")
+
+    if args.out is None:
+        parts = list(chunks)
+        df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=columns)
+        print(df[columns].to_string(index=False, max_rows=60))
+        print(f"{len(df)} rows")
+        return
+    if args.out.lower().endswith(".xlsx"):
+        rows = write_xlsx_chunks(chunks, args.out, columns)
+    else:
+        rows = write_csv_chunks(chunks, args.out, columns)
+    print(f"✅ {rows} rows -> {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Find this host's fastest split of CPU cores between parallel video workers,
+torch / OpenCV threads and the inference batch size, and save it as the host
+profile that process_video and src.parallel.batch load automatically.
+
+    python -m src.tools.autotune --input data/raw_videos/site01/site01_20260118_1800_day.mp4
+    python -m src.tools.autotune --input clip.mp4 --frames 200 --batch_sizes 1,4,8,16 --affinity
+
+Every trial runs the real decode -> detect -> track -> count pipeline with
+the configured detector.model / imgsz / backend on the first --frames sampled
+frames of the clip, in `workers` processes started together (each with
+usable CPUs / workers threads), and scores the total frames/s of the host.
+Model loading and a warm-up batch are not timed.
+
+The search is coordinate-wise to keep it short: batch size on one worker,
+then the worker count, then OpenCV threads, batch size again at the chosen
+worker count and finally (--affinity) pinning each worker to its own CPUs.
+
+The profile goes to <host_profile.dir>/<hostname>.json (see
+src/utils/host_profile.py); rerun after changing the model, imgsz or backend.
+"""
+from __future__ import annotations
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import socket
+import time
+from datetime import datetime
+from itertools import islice
+from typing import Dict, List, Optional
+
+from src.export.json_summary import write_json
+from src.utils.config import load_yaml
+from src.utils.host_profile import (apply_threads, cpu_info, detector_key, pin_cpus, profile_path, usable_cpus,
+                                    worker_cpus)
+
+def _bench_worker(index: int, workers: int, video: str, cfg: dict, frames: int, batch_size: int,
+                  torch_threads: int, cv2_threads: int, affinity: bool, barrier, results) -> None:
+    if affinity:
+        pin_cpus(worker_cpus(index, workers))
+    apply_threads(torch_threads, cv2_threads)
+    from src.count.counter import LineCrossingCounter
+    from src.process_video import build_tracker, count_frames, open_frames
+
+    tracker = build_tracker(cfg)
+    frame_iter, meta = open_frames(video, cfg)
+    tracker.track_frames([pkt.frame_bgr for pkt in islice(frame_iter, batch_size)])  # warm-up, not timed
+    tracker.reset()
+    w, h = meta["frame_width"], meta["frame_height"]
+    counter = LineCrossingCounter("autotune", (0.0, h / 2.0), (float(w), h / 2.0))
+    frame_iter, _ = open_frames(video, cfg, end_frame=frames * meta["step"])
+    barrier.wait(timeout=600)
+    t0 = time.perf_counter()
+    _, processed, _ = count_frames(frame_iter, tracker, counter, cfg, set(), batch_size)
+    results.put((index, processed, time.perf_counter() - t0))
+
+def run_trial(video: str, cfg: dict, frames: int, workers: int, batch_size: int, torch_threads: int,
+              cv2_threads: int, affinity: bool = False) -> Dict:
+    """One setting on `workers` concurrent processes -> trial record with host frames/s (None if it failed)."""
+    ctx = mp.get_context("spawn")
+    barrier, results = ctx.Barrier(workers), ctx.Queue()
+    procs = [ctx.Process(target=_bench_worker, args=(i, workers, video, cfg, frames, batch_size, torch_threads,
+                                                     cv2_threads, affinity, barrier, results))
+             for i in range(workers)]
+    for p in procs:
+        p.start()
+    done = []
+    while len(done) < workers and (any(p.is_alive() for p in procs) or not results.empty()):
+        try:
+            done.append(results.get(timeout=1.0))
+        except queue.Empty:
+            if any(p.exitcode not in (None, 0) for p in procs):
+                break
+    for p in procs:
+        if len(done) < workers:
+            p.terminate()
+        p.join()
+    trial = dict(workers=workers, torch_threads=torch_threads, cv2_threads=cv2_threads, batch_size=batch_size,
+                 affinity=affinity, frames_per_sec=None)
+    if len(done) == workers:
+        frames_total = sum(n for _, n, _ in done)
+        wall = max(dt for _, _, dt in done)
+        trial.update(frames_per_sec=round(frames_total / wall, 2) if wall > 0 else None,
+                     per_worker_fps=[round(n / dt, 2) if dt > 0 else None for _, n, dt in sorted(done)])
+    return trial
+
+def _fmt(t: Dict) -> str:
+    fps = f"{t['frames_per_sec']:.1f} frames/s" if t["frames_per_sec"] else "failed"
+    return (f"workers={t['workers']} torch_threads={t['torch_threads']} cv2_threads={t['cv2_threads']} "
+            f"batch={t['batch_size']} affinity={'on' if t['affinity'] else 'off'}: {fps}")
+
+def autotune(video: str, cfg: dict, frames: int, batch_sizes: List[int], max_workers: int,
+             affinity: bool = False) -> Dict:
+    n_cpus = len(usable_cpus())
+    worker_opts = [w for w in (1, 2, 4, 8, 16, 32, 64, 128) if w <= min(n_cpus, max_workers)]
+    trials: List[Dict] = []
+    seen: Dict[tuple, Dict] = {}
+
+    def trial(workers: int, batch_size: int, cv2_threads: Optional[int] = None, pinned: bool = False) -> Dict:
+        threads = max(1, n_cpus // workers)
+        key = (workers, batch_size, cv2_threads or threads, pinned)
+        if key not in seen:
+            seen[key] = run_trial(video, cfg, frames, workers, batch_size, threads, cv2_threads or threads, pinned)
+            trials.append(seen[key])
+            print(f"   {_fmt(seen[key])}")
+        return seen[key]
+
+    def best_of(candidates: List[Dict]) -> Optional[Dict]:
+        ok = [t for t in candidates if t["frames_per_sec"]]
+        return max(ok, key=lambda t: t["frames_per_sec"]) if ok else None
+
+    best = best_of([trial(1, b) for b in batch_sizes])
+    if best is None:
+        raise SystemExit("❌ Every benchmark trial failed; check that process_video runs with this config")
+    best = best_of([best] + [trial(w, best["batch_size"]) for w in worker_opts])
+    if best["torch_threads"] > 1:
+        best = best_of([best, trial(best["workers"], best["batch_size"], cv2_threads=1)])
+    best = best_of([best] + [trial(best["workers"], b, best["cv2_threads"]) for b in batch_sizes])
+    if affinity:
+        if best["workers"] > 1 and hasattr(os, "sched_setaffinity"):
+            best = best_of([best, trial(best["workers"], best["batch_size"], best["cv2_threads"], pinned=True)])
+        elif not hasattr(os, "sched_setaffinity"):
+            print("⚠️  CPU affinity is not supported on this platform; not pinning")
+
+    single = best_of([t for t in trials if t["workers"] == 1])
+    settings = {k: best[k] for k in ("workers", "torch_threads", "cv2_threads", "batch_size", "affinity")}
+    return {
+        "host": socket.gethostname(),
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "cpu": cpu_info(),
+        "detector": detector_key(cfg),
+        "fps_infer": cfg["fps_infer"],
+        "reference": {"input": os.path.abspath(video), "frames": frames},
+        "settings": settings,
+        "frames_per_sec": best["frames_per_sec"],
+        "single_worker_frames_per_sec": single["frames_per_sec"] if single else None,
+        "trials": trials,
+    }
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Tune workers, threads and batch size for this host")
+    ap.add_argument("--input", required=True, help="Reference clip (a typical recording of this deployment)")
+    ap.add_argument("--config", default="configs/pipeline.yaml")
+    ap.add_argument("--frames", type=int, default=150, help="Sampled frames per worker per trial")
+    ap.add_argument("--batch_sizes", default="1,4,8", help="Comma-separated batch sizes to try")
+    ap.add_argument("--max_workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--affinity", action="store_true", help="Also try pinning each worker to its own CPUs")
+    ap.add_argument("--out", default=None, help="Profile path (default: <host_profile.dir>/<hostname>.json)")
+    args = ap.parse_args(argv)
+
+    if not os.path.exists(args.input):
+        raise SystemExit(f"❌ Reference clip not found: {args.input}")
+    cfg = load_yaml(args.config)
+    batch_sizes = sorted({max(1, int(b)) for b in args.batch_sizes.split(",") if b.strip()})
+    info = cpu_info()
+    det = detector_key(cfg)
+    print(f"⏳ Tuning {info['usable']} CPUs ({info['model'] or 'unknown CPU'}) for {det['model']} "
+          f"imgsz={det['imgsz']} backend={det['backend']} on {args.frames} frames per worker")
+
+    profile = autotune(args.input, cfg, args.frames, batch_sizes, max(1, args.max_workers), args.affinity)
+    out = args.out or profile_path(cfg)
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    write_json(profile, out)
+
+    s = profile["settings"]
+    print(f"✅ Best: {_fmt(dict(s, frames_per_sec=profile['frames_per_sec']))}")
+    if profile["single_worker_frames_per_sec"]:
+        print(f"   one worker with all cores: {profile['single_worker_frames_per_sec']:.1f} frames/s")
+    print(f"   Profile: {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Check a YOLO dataset's label files against the class taxonomy in
+configs/classes.yaml, all files at once.
+
+    python -m src.tools.check_labels --data data/dataset_yolo
+    python -m src.tools.check_labels --data data/extracted --out reports/label_issues.csv
+
+Errors (exit code 1): data.yaml names that differ from classes.yaml, class ids
+outside the taxonomy, malformed or non-numeric rows, coordinates outside
+[0, 1], empty boxes, labels without an image. Warnings: boxes that extend past
+the image border, duplicate rows, images without a label file (unlabelled or
+intentional background).
+"""
+from __future__ import annotations
+import argparse
+import csv
+import glob
+import os
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from src.utils.config import load_yaml
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+TOL = 1e-6
+
+def _files(root: str, exts: Tuple[str, ...]) -> Dict[str, str]:
+    """{path relative to root without extension: path}"""
+    out = {}
+    for p in glob.glob(os.path.join(root, "**", "*"), recursive=True):
+        if p.lower().endswith(exts):
+            out[os.path.splitext(os.path.relpath(p, root))[0].replace(os.sep, "/")] = p
+    return out
+
+def read_labels(paths: List[str]) -> Tuple[np.ndarray, np.ndarray, List[List[str]]]:
+    """All rows of all files -> (file index per row, line number per row, tokens per row)."""
+    file_idx, line_no, rows = [], [], []
+    for i, path in enumerate(paths):
+        with open(path, "r", encoding="utf-8") as f:
+            for n, line in enumerate(f, 1):
+                tokens = line.split()
+                if tokens:
+                    file_idx.append(i)
+                    line_no.append(n)
+                    rows.append(tokens)
+    return np.array(file_idx, dtype=np.int64), np.array(line_no, dtype=np.int64), rows
+
+def _to_float(rows: List[List[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """(N, 5) values of detection rows and a mask of the rows that parsed."""
+    try:
+        return np.array(rows, dtype=np.float64).reshape(-1, 5), np.ones(len(rows), dtype=bool)
+    except ValueError:  # rare: find the bad rows one by one
+        values = np.full((len(rows), 5), np.nan)
+        ok = np.zeros(len(rows), dtype=bool)
+        for i, r in enumerate(rows):
+            try:
+                values[i] = [float(v) for v in r]
+                ok[i] = True
+            except ValueError:
+                pass
+        return values, ok
+
+def check_dataset(data_dir: str, names: Dict[int, str]) -> Tuple[List[Dict], Counter, dict]:
+    """-> (issues, instances per class name, totals)."""
+    issues: List[Dict] = []
+
+    def issue(level: str, path: str, line, message: str) -> None:
+        issues.append(dict(level=level, file=os.path.relpath(path, data_dir) if path else "", line=line,
+                           message=message))
+
+    nc = len(names)
+    data_yaml = os.path.join(data_dir, "data.yaml")
+    if os.path.exists(data_yaml):
+        doc = load_yaml(data_yaml) or {}
+        theirs = doc.get("names", {})
+        theirs = dict(enumerate(theirs)) if isinstance(theirs, list) else {int(k): v for k, v in theirs.items()}
+        if theirs != {int(k): v for k, v in names.items()}:
+            issue("error", data_yaml, "", f"names {theirs} differ from the taxonomy {dict(names)}")
+        if doc.get("nc") is not None and int(doc["nc"]) != nc:
+            issue("error", data_yaml, "", f"nc: {doc['nc']}, taxonomy has {nc} classes")
+
+    labels = _files(os.path.join(data_dir, "labels"), (".txt",))
+    images = _files(os.path.join(data_dir, "images"), IMAGE_EXTS)
+    for key in sorted(set(labels) - set(images)):
+        issue("error", labels[key], "", "label file without an image")
+    for key in sorted(set(images) - set(labels)):
+        issue("warning", images[key], "", "image without a label file")
+
+    paths = [labels[k] for k in sorted(labels)]
+    file_idx, line_no, rows = read_labels(paths)
+    n_fields = np.array([len(r) for r in rows], dtype=np.int64)
+    det = n_fields == 5
+    seg = (n_fields >= 7) & (n_fields % 2 == 1)
+    for i in np.flatnonzero(~det & ~seg):
+        issue("error", paths[file_idx[i]], int(line_no[i]), f"{n_fields[i]} values; expected 'class xc yc w h'")
+
+    # detection rows, vectorised
+    d_rows = np.flatnonzero(det)
+    values, parsed = _to_float([rows[i] for i in d_rows])
+    for i in d_rows[~parsed]:
+        issue("error", paths[file_idx[i]], int(line_no[i]), "non-numeric value")
+    d_rows, values = d_rows[parsed], values[parsed]
+    cls, xc, yc, w, h = values.T
+    bad_cls = (cls != np.round(cls)) | (cls < 0) | (cls >= nc)
+    bad_range = ((values[:, 1:] < -TOL) | (values[:, 1:] > 1 + TOL)).any(axis=1)
+    empty = (w <= 0) | (h <= 0)
+    outside = ~bad_range & (((xc - w / 2) < -TOL) | ((xc + w / 2) > 1 + TOL) |
+                            ((yc - h / 2) < -TOL) | ((yc + h / 2) > 1 + TOL))
+    for mask, level, message in ((bad_cls, "error", "class id {c} not in the taxonomy (0-{last})"),
+                                 (bad_range, "error", "coordinates outside [0, 1]"),
+                                 (empty, "error", "zero-size box"),
+                                 (outside, "warning", "box extends past the image border")):
+        for i, c in zip(d_rows[mask], cls[mask]):
+            issue(level, paths[file_idx[i]], int(line_no[i]), message.format(c=c, last=nc - 1))
+    dup_key = np.column_stack([file_idx[d_rows], values])
+    _, first, counts = np.unique(dup_key, axis=0, return_index=True, return_counts=True)
+    for i, n in zip(d_rows[first[counts > 1]], counts[counts > 1]):
+        issue("warning", paths[file_idx[i]], int(line_no[i]), f"row repeated {n} times")
+
+    # segment rows: class and range checks only
+    for i in np.flatnonzero(seg):
+        try:
+            v = np.array(rows[i], dtype=np.float64)
+        except ValueError:
+            issue("error", paths[file_idx[i]], int(line_no[i]), "non-numeric value")
+            continue
+        if v[0] != round(v[0]) or not 0 <= v[0] < nc:
+            issue("error", paths[file_idx[i]], int(line_no[i]), f"class id {v[0]} not in the taxonomy (0-{nc - 1})")
+        if ((v[1:] < -TOL) | (v[1:] > 1 + TOL)).any():
+            issue("error", paths[file_idx[i]], int(line_no[i]), "coordinates outside [0, 1]")
+
+    seg_cls = [float(rows[i][0]) for i in np.flatnonzero(seg) if _is_class(rows[i][0], nc)]
+    ok_cls = np.concatenate([cls[~(bad_cls | bad_range | empty)], seg_cls]).astype(np.int64)
+    instances = Counter({names[k]: int(n) for k, n in zip(*np.unique(ok_cls, return_counts=True))})
+    totals = dict(images=len(images), label_files=len(labels), boxes=len(rows),
+                  background=len(paths) - len(np.unique(file_idx)))
+    return issues, instances, totals
+
+def _is_class(token: str, nc: int) -> bool:
+    try:
+        v = float(token)
+    except ValueError:
+        return False
+    return v == round(v) and 0 <= v < nc
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Validate YOLO label files against configs/classes.yaml")
+    ap.add_argument("--data", default="data/dataset_yolo", help="Dataset root with images/ and labels/")
+    ap.add_argument("--classes", default="configs/classes.yaml")
+    ap.add_argument("--out", default=None, help="Write all issues to this CSV")
+    ap.add_argument("--show", type=int, default=20, help="Issues printed per level")
+    args = ap.parse_args(argv)
+
+    if not os.path.isdir(os.path.join(args.data, "labels")):
+        raise SystemExit(f"❌ No labels/ folder in {args.data}")
+    names = {int(k): str(v) for k, v in (load_yaml(args.classes).get("names") or {}).items()}
+    if not names:
+        raise SystemExit(f"❌ No class names in {args.classes}")
+
+    issues, instances, totals = check_dataset(args.data, names)
+    print(f"🏷️  {totals['label_files']} label files, {totals['images']} images, {totals['boxes']} boxes "
+          f"({totals['background']} empty label files)")
+    for k in sorted(names):
+        print(f"   {k}: {names[k]:20} {instances.get(names[k], 0):>7}")
+    for level, icon in (("error", "❌"), ("warning", "⚠️ ")):
+        found = [i for i in issues if i["level"] == level]
+        for i in found[:args.show]:
+            where = f"{i['file']}:{i['line']}" if i["line"] != "" else i["file"]
+            print(f"{icon} {where}: {i['message']}")
+        if len(found) > args.show:
+            print(f"   ... {len(found) - args.show} more {level}s")
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=["level", "file", "line", "message"])
+            w.writeheader()
+            w.writerows(issues)
+        print(f"   Issues: {args.out}")
+
+    errors = sum(1 for i in issues if i["level"] == "error")
+    if errors:
+        raise SystemExit(f"❌ {errors} label errors")
+    print(f"✅ Labels match the {len(names)}-class taxonomy")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Sample training frames from raw footage, without the near-duplicates that
+fixed cameras produce.
+
+    python -m src.tools.extract_frames --root data/raw_videos --out data/extracted --every_sec 1 --workers 4
+    python -m src.tools.extract_frames --root data/raw_videos/site01 --motion --vehicles --max_distance 8 \\
+        --against data/dataset_yolo
+
+Videos are processed in parallel, one per worker process. A sampled frame is
+kept when its perceptual hash (64-bit DCT hash) differs by more than
+--max_distance bits from every frame already kept for that site, including
+frames from earlier runs and from the --against datasets. Optional filters
+keep only frames with motion since the previous sample (--motion) or with at
+least --min_vehicles detections (--vehicles, uses the detector in
+configs/pipeline.yaml).
+
+Output, ready for labelling (see src/tools/check_labels.py afterwards):
+    <out>/images/<site>/<site>_<video>_frame_<index>.jpg
+    <out>/labels/<site>/                (empty, for the .txt files)
+    <out>/index.csv                     one row per image: source, time, hash, filters
+    <out>/data.yaml                     classes from configs/classes.yaml
+Re-running skips frames that are already extracted.
+"""
+from __future__ import annotations
+import argparse
+import csv
+import glob
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import cv2
+import numpy as np
+import yaml
+
+from src.parallel.batch import SITE_PREFIX, discover_videos
+from src.utils.config import load_yaml
+from src.utils.threads import limit_threads
+
+INDEX_COLUMNS = ("image", "site", "video", "frame_index", "t_sec", "phash", "motion", "vehicles")
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+HASH_SIZE = 32   # grey thumbnail side the DCT runs on
+BATCH = 64       # sampled frames hashed / detected together
+VEHICLE_NAMES = {"bicycle", "car", "motorcycle", "bus", "truck"}  # COCO classes of a stock model
+
+def _dct_matrix(n: int = HASH_SIZE, keep: int = 8) -> np.ndarray:
+    """First `keep` rows of the orthonormal DCT-II matrix."""
+    k = np.arange(keep)[:, None]
+    x = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m.astype(np.float32)
+
+_DCT = _dct_matrix()
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def thumbnail(img: np.ndarray) -> np.ndarray:
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    return cv2.resize(gray, (HASH_SIZE, HASH_SIZE), interpolation=cv2.INTER_AREA)
+
+def phash(thumbs: np.ndarray) -> np.ndarray:
+    """(N, 32, 32) grey thumbnails -> (N,) uint64 perceptual hashes: low 8x8 DCT above its median."""
+    coeffs = np.einsum("ij,njk,lk->nil", _DCT, thumbs.astype(np.float32), _DCT).reshape(len(thumbs), 64)
+    bits = coeffs > np.median(coeffs, axis=1, keepdims=True)
+    return np.packbits(bits, axis=1).view(">u8").astype(np.uint64).ravel()
+
+def hamming(hashes: np.ndarray, h: np.uint64) -> np.ndarray:
+    """Bit distance of every hash in `hashes` to h."""
+    return _POPCOUNT[(hashes ^ h).view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+class HashSet:
+    """Kept hashes; near() is one vectorised pass over all of them."""
+
+    def __init__(self, hashes: Iterable[int] = ()):
+        self._h = np.fromiter((int(h) for h in hashes), dtype=np.uint64)
+        self._n = len(self._h)
+
+    def near(self, h: np.uint64, max_distance: int) -> bool:
+        return self._n > 0 and int(hamming(self._h[:self._n], h).min()) <= max_distance
+
+    def add(self, h: np.uint64) -> None:
+        if self._n == len(self._h):
+            grown = np.zeros(max(64, 2 * self._n), dtype=np.uint64)
+            grown[:self._n] = self._h[:self._n]
+            self._h = grown
+        self._h[self._n] = h
+        self._n += 1
+
+    def __len__(self) -> int:
+        return self._n
+
+def hash_images(paths: Sequence[str]) -> np.ndarray:
+    thumbs = [thumbnail(img) for img in (cv2.imread(p) for p in paths) if img is not None]
+    return phash(np.stack(thumbs)) if thumbs else np.zeros(0, dtype=np.uint64)
+
+def image_name(site: str, video: str, frame_index: int) -> str:
+    stem = os.path.splitext(os.path.basename(video))[0]
+    prefix = "" if stem.lower().startswith(site.lower()) else f"{site}_"
+    return f"{prefix}{stem}_frame_{frame_index:06d}.jpg"
+
+def site_of(video: str, root: str) -> str:
+    """siteNN folder (or siteNN_ file-name prefix) of a video; 'unsorted' otherwise."""
+    folder = os.path.basename(os.path.dirname(os.path.abspath(video)))
+    if folder.lower().startswith("site"):
+        return folder
+    m = SITE_PREFIX.match(os.path.basename(video))
+    return m.group(1) if m else "unsorted"
+
+def _vehicle_counter(cfg: dict, names: Sequence[str]):
+    from src.detect.backends import backend_options
+    from src.detect.yolo_detector import YoloDetector
+
+    det_cfg = cfg["detector"]
+    detector = YoloDetector(model_name=det_cfg["model"], conf=float(det_cfg["conf"]), iou=float(det_cfg["iou"]),
+                            imgsz=int(det_cfg["imgsz"]), **backend_options(det_cfg))
+    wanted = np.array([str(n) in set(names) for _, n in sorted(detector.names.items())])
+
+    def count(frames: List[np.ndarray]) -> List[int]:
+        return [int(wanted[cls[cls < len(wanted)]].sum()) for _, _, cls in detector.detect_arrays(frames)]
+    return count
+
+def extract_video(video: str, site: str, out_dir: str, every_sec: float, max_distance: int,
+                  known: Sequence[int] = (), motion: Optional[dict] = None, vehicles: Optional[dict] = None,
+                  quality: int = 95) -> Dict:
+    """Sample, filter, dedupe and write one video's frames -> {"rows": [...], "stats": {...}}."""
+    from src.detect.roi import MotionGate
+    from src.ingest.video_reader import iter_video_frames
+
+    t0 = time.perf_counter()
+    img_dir = os.path.join(out_dir, "images", site)
+    os.makedirs(img_dir, exist_ok=True)
+    kept = HashSet(known)
+    gate = None
+    if motion is not None:
+        gate = MotionGate(threshold=float(motion.get("threshold", 25)),
+                          min_area_frac=float(motion.get("min_area_frac", 0.002)),
+                          downscale=int(motion.get("downscale", 4)), max_skip_frames=2 ** 31)
+    count_vehicles = _vehicle_counter(vehicles["cfg"], vehicles["names"]) if vehicles is not None else None
+    min_vehicles = int(vehicles.get("min", 1)) if vehicles is not None else 0
+    stats = dict(sampled=0, no_motion=0, duplicate=0, no_vehicles=0, written=0)
+    rows: List[Dict] = []
+
+    def flush(batch: List) -> None:
+        if not batch:
+            return
+        hashes = phash(np.stack([thumbnail(pkt.frame_bgr) for pkt in batch]))
+        fresh = []
+        for pkt, h in zip(batch, hashes):
+            if kept.near(h, max_distance):
+                stats["duplicate"] += 1
+                continue
+            fresh.append((pkt, h))
+            kept.add(h)  # a later frame is compared with this one even if the detector drops it
+        counts = count_vehicles([pkt.frame_bgr for pkt, _ in fresh]) if count_vehicles and fresh else None
+        for i, (pkt, h) in enumerate(fresh):
+            n = counts[i] if counts is not None else None
+            if n is not None and n < min_vehicles:
+                stats["no_vehicles"] += 1
+                continue
+            name = image_name(site, video, pkt.frame_index)
+            cv2.imwrite(os.path.join(img_dir, name), pkt.frame_bgr, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+            stats["written"] += 1
+            rows.append(dict(image=f"images/{site}/{name}", site=site, video=os.path.abspath(video),
+                             frame_index=pkt.frame_index, t_sec=round(pkt.t_sec, 3), phash=f"{int(h):016x}",
+                             motion=True if gate is not None else "", vehicles=n if n is not None else ""))
+        batch.clear()
+
+    frames, _ = iter_video_frames(video, fps_infer=1.0 / every_sec, decode_mode="grab")
+    batch: List = []
+    for pkt in frames:
+        stats["sampled"] += 1
+        if gate is not None and not gate.check(pkt.frame_bgr):
+            stats["no_motion"] += 1
+            continue
+        batch.append(pkt)
+        if len(batch) >= BATCH:
+            flush(batch)
+    flush(batch)
+    stats["elapsed_sec"] = round(time.perf_counter() - t0, 3)
+    return {"rows": rows, "stats": stats}
+
+def prune_site_duplicates(rows: List[Dict], out_dir: str, max_distance: int) -> int:
+    """Videos of a site are deduped in parallel; drop frames that repeat one from another video."""
+    removed = 0
+    by_site: Dict[str, List[Dict]] = {}
+    for r in rows:
+        by_site.setdefault(r["site"], []).append(r)
+    keep_rows = []
+    for site_rows in by_site.values():
+        kept = HashSet()
+        for r in sorted(site_rows, key=lambda r: (r["video"], int(r["frame_index"]))):
+            h = np.uint64(int(r["phash"], 16))
+            if kept.near(h, max_distance):
+                os.remove(os.path.join(out_dir, r["image"]))
+                removed += 1
+                continue
+            kept.add(h)
+            keep_rows.append(r)
+    rows[:] = keep_rows
+    return removed
+
+def load_index(path: str) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+def write_index(rows: List[Dict], path: str) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=INDEX_COLUMNS)
+        w.writeheader()
+        w.writerows(sorted(rows, key=lambda r: r["image"]))
+    os.replace(tmp, path)
+
+def write_data_yaml(out_dir: str, names: Dict[int, str]) -> str:
+    path = os.path.join(out_dir, "data.yaml")
+    doc = {"path": out_dir, "train": "images", "val": "images", "nc": len(names),
+           "names": {int(k): v for k, v in names.items()}}
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# Extracted frames for labelling (src/tools/extract_frames.py); split before training\n")
+        yaml.safe_dump(doc, f, sort_keys=False)
+    return path
+
+def _against_hashes(dirs: Sequence[str]) -> np.ndarray:
+    paths = [p for d in dirs for p in glob.glob(os.path.join(d, "**", "*"), recursive=True)
+             if p.lower().endswith(IMAGE_EXTS)]
+    return hash_images(paths)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Extract de-duplicated training frames from raw videos")
+    ap.add_argument("--root", default="data/raw_videos", help="Video file or folder (searched recursively)")
+    ap.add_argument("--out", default="data/extracted")
+    ap.add_argument("--every_sec", type=float, default=1.0, help="Sample one frame per this many seconds")
+    ap.add_argument("--max_distance", type=int, default=6,
+                    help="Hash bits (of 64) within which two frames count as duplicates")
+    ap.add_argument("--against", action="append", default=[],
+                    help="Image folder / dataset whose frames are not extracted again (repeatable)")
+    ap.add_argument("--motion", action="store_true",
+                    help="Keep only frames with motion since the previous sample (motion_gate: settings)")
+    ap.add_argument("--vehicles", action="store_true", help="Keep only frames with detected vehicles")
+    ap.add_argument("--min_vehicles", type=int, default=1)
+    ap.add_argument("--quality", type=int, default=95, help="JPEG quality")
+    ap.add_argument("--workers", type=int, default=max(1, min(4, (os.cpu_count() or 1) // 2)))
+    ap.add_argument("--config", default="configs/pipeline.yaml")
+    ap.add_argument("--classes", default="configs/classes.yaml")
+    args = ap.parse_args(argv)
+
+    if args.every_sec <= 0:
+        raise SystemExit("❌ --every_sec must be positive")
+    videos = [args.root] if os.path.isfile(args.root) else discover_videos(args.root)
+    if not videos:
+        raise SystemExit(f"❌ No videos under {args.root}")
+    cfg = load_yaml(args.config)
+    names = load_yaml(args.classes).get("names", {})
+
+    os.makedirs(args.out, exist_ok=True)
+    index_path = os.path.join(args.out, "index.csv")
+    rows = load_index(index_path)
+    done = {(r["video"], int(r["frame_index"])) for r in rows}
+    against = _against_hashes(args.against)
+    known: Dict[str, List[int]] = {}
+    for r in rows:
+        known.setdefault(r["site"], []).append(int(r["phash"], 16))
+    if len(against):
+        print(f"🔎 {len(against)} images in {', '.join(args.against)} hashed")
+
+    jobs = [(v, site_of(v, args.root)) for v in videos]
+    vehicles = None
+    if args.vehicles:
+        vehicles = {"cfg": cfg, "names": sorted(VEHICLE_NAMES | {str(n) for n in names.values()}),
+                    "min": args.min_vehicles}
+    motion = cfg.get("motion_gate", {}) if args.motion else None
+
+    workers = max(1, min(args.workers, len(jobs)))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    new_rows: List[Dict] = []
+    totals: Dict[str, float] = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+                             initializer=limit_threads, initargs=(threads,)) as pool:
+        futs = {pool.submit(extract_video, video, site, args.out, args.every_sec, args.max_distance,
+                            known.get(site, []) + [int(h) for h in against], motion, vehicles, args.quality):
+                video for video, site in jobs}
+        for fut in as_completed(futs):
+            video = futs[fut]
+            try:
+                res = fut.result()
+            except Exception as e:
+                print(f"❌ {video}: {type(e).__name__}: {e}")
+                continue
+            st = res["stats"]
+            new_rows += [r for r in res["rows"] if (r["video"], int(r["frame_index"])) not in done]
+            for k, v in st.items():
+                totals[k] = totals.get(k, 0) + v
+            print(f"✅ {os.path.basename(video)}: {st['written']} of {st['sampled']} sampled frames "
+                  f"({st['duplicate']} duplicates, {st['no_motion']} without motion, "
+                  f"{st['no_vehicles']} without vehicles) in {st['elapsed_sec']}s")
+
+    removed = prune_site_duplicates(new_rows, args.out, args.max_distance)
+    for site in {site for _, site in jobs}:
+        os.makedirs(os.path.join(args.out, "labels", site), exist_ok=True)
+    write_index(rows + new_rows, index_path)
+    write_data_yaml(args.out, names)
+
+    print(f"\n📊 Summary: {len(new_rows)} new images ({removed} more duplicates across videos), "
+          f"{len(rows) + len(new_rows)} in {args.out}")
+    print(f"   Index: {index_path}")
+
+if __name__ == "__main__":
+    main()
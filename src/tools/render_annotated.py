@@ -0,0 +1,85 @@
+"""
+Render the annotated video of a processed run from its track cache.
+
+With output.annotated_mode: deferred, process_video skips drawing during the run
+and calls this afterwards; it can also be run on its own (e.g. only for the
+videos someone wants to review):
+
+    python -m src.tools.render_annotated --input data/raw_videos/site01_20260118_1800.mp4 --site site01 --out out/
+
+Only the cached frames are decoded; the output follows the output: settings
+(annotated_scale, annotated_fps, annotated_encoder, ffmpeg).
+"""
+from __future__ import annotations
+import argparse
+import os
+from typing import Optional, Set
+
+import numpy as np
+from tqdm import tqdm
+
+from src.utils.config import load_yaml, ensure_dirs
+from src.count.zones import parse_zones
+from src.detect.roi import RegionOfInterest
+from src.export.annotation_sink import build_annotation_sink
+from src.ingest.video_reader import iter_frames_at
+from src.track.batch import class_filter
+from src.track.cache import TrackCache, cache_key, has_cache
+
+def render_from_cache(video_path: str, cache: TrackCache, site_cfg: dict, out_cfg: dict, keep: Set[str],
+                      out_path: str, progress: bool = True) -> dict:
+    """Draw the cached tracks over the decoded frames -> annotation sink stats."""
+    meta = cache.meta
+    size = (int(meta["frame_width"]), int(meta["frame_height"]))
+    roi = None
+    if cache.recorded_with.get("roi"):
+        roi = RegionOfInterest(*cache.recorded_with["roi"]).scaled(meta["scale"], *size)
+    sink = build_annotation_sink(out_path, out_cfg, size, float(meta["fps_infer"]),
+                                 zones=parse_zones(site_cfg, meta["scale"]), roi=roi).start()
+    keep_table = class_filter(cache.names, keep)
+    frames = iter_frames_at(video_path, np.asarray(cache.frame_index).tolist(), size=size)
+    try:
+        for (_, _, tracked), pkt in tqdm(zip(cache.iter_frames(), frames), total=cache.n_frames,
+                                         desc="Render", unit="frame", disable=not progress):
+            if keep:
+                tracked = tracked.only(keep_table)
+            sink.submit(pkt.frame_bgr, tracked)
+    finally:
+        stats = sink.close()
+    return stats
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Render the annotated video from a run's track cache")
+    ap.add_argument("--input", required=True, help="Video that was processed with the track cache enabled")
+    ap.add_argument("--site", required=True, help="site key in configs/sites.yaml")
+    ap.add_argument("--config", default="configs/pipeline.yaml")
+    ap.add_argument("--sites", default="configs/sites.yaml")
+    ap.add_argument("--classes", default="configs/classes.yaml")
+    ap.add_argument("--out", default="out")
+    ap.add_argument("--cache_dir", default=None, help="Override cache.dir from the pipeline config")
+    ap.add_argument("--output", default=None, help="Video path (default: <out>/annotated_videos/<site_id>_annotated.mp4)")
+    args = ap.parse_args(argv)
+
+    cfg = load_yaml(args.config)
+    sites = (load_yaml(args.sites) or {}).get("sites", {})
+    if args.site not in sites:
+        raise SystemExit(f"❌ Site '{args.site}' not calibrated (see python -m src.tools.calibrate_site)")
+    site_cfg = sites[args.site]
+    keep = set(load_yaml(args.classes).get("keep_classes", []))
+
+    cache_dir = args.cache_dir or cfg.get("cache", {}).get("dir", "cache/tracks")
+    key, _ = cache_key(args.input, cfg)
+    if not has_cache(cache_dir, key):
+        raise SystemExit(
+            f"❌ No track cache for this video and detector/tracker settings in {cache_dir}.\n"
+            f"Run python -m src.process_video --input {args.input} --site {args.site} with cache.enabled: true first."
+        )
+    out_path: Optional[str] = args.output
+    if out_path is None:
+        out_path = os.path.join(ensure_dirs(args.out).annotated_dir, f"{site_cfg['site_id']}_annotated.mp4")
+    stats = render_from_cache(args.input, TrackCache.open(cache_dir, key), site_cfg, cfg["output"], keep, out_path)
+    print(f"✅ Rendered {stats['frames_written']} frames ({stats['encoder']}, {stats['fps']} fps)")
+    print(f"Video: {stats['path']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+Speed-versus-accuracy sweep over pipeline.yaml settings on reference clips
+with ground-truth 15-minute counts.
+
+    python -m src.tools.sweep --refs data/ground_truth/refs.yaml --out reports/sweep \\
+        --fps_infer 5,10 --imgsz 640,960 --model yolov8n.pt,yolov8s.pt --min_track_age 2,3,4 \\
+        --workers 2 --target 0.05
+
+refs.yaml lists the clips:
+
+    clips:
+      - input: data/raw_videos/site01/site01_20260118_1800_day.mp4
+        site: site01
+        truth: data/ground_truth/site01_20260118_1800_day.csv
+
+A truth CSV has the counts_15min.csv columns bucket_start_sec, vehicle_class
+and count (a run's counts_15min.csv, corrected by hand, will do). Predicted
+counts use the same clock-aligned buckets as process_video, so clips named
+siteNN_YYYYMMDD_HHMM that start between quarter hours line up with their
+truth. Grid options not given keep the value from --config.
+
+Detection settings (model, imgsz, conf, iou, fps_infer) need a full run per
+clip; these run in parallel worker processes and record a track cache. Counting
+settings (min_track_age_frames) are replayed from that cache, so they add
+almost nothing. Finished runs are kept in <out>/runs.jsonl and skipped when the
+sweep is repeated or extended with the same --config, --sites and --classes.
+
+Speed is reported as x_realtime (video seconds per wall second), which unlike
+frames/s is comparable across fps_infer values. Error is WAPE: sum of
+|predicted - true| over buckets and classes, divided by the true total. Workers
+share the CPU, so compare speeds within one sweep (or use --workers 1).
+
+Outputs in --out: results.csv (one row per configuration and site),
+per_class.csv, pareto.csv, and the fastest configuration within --target per
+site on stdout.
+"""
+from __future__ import annotations
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing as mp
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import yaml
+
+from src.aggregate.online import OnlineAggregator, parse_recording_start
+from src.utils.config import load_yaml
+from src.utils.hashing import obj_sha256
+from src.utils.threads import limit_threads
+
+def apply_point(cfg: dict, point: dict) -> dict:
+    """Copy of cfg with the sweep values filled in."""
+    out = dict(cfg, detector=dict(cfg["detector"]), counting=dict(cfg["counting"]))
+    for key in ("model", "imgsz", "conf", "iou"):
+        if key in point:
+            out["detector"][key] = point[key]
+    if "fps_infer" in point:
+        out["fps_infer"] = point["fps_infer"]
+    if "min_track_age" in point:
+        out["counting"]["min_track_age_frames"] = point["min_track_age"]
+    return out
+
+def grid(values: Dict[str, list]) -> List[dict]:
+    keys = list(values)
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(values[k] for k in keys))]
+
+def load_truth(path: str) -> Counter:
+    """{(bucket_start_sec, vehicle_class): count}"""
+    truth = Counter()
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            truth[(int(float(row["bucket_start_sec"])), row["vehicle_class"])] += int(float(row["count"]))
+    return truth
+
+def _parse_list(text: Optional[str], cast) -> Optional[list]:
+    return [cast(v.strip()) for v in text.split(",") if v.strip()] if text else None
+
+def run_detection(clip: dict, cfg: dict, det_point: dict, min_ages: Sequence[int], out_dir: str,
+                  sites_path: str, classes_path: str, run_id: str) -> dict:
+    """
+    One process_video run of a clip at one detection setting (worker process),
+    then a replay of its track cache for every min_track_age value.
+    """
+    from src.process_video import build_arg_parser, run
+
+    run_cfg = apply_point(cfg, det_point)
+    run_cfg["cache"] = dict(cfg.get("cache", {}), enabled=True, dir=os.path.join(out_dir, "cache"))
+    run_cfg["output"] = dict(cfg["output"], write_annotated_video=False)
+    run_cfg["store"] = dict(cfg.get("store", {}), enabled=False)
+    run_dir = os.path.join(out_dir, "runs", run_id[:12], os.path.splitext(os.path.basename(clip["input"]))[0])
+    os.makedirs(run_dir, exist_ok=True)
+    cfg_path = os.path.join(run_dir, "pipeline.yaml")
+    with open(cfg_path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(run_cfg, f, sort_keys=False)
+
+    args = build_arg_parser().parse_args([
+        "--input", clip["input"], "--site", clip["site"], "--out", run_dir,
+        "--config", cfg_path, "--sites", sites_path, "--classes", classes_path])
+    summary = run(args)
+    perf = summary["perf"]
+
+    site_cfg = (load_yaml(sites_path) or {}).get("sites", {})[clip["site"]]
+    keep = set(load_yaml(classes_path).get("keep_classes", []))
+    counts = replay_counts(summary["outputs"]["track_cache"], site_cfg, run_cfg, keep, min_ages,
+                           origin=parse_recording_start(clip["input"]))
+    meta = summary["meta"]
+    return dict(run_id=run_id, clip=clip["input"], site=clip["site"], det_point=det_point, frames=perf["frames_processed"],
+                elapsed_sec=perf["elapsed_sec"], video_sec=round(meta["total_frames"] / float(meta["src_fps"]), 3),
+                cache=summary["outputs"]["track_cache"], config=cfg_path, counts=counts)
+
+def replay_counts(cache_path: str, site_cfg: dict, cfg: dict, keep: set, min_ages: Sequence[int],
+                  origin: Optional[datetime] = None) -> Dict[str, dict]:
+    """
+    15-minute counts per min_track_age value, counted from a track cache -> {age: {"start|class": n}}.
+    Buckets are those of counts_15min.csv for a recording starting at `origin`.
+    """
+    from src.process_video import build_counter, count_keys
+    from src.track.batch import class_filter
+    from src.track.cache import TrackCache
+
+    cache = TrackCache(cache_path)
+    rule = cfg["counting"]["rule"]
+    keep_table = class_filter(cache.names, keep)
+    counts = {}
+    for age in min_ages:
+        counter = build_counter(site_cfg, apply_point(cfg, {"min_track_age": age}), scale=cache.meta["scale"])
+        agg = OnlineAggregator((15,), origin=origin, extra_keys=count_keys(site_cfg, cfg), daily=False)
+        for t_sec, _, tracked in cache.iter_frames():
+            if keep:
+                tracked = tracked.only(keep_table)
+            agg.add(counter.update(t_sec, tracked, rule_name=rule))
+        table = Counter()
+        for row in agg.flush().get("15min", []):
+            table[f"{int(float(row['bucket_start_sec']))}|{row['vehicle_class']}"] += row["count"]
+        counts[str(age)] = dict(table)
+    return counts
+
+def score(runs: List[dict], truths: Dict[str, Counter], min_age: int) -> Tuple[dict, Dict[str, dict]]:
+    """Error and speed of one configuration over some clips -> (totals, per class)."""
+    per_class: Dict[str, dict] = {}
+    abs_err = gt_total = pred_total = 0
+    video_sec = elapsed = 0.0
+    for r in runs:
+        truth = truths[r["clip"]]
+        pred = Counter()
+        for key, n in r["counts"][str(min_age)].items():
+            start, cls = key.split("|", 1)
+            pred[(int(start), cls)] = n
+        for key in set(truth) | set(pred):
+            err = abs(pred[key] - truth[key])
+            c = per_class.setdefault(key[1], dict(gt=0, pred=0, abs_err=0, buckets=0))
+            c["gt"] += truth[key]
+            c["pred"] += pred[key]
+            c["abs_err"] += err
+            c["buckets"] += 1
+            abs_err += err
+            gt_total += truth[key]
+            pred_total += pred[key]
+        video_sec += r["video_sec"]
+        elapsed += r["elapsed_sec"]
+    for c in per_class.values():
+        c["mae_per_bucket"] = round(c["abs_err"] / c["buckets"], 3) if c["buckets"] else 0.0
+        c["total_error_pct"] = round(100.0 * (c["pred"] - c["gt"]) / c["gt"], 2) if c["gt"] else None
+    totals = dict(gt=gt_total, pred=pred_total, abs_err=abs_err,
+                  wape=round(abs_err / gt_total, 4) if gt_total else None,
+                  x_realtime=round(video_sec / elapsed, 3) if elapsed > 0 else None,
+                  elapsed_sec=round(elapsed, 3), clips=len(runs))
+    return totals, per_class
+
+def pareto_front(rows: List[dict]) -> List[dict]:
+    """Rows not beaten on both error (lower) and speed (higher) by another row."""
+    scored = [r for r in rows if r["wape"] is not None and r["x_realtime"] is not None]
+    front = []
+    for r in scored:
+        dominated = any(o["wape"] <= r["wape"] and o["x_realtime"] >= r["x_realtime"]
+                        and (o["wape"] < r["wape"] or o["x_realtime"] > r["x_realtime"]) for o in scored)
+        if not dominated:
+            front.append(r)
+    return sorted(front, key=lambda r: r["x_realtime"])
+
+def _write_csv(rows: List[dict], path: str) -> None:
+    columns = list(dict.fromkeys(k for r in rows for k in r))
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=columns)
+        w.writeheader()
+        w.writerows(rows)
+
+def load_runs(path: str) -> Dict[str, dict]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        runs = [json.loads(line) for line in f if line.strip()]
+    # runs recorded before the id covered the configs have no run_id: run them again
+    return {r["run_id"]: r for r in runs if "run_id" in r}
+
+def save_runs(runs: Dict[str, dict], path: str) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for r in runs.values():
+            f.write(json.dumps(r, sort_keys=True) + "\n")
+    os.replace(tmp, path)
+
+def _run_id(clip: str, det_point: dict, cfg: dict, site_cfg: dict, keep: set) -> str:
+    """A run is reused only for the same clip, point, effective config, site calibration and classes."""
+    return obj_sha256({"clip": os.path.abspath(clip), "point": det_point, "config": apply_point(cfg, det_point),
+                       "site": site_cfg, "keep_classes": sorted(keep)})
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Sweep detection/counting settings against ground-truth counts")
+    ap.add_argument("--refs", required=True, help="YAML list of reference clips with truth CSVs")
+    ap.add_argument("--out", default="reports/sweep")
+    ap.add_argument("--config", default="configs/pipeline.yaml")
+    ap.add_argument("--sites", default="configs/sites.yaml")
+    ap.add_argument("--classes", default="configs/classes.yaml")
+    ap.add_argument("--model", default=None, help="Comma-separated weights, e.g. yolov8n.pt,yolov8s.pt")
+    ap.add_argument("--imgsz", default=None, help="Comma-separated, e.g. 640,960")
+    ap.add_argument("--conf", default=None)
+    ap.add_argument("--iou", default=None)
+    ap.add_argument("--fps_infer", default=None)
+    ap.add_argument("--min_track_age", default=None, help="counting.min_track_age_frames values")
+    ap.add_argument("--target", type=float, default=0.05, help="Accuracy target: largest acceptable WAPE")
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--force", action="store_true", help="Re-run detection points already in runs.jsonl")
+    args = ap.parse_args(argv)
+
+    cfg = load_yaml(args.config)
+    clips = (load_yaml(args.refs) or {}).get("clips", [])
+    if not clips:
+        raise SystemExit(f"❌ No clips in {args.refs}")
+    sites = (load_yaml(args.sites) or {}).get("sites", {})
+    for clip in clips:
+        if clip["site"] not in sites:
+            raise SystemExit(f"❌ Site '{clip['site']}' of {clip['input']} is not in {args.sites}")
+        for key in ("input", "truth"):
+            if not os.path.exists(clip[key]):
+                raise SystemExit(f"❌ {key} not found: {clip[key]}")
+    truths = {c["input"]: load_truth(c["truth"]) for c in clips}
+
+    det_cfg = cfg["detector"]
+    det_values = {
+        "model": _parse_list(args.model, str) or [det_cfg["model"]],
+        "imgsz": _parse_list(args.imgsz, int) or [int(det_cfg["imgsz"])],
+        "conf": _parse_list(args.conf, float) or [float(det_cfg["conf"])],
+        "iou": _parse_list(args.iou, float) or [float(det_cfg["iou"])],
+        "fps_infer": _parse_list(args.fps_infer, float) or [float(cfg["fps_infer"])],
+    }
+    min_ages = _parse_list(args.min_track_age, int) or [int(cfg["counting"]["min_track_age_frames"])]
+    det_points = grid(det_values)
+
+    os.makedirs(args.out, exist_ok=True)
+    runs_path = os.path.join(args.out, "runs.jsonl")
+    done = {} if args.force else load_runs(runs_path)
+    keep = set(load_yaml(args.classes).get("keep_classes", []))
+    run_ids = {(clip["input"], i): _run_id(clip["input"], p, cfg, sites[clip["site"]], keep)
+               for i, p in enumerate(det_points) for clip in clips}
+    todo = [(clip, p, run_ids[clip["input"], i]) for i, p in enumerate(det_points) for clip in clips
+            if run_ids[clip["input"], i] not in done or not os.path.isdir(done[run_ids[clip["input"], i]]["cache"])]
+    for r in done.values():  # new counting values for finished runs: replay only
+        missing = [a for a in min_ages if str(a) not in r["counts"]]
+        if missing and os.path.isdir(r["cache"]) and r["site"] in sites:
+            r["counts"].update(replay_counts(r["cache"], sites[r["site"]], load_yaml(r["config"]), keep, missing,
+                                             origin=parse_recording_start(r["clip"])))
+            save_runs(done, runs_path)
+    print(f"🧪 {len(det_points)} detection settings x {len(min_ages)} counting settings on {len(clips)} clips: "
+          f"{len(todo)} runs to do, {len(det_points) * len(clips) - len(todo)} reused")
+
+    if todo:
+        workers = max(1, min(args.workers, len(todo)))
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        t0 = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+                                 initializer=limit_threads, initargs=(threads,)) as pool:
+            futs = {pool.submit(run_detection, clip, cfg, p, min_ages, args.out, args.sites, args.classes,
+                                run_id): (clip, p, run_id) for clip, p, run_id in todo}
+            for fut in as_completed(futs):
+                clip, p, run_id = futs[fut]
+                try:
+                    r = fut.result()
+                except BaseException as e:  # SystemExit from process_video is a failed point too
+                    print(f"❌ {os.path.basename(clip['input'])} {p}: {type(e).__name__}: {e}")
+                    continue
+                done[run_id] = r
+                save_runs(done, runs_path)
+                print(f"✅ {os.path.basename(clip['input'])} {p}: {r['video_sec'] / r['elapsed_sec']:.2f}x realtime")
+        print(f"   {len(todo)} runs in {time.perf_counter() - t0:.1f}s")
+
+    results, class_rows = [], []
+    for i, p in enumerate(det_points):
+        for age in min_ages:
+            point = dict(p, min_track_age=age)
+            runs = [done[run_ids[c["input"], i]] for c in clips if run_ids[c["input"], i] in done]
+            run_sites = sorted({r["site"] for r in runs})
+            for site in run_sites + (["all"] if len(run_sites) > 1 else []):
+                site_runs = [r for r in runs if site == "all" or r["site"] == site]
+                totals, per_class = score(site_runs, truths, age)
+                results.append(dict(site=site, **point, **totals))
+                class_rows += [dict(site=site, **point, vehicle_class=cls, **c) for cls, c in sorted(per_class.items())]
+    if not results:
+        raise SystemExit("❌ No finished runs to score")
+
+    fronts = []
+    print(f"\n{'site':8} {'model':14} {'imgsz':>5} {'conf':>5} {'iou':>5} {'fps':>5} {'age':>4} "
+          f"{'WAPE':>7} {'x_rt':>7}")
+    for site in dict.fromkeys(r["site"] for r in results):
+        rows = [r for r in results if r["site"] == site]
+        front = pareto_front(rows)
+        fronts += [dict(r, pareto=True) for r in front]
+        for r in front:
+            print(f"{site:8} {os.path.basename(str(r['model'])):14} {r['imgsz']:>5} {r['conf']:>5} {r['iou']:>5} "
+                  f"{r['fps_infer']:>5} {r['min_track_age']:>4} {r['wape']:>7.3f} {r['x_realtime']:>7.2f}")
+        ok = [r for r in front if r["wape"] <= args.target]
+        if ok:
+            best = max(ok, key=lambda r: r["x_realtime"])
+            print(f"   ✅ {site}: fastest within WAPE {args.target}: model={best['model']} imgsz={best['imgsz']} "
+                  f"conf={best['conf']} iou={best['iou']} fps_infer={best['fps_infer']} "
+                  f"min_track_age_frames={best['min_track_age']} ({best['x_realtime']}x realtime)")
+        else:
+            print(f"   ⚠️  {site}: no configuration reaches WAPE {args.target}")
+
+    _write_csv(results, os.path.join(args.out, "results.csv"))
+    _write_csv(class_rows, os.path.join(args.out, "per_class.csv"))
+    _write_csv(fronts, os.path.join(args.out, "pareto.csv"))
+    print(f"\n   Results: {os.path.join(args.out, 'results.csv')}")
+
+if __name__ == "__main__":
+    main()
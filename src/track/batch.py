@@ -0,0 +1,99 @@
+"""
+Per-frame tracker output as columns instead of one object per box.
+
+A TrackBatch holds a frame's tracks as NumPy arrays (track_id (K,), xyxy (K,4),
+conf (K,), cls_id (K,)) plus the model's id -> name map. Trackers build one
+straight from their output arrays; class filtering, counting, the track cache
+and the annotation sink work on the columns, so a frame costs a few array
+operations however many vehicles are in it.
+
+Code that wants one object at a time can still iterate a batch: it yields
+TrackedObject records (plain __slots__ classes), built only on demand.
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+class TrackedObject:
+    __slots__ = ("track_id", "xyxy", "conf", "cls_id", "cls_name")
+
+    def __init__(self, track_id: int, xyxy: Tuple[float, float, float, float], conf: float,
+                 cls_id: int, cls_name: str):
+        self.track_id = track_id
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls_id = cls_id
+        self.cls_name = cls_name
+
+    def __repr__(self) -> str:
+        return (f"TrackedObject(track_id={self.track_id}, xyxy={self.xyxy}, conf={self.conf}, "
+                f"cls_id={self.cls_id}, cls_name={self.cls_name!r})")
+
+def class_filter(names: Dict[int, str], keep: Iterable[str]) -> np.ndarray:
+    """Lookup table for TrackBatch.only(): entry k is True when class id k is kept.
+    The last entry (False) stands for every id the model does not name."""
+    keep = set(keep)
+    ids = [int(k) for k in names]
+    table = np.zeros(max(ids, default=-1) + 2, dtype=bool)
+    table[[k for k in ids if names[k] in keep]] = True
+    return table
+
+class TrackBatch:
+    __slots__ = ("track_id", "xyxy", "conf", "cls_id", "names")
+
+    def __init__(self, track_id, xyxy, conf, cls_id, names: Dict[int, str]):
+        self.track_id = np.asarray(track_id, dtype=np.int64).reshape(-1)
+        self.xyxy = np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)
+        self.conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+        self.cls_id = np.asarray(cls_id, dtype=np.int64).reshape(-1)
+        self.names = names
+
+    @classmethod
+    def _wrap(cls, track_id, xyxy, conf, cls_id, names) -> "TrackBatch":
+        """Columns that already have the right dtypes and shapes (no conversion)."""
+        out = cls.__new__(cls)
+        out.track_id, out.xyxy, out.conf, out.cls_id, out.names = track_id, xyxy, conf, cls_id, names
+        return out
+
+    @classmethod
+    def empty(cls, names: Dict[int, str]) -> "TrackBatch":
+        return cls(np.zeros(0), np.zeros((0, 4)), np.zeros(0), np.zeros(0), names)
+
+    def __len__(self) -> int:
+        return len(self.track_id)
+
+    def __getitem__(self, index):
+        """An int gives one TrackedObject; a slice, index array or boolean mask gives a TrackBatch."""
+        if isinstance(index, (int, np.integer)):
+            k = int(self.cls_id[index])
+            return TrackedObject(int(self.track_id[index]), tuple(self.xyxy[index].tolist()),
+                                 float(self.conf[index]), k, self.name(k))
+        return TrackBatch._wrap(self.track_id[index], self.xyxy[index], self.conf[index], self.cls_id[index],
+                                self.names)
+
+    def __iter__(self) -> Iterator[TrackedObject]:
+        names = self.cls_names
+        for tid, box, c, k, name in zip(self.track_id.tolist(), self.xyxy.tolist(), self.conf.tolist(),
+                                        self.cls_id.tolist(), names):
+            yield TrackedObject(tid, tuple(box), c, k, name)
+
+    def __repr__(self) -> str:
+        return f"TrackBatch({len(self)} tracks)"
+
+    def name(self, cls_id: int) -> str:
+        return str(self.names.get(cls_id, cls_id))
+
+    @property
+    def cls_names(self) -> List[str]:
+        return [self.name(k) for k in self.cls_id.tolist()]
+
+    def only(self, keep: np.ndarray) -> "TrackBatch":
+        """Tracks of the kept classes (`keep` from class_filter); no copy when all are kept."""
+        mask = keep[np.minimum(self.cls_id, len(keep) - 1)]
+        return self if mask.all() else self[mask]
+
+    def shifted(self, dx: float, dy: float) -> "TrackBatch":
+        """Boxes moved by (dx, dy), e.g. from ROI-crop to frame coordinates."""
+        return TrackBatch._wrap(self.track_id, self.xyxy + np.array([dx, dy, dx, dy], dtype=np.float64),
+                                self.conf, self.cls_id, self.names)
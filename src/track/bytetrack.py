@@ -0,0 +1,301 @@
+"""
+Vectorized ByteTrack over NumPy detection arrays.
+
+Same association scheme as Ultralytics' BYTETracker (tracker.type: bytetrack),
+without the per-track Python objects:
+
+1. Kalman-predict every confirmed and lost track (constant velocity, xyah state).
+2. Match high-score detections (>= track_high_thresh) to confirmed + lost
+   tracks on IoU (optionally fused with the detection score).
+3. Match low-score detections to the still unmatched tracked tracks (IoU 0.5);
+   tracked tracks left over become lost.
+4. Match the remaining high-score detections to tentative tracks (IoU 0.7);
+   tentative tracks left over are dropped.
+5. Start tentative tracks from leftover detections >= new_track_thresh; they
+   are reported from their second matched frame on.
+6. Drop lost tracks not matched for more than track_buffer frames, then of
+   every tracked / lost pair overlapping with IoU > 0.85 keep the older one.
+
+Matching leaves a track or detection unmatched at a cost of thresh / 2 each,
+like the lap.lapjv(cost_limit=thresh) call Ultralytics uses, so both trackers
+pick the same pairs (without scipy a greedy matching stands in).
+
+skip_frame() stands in for update() on frames whose detection was skipped
+(motion gate). It leaves every track as it is: none is moved, lost, aged or
+dropped, exactly as with the Ultralytics tracker, which is not called for
+such frames at all.
+
+All track state lives in parallel arrays (one row per track), so prediction,
+IoU and the Kalman update are a few batched NumPy calls per frame. The state
+can be captured and restored with snapshot()/restore(), e.g. to resume a run.
+"""
+from __future__ import annotations
+from typing import Dict, NamedTuple, Tuple
+
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # scipy comes with ultralytics; greedy matching otherwise
+    linear_sum_assignment = None
+
+TRACKED, LOST = 1, 2
+
+_STD_POS = 1.0 / 20
+_STD_VEL = 1.0 / 160
+_F = np.eye(8)
+_F[:4, 4:] = np.eye(4)
+
+class TrackOutput(NamedTuple):
+    track_id: np.ndarray   # (K,) int64
+    xyxy: np.ndarray       # (K,4) float64, Kalman-filtered box
+    score: np.ndarray      # (K,) float64, score of the matched detection
+    cls_id: np.ndarray     # (K,) int64
+    det_index: np.ndarray  # (K,) int64, row of the matched detection in this frame's input
+
+def xyxy_to_xyah(b: np.ndarray) -> np.ndarray:
+    w = b[:, 2] - b[:, 0]
+    h = b[:, 3] - b[:, 1]
+    return np.stack([b[:, 0] + w / 2, b[:, 1] + h / 2, w / np.maximum(h, 1e-6), h], axis=1)
+
+def xyah_to_xyxy(m: np.ndarray) -> np.ndarray:
+    w = m[:, 2] * m[:, 3]
+    return np.stack([m[:, 0] - w / 2, m[:, 1] - m[:, 3] / 2, m[:, 0] + w / 2, m[:, 1] + m[:, 3] / 2], axis=1)
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(N,4) x (M,4) xyxy -> (N,M) IoU."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)))
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+def assign(cost: np.ndarray, thresh: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Min-cost matching keeping pairs with cost <= thresh -> (matches (K,2), unmatched rows, unmatched cols)."""
+    n, m = cost.shape
+    if n == 0 or m == 0:
+        return np.zeros((0, 2), dtype=np.int64), np.arange(n), np.arange(m)
+    if linear_sum_assignment is not None:
+        # leaving a row and a column unmatched costs thresh, so no pair above it is ever worth taking
+        ext = np.full((n + m, n + m), thresh / 2.0)
+        ext[:n, :m] = cost
+        ext[n:, m:] = 0.0
+        rows, cols = linear_sum_assignment(ext)
+        keep = (rows < n) & (cols < m)
+        rows, cols = rows[keep], cols[keep]
+        keep = cost[rows, cols] <= thresh
+        matches = np.stack([rows[keep], cols[keep]], axis=1)
+    else:
+        order = np.argsort(cost, axis=None)
+        used_r, used_c, pairs = np.zeros(n, bool), np.zeros(m, bool), []
+        for flat in order:
+            r, c = divmod(int(flat), m)
+            if cost[r, c] > thresh:
+                break
+            if not used_r[r] and not used_c[c]:
+                used_r[r] = used_c[c] = True
+                pairs.append((r, c))
+        matches = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    un_r = np.setdiff1d(np.arange(n), matches[:, 0])
+    un_c = np.setdiff1d(np.arange(m), matches[:, 1])
+    return matches.astype(np.int64), un_r, un_c
+
+class ByteTracker:
+    _ARRAYS = ("_mean", "_cov", "_id", "_score", "_cls", "_state", "_activated", "_last_frame", "_start_frame")
+
+    def __init__(self, track_high_thresh: float = 0.25, track_low_thresh: float = 0.1,
+                 new_track_thresh: float = 0.25, track_buffer: int = 30, match_thresh: float = 0.8,
+                 fuse_score: bool = True):
+        self.track_high_thresh = track_high_thresh
+        self.track_low_thresh = track_low_thresh
+        self.new_track_thresh = new_track_thresh
+        self.max_time_lost = int(track_buffer)  # in processed frames
+        self.match_thresh = match_thresh
+        self.fuse_score = fuse_score
+        self.reset()
+
+    @classmethod
+    def from_config(cls, tracker_cfg: dict) -> "ByteTracker":
+        return cls(**(tracker_cfg.get("native") or {}))
+
+    # --- state ---
+    def reset(self) -> None:
+        self.frame_id = 0
+        self._next_id = 1
+        self._mean = np.zeros((0, 8))
+        self._cov = np.zeros((0, 8, 8))
+        self._id = np.zeros(0, dtype=np.int64)
+        self._score = np.zeros(0)
+        self._cls = np.zeros(0, dtype=np.int64)
+        self._state = np.zeros(0, dtype=np.int8)
+        self._activated = np.zeros(0, dtype=bool)
+        self._last_frame = np.zeros(0, dtype=np.int64)
+        self._start_frame = np.zeros(0, dtype=np.int64)
+
+    def snapshot(self) -> Dict[str, object]:
+        snap = {name.lstrip("_"): getattr(self, name).copy() for name in self._ARRAYS}
+        snap.update(frame_id=self.frame_id, next_id=self._next_id)
+        return snap
+
+    def restore(self, snap: Dict[str, object]) -> None:
+        self.frame_id = int(snap["frame_id"])
+        self._next_id = int(snap["next_id"])
+        for name in self._ARRAYS:
+            setattr(self, name, np.array(snap[name.lstrip("_")], dtype=getattr(self, name).dtype))
+
+    @property
+    def active_tracks(self) -> int:
+        return len(self._id)
+
+    @property
+    def tentative_tracks(self) -> int:
+        """Tracks started from a single detection, not yet confirmed by a second one."""
+        return int(np.count_nonzero(~self._activated & (self._state == TRACKED)))
+
+    def _keep(self, mask: np.ndarray) -> None:
+        for name in self._ARRAYS:
+            setattr(self, name, getattr(self, name)[mask])
+
+    # --- Kalman filter (batched) ---
+    def _predict(self, rows: np.ndarray) -> None:
+        if not len(rows):
+            return
+        mean = self._mean[rows]
+        mean[self._state[rows] != TRACKED, 7] = 0.0
+        h = mean[:, 3]
+        std = np.stack([_STD_POS * h, _STD_POS * h, np.full_like(h, 1e-2), _STD_POS * h,
+                        _STD_VEL * h, _STD_VEL * h, np.full_like(h, 1e-5), _STD_VEL * h], axis=1)
+        cov = _F @ self._cov[rows] @ _F.T
+        cov[:, np.arange(8), np.arange(8)] += std ** 2
+        self._mean[rows] = mean @ _F.T
+        self._cov[rows] = cov
+
+    def _update(self, rows: np.ndarray, xyah: np.ndarray) -> None:
+        m, P = self._mean[rows], self._cov[rows]
+        h = m[:, 3]
+        r = np.stack([_STD_POS * h, _STD_POS * h, np.full_like(h, 1e-1), _STD_POS * h], axis=1) ** 2
+        S = P[:, :4, :4].copy()
+        S[:, np.arange(4), np.arange(4)] += r
+        PHt = P[:, :, :4]
+        K = np.linalg.solve(S, PHt.transpose(0, 2, 1)).transpose(0, 2, 1)   # (M,8,4)
+        self._mean[rows] = m + np.einsum("mij,mj->mi", K, xyah - m[:, :4])
+        self._cov[rows] = P - K @ S @ K.transpose(0, 2, 1)
+
+    def _initiate(self, xyah: np.ndarray, scores: np.ndarray, cls: np.ndarray) -> None:
+        n = len(xyah)
+        h = xyah[:, 3]
+        mean = np.concatenate([xyah, np.zeros((n, 4))], axis=1)
+        std = np.stack([2 * _STD_POS * h, 2 * _STD_POS * h, np.full_like(h, 1e-2), 2 * _STD_POS * h,
+                        10 * _STD_VEL * h, 10 * _STD_VEL * h, np.full_like(h, 1e-5), 10 * _STD_VEL * h], axis=1)
+        cov = np.zeros((n, 8, 8))
+        cov[:, np.arange(8), np.arange(8)] = std ** 2
+        self._mean = np.concatenate([self._mean, mean])
+        self._cov = np.concatenate([self._cov, cov])
+        self._id = np.concatenate([self._id, np.arange(self._next_id, self._next_id + n, dtype=np.int64)])
+        self._next_id += n
+        self._score = np.concatenate([self._score, scores])
+        self._cls = np.concatenate([self._cls, cls])
+        self._state = np.concatenate([self._state, np.full(n, TRACKED, dtype=np.int8)])
+        # only the very first frame confirms tracks immediately
+        self._activated = np.concatenate([self._activated, np.full(n, self.frame_id == 1)])
+        self._last_frame = np.concatenate([self._last_frame, np.full(n, self.frame_id, dtype=np.int64)])
+        self._start_frame = np.concatenate([self._start_frame, np.full(n, self.frame_id, dtype=np.int64)])
+
+    # --- per frame ---
+    def skip_frame(self) -> TrackOutput:
+        """A frame nobody looked at: tracks keep their state; reports no tracks."""
+        return TrackOutput(np.zeros(0, dtype=np.int64), np.zeros((0, 4)), np.zeros(0),
+                           np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+    def update(self, xyxy, scores, cls) -> TrackOutput:
+        """Advance one frame with this frame's detections; returns the confirmed, matched tracks."""
+        self.frame_id += 1
+        xyxy = np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)
+        scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+        cls = np.asarray(cls, dtype=np.int64).reshape(-1)
+        xyah = xyxy_to_xyah(xyxy)
+
+        valid = (xyxy[:, 2] > xyxy[:, 0]) & (xyxy[:, 3] > xyxy[:, 1])  # zero-size boxes would break the xyah state
+        hi = np.nonzero(valid & (scores >= self.track_high_thresh))[0]
+        lo = np.nonzero(valid & (scores > self.track_low_thresh) & (scores < self.track_high_thresh))[0]
+
+        # tentative tracks are not predicted (as upstream): they are matched where they started
+        confirmed_or_lost = np.nonzero(self._activated | (self._state == LOST))[0]
+        was_tracked = self._state == TRACKED
+        was_lost = ~was_tracked
+        self._predict(confirmed_or_lost)
+        boxes = xyah_to_xyxy(self._mean[:, :4]) if len(self._id) else np.zeros((0, 4))
+        det_of = np.full(len(self._id), -1, dtype=np.int64)
+
+        def match(rows, dets, thresh, fuse):
+            sim = iou_matrix(boxes[rows], xyxy[dets])
+            if fuse:
+                sim = sim * scores[dets][None, :]
+            pairs, un_r, un_c = assign(1.0 - sim, thresh)
+            if len(pairs):
+                t, d = rows[pairs[:, 0]], dets[pairs[:, 1]]
+                self._update(t, xyah[d])
+                self._state[t] = TRACKED
+                self._activated[t] = True
+                self._score[t] = scores[d]
+                self._cls[t] = cls[d]
+                self._last_frame[t] = self.frame_id
+                det_of[t] = d
+            return rows[un_r], dets[un_c]
+
+        left_tracks, left_hi = match(confirmed_or_lost, hi, self.match_thresh, self.fuse_score)
+
+        left_tracked = left_tracks[was_tracked[left_tracks]]
+        left_tracked, _ = match(left_tracked, lo, 0.5, False)
+        self._state[left_tracked] = LOST
+
+        tentative = np.nonzero(~self._activated & (self._state == TRACKED))[0]
+        drop_tentative, left_hi = match(tentative, left_hi, 0.7, self.fuse_score)
+
+        keep = np.ones(len(self._id), dtype=bool)
+        keep[drop_tentative] = False
+        # tracks lost before this frame only: one lost just now is not checked until the next frame
+        keep &= ~(was_lost & (self._state == LOST) & (self.frame_id - self._last_frame > self.max_time_lost))
+        self._keep(keep)
+        det_of = det_of[keep]
+
+        new = left_hi[scores[left_hi] >= self.new_track_thresh]
+        if len(new):
+            self._initiate(xyah[new], scores[new], cls[new])
+            det_of = np.concatenate([det_of, new])
+
+        # after new tracks are started, so they are checked against lost tracks too
+        keep = self._drop_duplicates()
+        if not keep.all():
+            self._keep(keep)
+            det_of = det_of[keep]
+
+        out = np.nonzero((self._state == TRACKED) & self._activated)[0]
+        return TrackOutput(
+            track_id=self._id[out].copy(),
+            xyxy=xyah_to_xyxy(self._mean[out, :4]),
+            score=self._score[out].copy(),
+            cls_id=self._cls[out].copy(),
+            det_index=det_of[out].copy(),
+        )
+
+    def _drop_duplicates(self) -> np.ndarray:
+        """A lost track overlapping a tracked one (IoU > 0.85): keep whichever is older -> keep mask."""
+        keep = np.ones(len(self._id), dtype=bool)
+        tracked = np.nonzero(self._state == TRACKED)[0]
+        lost = np.nonzero(self._state == LOST)[0]
+        if not len(tracked) or not len(lost):
+            return keep
+        boxes = xyah_to_xyxy(self._mean[:, :4])
+        ti, li = np.nonzero(iou_matrix(boxes[tracked], boxes[lost]) > 0.85)
+        if not len(ti):
+            return keep
+        t, l = tracked[ti], lost[li]
+        # age up to each track's last matched frame, as upstream
+        age_t = self._last_frame[t] - self._start_frame[t]
+        age_l = self._last_frame[l] - self._start_frame[l]
+        keep[np.where(age_t > age_l, l, t)] = False
+        return keep
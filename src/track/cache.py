@@ -0,0 +1,215 @@
+"""
+On-disk cache of per-frame tracker output, so counting can be re-run without YOLO.
+
+A cache is a directory of flat .npy columns (one row per tracked box) plus a
+frame index, loaded memory-mapped:
+
+    <cache_dir>/<key>/
+        meta.json        key inputs, video meta, class names
+        frame_t.npy      (F,)   float64  t_sec of every processed frame
+        frame_index.npy  (F,)   int64    source frame index
+        frame_ptr.npy    (F+1,) int64    rows of frame i are [ptr[i], ptr[i+1])
+        track_id.npy     (N,)   int64
+        xyxy.npy         (N,4)  float64  box in decoded-frame pixels (meta["scale"]);
+                                          full precision so a replay counts exactly like the live run
+        conf.npy         (N,)   float32
+        cls_id.npy       (N,)   int16
+
+The key covers everything that changes tracker output: the video content, the
+model weights and inference backend/precision, imgsz/conf/iou, fps_infer, decode-time resize and the tracker
+config. Class filtering and all counting settings are applied on replay, so
+they are not part of the key. The roi / motion_gate / adaptive_stride settings
+are, so a cropped or gated run never replaces a full-frame recording; the ROI
+box itself follows the counting line, which is what a recount changes, so it is
+only kept in meta.json["recorded_with"] (src/recount.py refuses lines outside it).
+"""
+from __future__ import annotations
+import json
+import os
+import shutil
+import struct
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.utils.hashing import file_sha256, obj_sha256
+from .batch import TrackBatch
+
+CACHE_VERSION = 1
+_COLUMNS = ("frame_t", "frame_index", "frame_ptr", "track_id", "xyxy", "conf", "cls_id")
+
+def _file_or_name(ref: str) -> str:
+    # local weights / tracker yaml are hashed by content; built-in names by name
+    return file_sha256(ref) if os.path.isfile(ref) else str(ref)
+
+def _enabled(cfg: dict, section: str) -> Optional[dict]:
+    section_cfg = cfg.get(section) or {}
+    return section_cfg if section_cfg.get("enabled", False) else None
+
+def cache_key_inputs(video_path: str, cfg: dict, video_hash: Optional[str] = None) -> Dict:
+    det_cfg = cfg["detector"]
+    ingest_cfg = cfg.get("ingest", {})
+    return {
+        "version": CACHE_VERSION,
+        "video_sha256": video_hash or file_sha256(video_path),
+        "model": _file_or_name(det_cfg["model"]),
+        "backend": det_cfg.get("backend", "torch"),
+        "precision": det_cfg.get("precision", "fp32"),
+        "imgsz": int(det_cfg["imgsz"]),
+        "conf": float(det_cfg["conf"]),
+        "iou": float(det_cfg["iou"]),
+        "fps_infer": float(cfg["fps_infer"]),
+        "resize_to": int(det_cfg["imgsz"]) if ingest_cfg.get("resize_to_imgsz", False) else None,
+        "tracker": dict(cfg["tracker"], cfg=_file_or_name(cfg["tracker"]["cfg"])),
+        "inference_filters": {s: _enabled(cfg, s) for s in ("roi", "motion_gate", "adaptive_stride")},
+    }
+
+def cache_key(video_path: str, cfg: dict, video_hash: Optional[str] = None) -> Tuple[str, Dict]:
+    inputs = cache_key_inputs(video_path, cfg, video_hash)
+    return obj_sha256(inputs)[:32], inputs
+
+def cache_path(cache_dir: str, key: str) -> str:
+    return os.path.join(cache_dir, key)
+
+def has_cache(cache_dir: str, key: str) -> bool:
+    return os.path.isfile(os.path.join(cache_path(cache_dir, key), "meta.json"))
+
+_HEADER_LEN = 128  # fixed .npy header size, so the final shape can be written over it on close
+
+def _npy_header(dtype, shape: Tuple[int, ...]) -> bytes:
+    """Version 1.0 .npy header padded to _HEADER_LEN bytes."""
+    d = repr({"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)), "fortran_order": False, "shape": shape})
+    body = _HEADER_LEN - 10
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", body) + (d.ljust(body - 1) + "\n").encode("latin1")
+
+class _ColumnFile:
+    """A .npy file appended to in chunks; close() writes the final row count into its header."""
+
+    def __init__(self, path: str, dtype, row_shape: Tuple[int, ...] = ()):
+        self.dtype = np.dtype(dtype)
+        self.row_shape = row_shape
+        self.rows = 0
+        self._f = open(path, "wb")
+        self._f.write(_npy_header(self.dtype, (0, *row_shape)))
+
+    def append(self, arr: np.ndarray) -> None:
+        arr = np.ascontiguousarray(arr, dtype=self.dtype).reshape(-1, *self.row_shape)
+        self._f.write(arr.tobytes())
+        self.rows += len(arr)
+
+    def close(self) -> None:
+        self._f.seek(0)
+        self._f.write(_npy_header(self.dtype, (self.rows, *self.row_shape)))
+        self._f.close()
+
+class TrackCacheWriter:
+    """
+    Streams tracker output to the cache's column files while the run goes:
+    every `chunk_frames` frames are appended to <key>.tmp/, so memory stays flat
+    however long the video. close() finishes the headers, writes meta.json and
+    moves the directory under its key; a run that dies leaves <key>.tmp, which
+    the next writer for the key removes.
+    """
+
+    def __init__(self, cache_dir: str, key: str, key_inputs: Dict, recorded_with: Optional[Dict] = None,
+                 chunk_frames: int = 512):
+        self.path = cache_path(cache_dir, key)
+        self.key = key
+        self.key_inputs = key_inputs
+        self.recorded_with = recorded_with or {}
+        self.chunk_frames = max(1, int(chunk_frames))
+        self.names: Dict[int, str] = {}
+        self.frames = 0
+        self._tmp = self.path + ".tmp"
+        shutil.rmtree(self._tmp, ignore_errors=True)
+        os.makedirs(self._tmp)
+        self._files = {name: _ColumnFile(os.path.join(self._tmp, f"{name}.npy"), dtype, row_shape)
+                       for name, dtype, row_shape in (("frame_t", np.float64, ()), ("frame_index", np.int64, ()),
+                                                      ("frame_ptr", np.int64, ()), ("track_id", np.int64, ()),
+                                                      ("xyxy", np.float64, (4,)), ("conf", np.float32, ()),
+                                                      ("cls_id", np.int16, ()))}
+        self._files["frame_ptr"].append(np.zeros(1))
+        self._rows = 0
+        self._frame_t: List[float] = []
+        self._frame_index: List[int] = []
+        self._frame_ptr: List[int] = []
+        self._batches: List[TrackBatch] = []
+
+    def add(self, t_sec: float, frame_index: int, tracked: TrackBatch) -> None:
+        self._rows += len(tracked)
+        self._frame_t.append(float(t_sec))
+        self._frame_index.append(int(frame_index))
+        self._frame_ptr.append(self._rows)
+        if len(tracked):
+            self._batches.append(tracked)
+        if len(self._frame_t) >= self.chunk_frames:
+            self._flush()
+
+    def _flush(self) -> None:
+        files = self._files
+        files["frame_t"].append(np.asarray(self._frame_t))
+        files["frame_index"].append(np.asarray(self._frame_index))
+        files["frame_ptr"].append(np.asarray(self._frame_ptr))
+        if self._batches:
+            for name in ("track_id", "xyxy", "conf", "cls_id"):
+                files[name].append(np.concatenate([getattr(b, name) for b in self._batches]))
+            for k in np.unique(np.concatenate([b.cls_id for b in self._batches])).tolist():
+                self.names.setdefault(k, self._batches[0].name(k))
+        self.frames += len(self._frame_t)
+        self._frame_t, self._frame_index, self._frame_ptr, self._batches = [], [], [], []
+
+    def close(self, meta: Dict) -> str:
+        """Write the cache; a partially written cache is never visible under its key."""
+        self._flush()
+        for f in self._files.values():
+            f.close()
+        doc = {
+            "key": self.key,
+            "key_inputs": self.key_inputs,
+            "meta": meta,
+            "recorded_with": self.recorded_with,
+            "names": {str(k): v for k, v in sorted(self.names.items())},
+            "frames": self.frames,
+            "rows": self._rows,
+        }
+        with open(os.path.join(self._tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2, default=str)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self._tmp, self.path)
+        return self.path
+
+class TrackCache:
+    """Read side: memory-mapped columns, replayed frame by frame."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            doc = json.load(f)
+        self.key = doc["key"]
+        self.key_inputs = doc["key_inputs"]
+        self.meta = doc["meta"]
+        self.recorded_with = doc.get("recorded_with", {})
+        self.names = {int(k): v for k, v in doc["names"].items()}
+        for name in _COLUMNS:
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+
+    @classmethod
+    def open(cls, cache_dir: str, key: str) -> "TrackCache":
+        return cls(cache_path(cache_dir, key))
+
+    @property
+    def n_frames(self) -> int:
+        return len(self.frame_t)
+
+    def iter_frames(self) -> Iterator[Tuple[float, int, TrackBatch]]:
+        """Yields (t_sec, frame_index, TrackBatch) in the original processing order."""
+        ptr = np.asarray(self.frame_ptr).tolist()
+        # pull whole columns once; each frame is then a view into them
+        tids = np.asarray(self.track_id)
+        boxes = np.asarray(self.xyxy)
+        confs = np.asarray(self.conf)
+        clss = np.asarray(self.cls_id)
+        names = self.names
+        for i, (t, fidx) in enumerate(zip(np.asarray(self.frame_t).tolist(), np.asarray(self.frame_index).tolist())):
+            a, b = ptr[i], ptr[i + 1]
+            yield t, fidx, TrackBatch(tids[a:b], boxes[a:b], confs[a:b], clss[a:b], names)
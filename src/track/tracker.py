@@ -1,27 +1,36 @@
 """Multi-object tracking module using Ultralytics ByteTrack."""
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import List, Tuple
+import time
+from typing import List, Optional, Sequence
 
-@dataclass
-class TrackedObject:
-    track_id: int
-    xyxy: Tuple[float, float, float, float]
-    conf: float
-    cls_id: int
-    cls_name: str
+from .batch import TrackBatch, TrackedObject  # noqa: F401  (TrackedObject re-exported)
 
 class UltralyticsByteTracker:
-    def __init__(self, model_name: str, conf: float, iou: float, imgsz: int, tracker_cfg: str):
-        from ultralytics import YOLO
-        self.model = YOLO(model_name)
+    def __init__(self, model_name: str, conf: float, iou: float, imgsz: int, tracker_cfg: str,
+                 backend: str = "torch", precision: str = "fp32", **export_opts):
+        from src.detect.backends import load_yolo
+        self.model = load_yolo(model_name, imgsz, backend, precision, **export_opts)
         self.conf = conf
         self.iou = iou
-        self.imgsz = imgsz
+        self.imgsz = self.base_imgsz = imgsz
         self.tracker_cfg = tracker_cfg
         self.names = self.model.names
 
-    def track_frame(self, frame_bgr) -> List[TrackedObject]:
+    def reset(self) -> None:
+        """Forget all tracks (ids restart at 1) so the loaded model can start on another video."""
+        # Ultralytics 8.2/8.3 bind `persist` on the first track() call only, so a later
+        # persist=False keeps the old tracks; reset the predictor's trackers directly.
+        for t in getattr(getattr(self.model, "predictor", None), "trackers", None) or []:
+            t.reset()
+        self.imgsz = self.base_imgsz
+
+    @property
+    def pending_tracks(self) -> int:
+        """Unconfirmed tracks after the last frame (not in its output yet)."""
+        trackers = getattr(getattr(self.model, "predictor", None), "trackers", None) or []
+        return sum(not t.is_activated for tr in trackers for t in getattr(tr, "tracked_stracks", []))
+
+    def track_frame(self, frame_bgr) -> TrackBatch:
         res = self.model.track(
             frame_bgr,
             conf=self.conf,
@@ -31,27 +40,94 @@ class UltralyticsByteTracker:
             persist=True,
             verbose=False
         )[0]
+        return self._to_tracked(res)
 
-        out: List[TrackedObject] = []
-        if res.boxes is None:
-            return out
+    def track_frames(self, frames_bgr: Sequence) -> List[TrackBatch]:
+        """Detect on a batch of frames in one call; ByteTrack is still updated in frame order."""
+        frames_bgr = list(frames_bgr)
+        if not frames_bgr:
+            return []
+        if len(frames_bgr) == 1:
+            return [self.track_frame(frames_bgr[0])]
+        # A list source is a non-stream dataset for Ultralytics, so every result in the
+        # batch goes through the same persisted tracker, in list order.
+        results = self.model.track(
+            frames_bgr,
+            conf=self.conf,
+            iou=self.iou,
+            imgsz=self.imgsz,
+            tracker=self.tracker_cfg,
+            persist=True,
+            verbose=False
+        )
+        return [self._to_tracked(res) for res in results]
 
+    def _to_tracked(self, res) -> TrackBatch:
         b = res.boxes
-        ids = b.id
-        if ids is None:
-            return out
-
-        xyxy = b.xyxy.cpu().numpy()
-        confs = b.conf.cpu().numpy()
-        clss = b.cls.cpu().numpy().astype(int)
-        ids_np = ids.cpu().numpy().astype(int)
-
-        for (x1, y1, x2, y2), c, k, tid in zip(xyxy, confs, clss, ids_np):
-            out.append(TrackedObject(
-                track_id=int(tid),
-                xyxy=(float(x1), float(y1), float(x2), float(y2)),
-                conf=float(c),
-                cls_id=int(k),
-                cls_name=str(self.names[int(k)])
-            ))
-        return out
+        if b is None or b.id is None:
+            return TrackBatch.empty(self.names)
+        return TrackBatch(b.id.cpu().numpy(), b.xyxy.cpu().numpy(), b.conf.cpu().numpy(),
+                          b.cls.cpu().numpy(), self.names)
+
+class NativeByteTracker:
+    """
+    YoloDetector + the vectorized ByteTracker from src/track/bytetrack.py
+    (tracker.type: native). Detection and tracking are separate calls, so the
+    pipeline runs them as separate stages and times tracking on its own.
+    """
+    separate_stages = True
+
+    def __init__(self, detector, tracker):
+        self.detector = detector
+        self.tracker = tracker
+        self.names = detector.names
+        self.model = detector.model
+        self.conf, self.iou, self.imgsz = detector.conf, detector.iou, detector.imgsz
+        self.base_imgsz = detector.imgsz
+        self.detect_sec = 0.0
+        self.track_sec = 0.0
+        self.frames = 0
+
+    def reset(self) -> None:
+        """Forget all tracks and timings so the loaded model can start on another video."""
+        self.tracker.reset()
+        self.imgsz = self.detector.imgsz = self.base_imgsz
+        self.detect_sec = self.track_sec = 0.0
+        self.frames = 0
+
+    @property
+    def pending_tracks(self) -> int:
+        """Unconfirmed tracks after the last frame (not in its output yet)."""
+        return self.tracker.tentative_tracks
+
+    def detect(self, frames_bgr: Sequence) -> List[tuple]:
+        t0 = time.perf_counter()
+        dets = self.detector.detect_arrays(frames_bgr)
+        self.detect_sec += time.perf_counter() - t0
+        return dets
+
+    def update(self, dets: Optional[tuple]) -> TrackBatch:
+        """One tracking step on (xyxy, conf, cls_id) arrays of the next frame (None = no detections)."""
+        t0 = time.perf_counter()
+        # frame skipped by the motion gate: tracks are left as they are
+        out = self.tracker.skip_frame() if dets is None else self.tracker.update(*dets)
+        self.track_sec += time.perf_counter() - t0
+        self.frames += 1
+        return TrackBatch(out.track_id, out.xyxy, out.score, out.cls_id, self.names)
+
+    def track_frame(self, frame_bgr) -> TrackBatch:
+        return self.update(self.detect([frame_bgr])[0])
+
+    def snapshot(self) -> dict:
+        return self.tracker.snapshot()
+
+    def restore(self, snap: dict) -> None:
+        self.tracker.restore(snap)
+
+    def track_frames(self, frames_bgr: Sequence) -> List[TrackBatch]:
+        return [self.update(d) for d in self.detect(frames_bgr)]
+
+    def timings(self) -> dict:
+        n = max(self.frames, 1)
+        return {"detect_ms_per_frame": round(1000.0 * self.detect_sec / n, 3),
+                "track_ms_per_frame": round(1000.0 * self.track_sec / n, 3)}
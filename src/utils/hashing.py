@@ -0,0 +1,19 @@
+"""Content hashes used for job manifests and caches."""
+from __future__ import annotations
+import hashlib
+import json
+from typing import Any
+
+_CHUNK = 8 * 1024 * 1024
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def obj_sha256(obj: Any) -> str:
+    """Stable hash of a JSON-serialisable object (key order does not matter)."""
+    blob = json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
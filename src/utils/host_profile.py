@@ -0,0 +1,101 @@
+"""
+Per-host CPU settings found by `python -m src.tools.autotune`.
+
+A profile is <host_profile.dir>/<hostname>.json:
+
+    {"host": "node07", "cpu": {"logical": 32, "usable": 32, "model": "..."},
+     "detector": {"model": "yolov8n.pt", "imgsz": 960, "backend": "torch", "precision": "fp32"},
+     "settings": {"workers": 4, "torch_threads": 8, "cv2_threads": 2, "batch_size": 8, "affinity": true},
+     "frames_per_sec": 61.2, "trials": [...]}
+
+process_video applies torch_threads / cv2_threads / batch_size, and
+src.parallel.batch also takes workers and affinity from it. The profile is
+ignored (with a warning) when the CPUs or the detector settings it was tuned
+with differ from the current ones. An explicit --batch_size / --workers, or
+OMP_NUM_THREADS in the environment, takes precedence.
+"""
+from __future__ import annotations
+import os
+import platform
+import socket
+from typing import List, Optional, Sequence
+
+from src.utils.config import load_yaml
+from src.utils.threads import THREAD_ENV_VARS, limit_threads
+
+DETECTOR_KEYS = ("model", "imgsz", "backend", "precision")
+
+def usable_cpus() -> List[int]:
+    """CPUs this process may run on (affinity mask where supported)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def cpu_info() -> dict:
+    model = platform.processor()
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            model = next((line.split(":", 1)[1].strip() for line in f if line.startswith("model name")), model)
+    except OSError:
+        pass
+    return {"logical": os.cpu_count() or 1, "usable": len(usable_cpus()), "model": model}
+
+def detector_key(cfg: dict) -> dict:
+    det_cfg = cfg["detector"]
+    defaults = {"backend": "torch", "precision": "fp32"}
+    return {k: det_cfg.get(k, defaults.get(k)) for k in DETECTOR_KEYS}
+
+def profile_path(cfg: dict) -> str:
+    return os.path.join(cfg.get("host_profile", {}).get("dir", "host_profiles"), f"{socket.gethostname()}.json")
+
+def load_host_profile(cfg: dict) -> Optional[dict]:
+    """This host's profile for cfg's detector (with its "path"), or None (disabled, missing or stale)."""
+    if not cfg.get("host_profile", {}).get("enabled", True):
+        return None
+    path = profile_path(cfg)
+    if not os.path.exists(path):
+        return None
+    profile = load_yaml(path) or {}
+    cpu = cpu_info()
+    # not the usable count: batch workers pinned to a slice of the CPUs load the profile too
+    if {k: profile.get("cpu", {}).get(k) for k in ("logical", "model")} != {k: cpu[k] for k in ("logical", "model")}:
+        print(f"⚠️  Host profile {path} was tuned on different CPUs; ignoring it (rerun src.tools.autotune)")
+        return None
+    if profile.get("detector") != detector_key(cfg):
+        print(f"⚠️  Host profile {path} was tuned for {profile.get('detector')}; ignoring it (rerun src.tools.autotune)")
+        return None
+    profile["path"] = os.path.abspath(path)
+    return profile
+
+def apply_threads(torch_threads: int, cv2_threads: int) -> None:
+    """Intra-op threads of this process: BLAS/OpenMP env, OpenCV and (if installed) torch."""
+    limit_threads(torch_threads)
+    import cv2
+    cv2.setNumThreads(max(1, int(cv2_threads)))
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(max(1, int(torch_threads)))
+
+def apply_profile_threads(profile: Optional[dict]) -> bool:
+    """Apply a profile's thread counts unless the environment already sets them."""
+    if profile is None or any(var in os.environ for var in THREAD_ENV_VARS):
+        return False
+    s = profile["settings"]
+    apply_threads(s["torch_threads"], s["cv2_threads"])
+    return True
+
+def pin_cpus(cpus: Sequence[int]) -> bool:
+    """Restrict this process to `cpus`; False where affinity is not supported."""
+    if not hasattr(os, "sched_setaffinity") or not cpus:
+        return False
+    os.sched_setaffinity(0, set(cpus))
+    return True
+
+def worker_cpus(index: int, workers: int, cpus: Optional[List[int]] = None) -> List[int]:
+    """Disjoint CPU slice for worker `index` of `workers`."""
+    cpus = cpus if cpus is not None else usable_cpus()
+    per = max(1, len(cpus) // max(1, workers))
+    start = (index % workers) * per
+    return cpus[start:start + per] or cpus
@@ -0,0 +1,145 @@
+"""Threaded stage pipeline with bounded queues between stages."""
+from __future__ import annotations
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+Stage = Tuple[str, Callable[[Any], Any]]
+
+_END = object()
+_POLL_SEC = 0.1
+
+def batched(items: Iterable, n: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == n:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class StagePipeline:
+    """
+    Runs `source` and each stage on its own worker thread.
+
+    Items flow source -> stage[0] -> stage[1] -> ... through queues of at most
+    `queue_size` items, so a slow stage blocks the ones upstream (backpressure)
+    instead of letting frames pile up in memory. A stage returning None drops
+    the item. Order is preserved because every stage has exactly one worker.
+
+    The first exception raised by any worker stops all of them and is re-raised
+    from run(); Ctrl-C in the calling thread does the same. With threaded=False
+    the stages run inline on the calling thread (same semantics, no overlap).
+    A `profiler` (src.utils.profiling.RunProfiler) gets the depth of each
+    stage's input queue whenever the stage takes an item.
+    """
+
+    def __init__(self, source: Iterable, stages: Sequence[Stage], queue_size: int = 4,
+                 threaded: bool = True, profiler=None):
+        self.source = source
+        self.stages = list(stages)
+        self.queue_size = max(1, int(queue_size))
+        self.threaded = threaded
+        self.profiler = profiler
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._error_stage: Optional[str] = None
+        self._queues: List[queue.Queue] = []
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Current number of items waiting in front of each stage."""
+        return {name: q.qsize() for (name, _), q in zip(self.stages, self._queues)}
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run(self) -> None:
+        if not self.threaded:
+            self._run_inline()
+            return
+
+        self._queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        workers = [threading.Thread(target=self._source_worker, name="decode", daemon=True)]
+        for i, (name, fn) in enumerate(self.stages):
+            out_q = self._queues[i + 1] if i + 1 < len(self._queues) else None
+            workers.append(threading.Thread(target=self._stage_worker, name=name, daemon=True,
+                                            args=(name, fn, self._queues[i], out_q)))
+        for w in workers:
+            w.start()
+
+        try:
+            # join with a timeout so KeyboardInterrupt reaches this thread
+            for w in workers:
+                while w.is_alive():
+                    w.join(_POLL_SEC)
+        except KeyboardInterrupt:
+            self._stop.set()
+            for w in workers:
+                w.join()
+            raise
+
+        if self._error is not None:
+            raise RuntimeError(f"Pipeline stage '{self._error_stage}' failed: {self._error}") from self._error
+
+    def _run_inline(self) -> None:
+        for item in self.source:
+            for _, fn in self.stages:
+                item = fn(item)
+                if item is None:
+                    break
+
+    def _fail(self, stage: str, exc: BaseException) -> None:
+        if self._error is None:
+            self._error = exc
+            self._error_stage = stage
+        self._stop.set()
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=_POLL_SEC)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=_POLL_SEC)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _source_worker(self) -> None:
+        it = iter(self.source)
+        try:
+            for item in it:
+                if not self._put(self._queues[0], item):
+                    break
+            else:
+                self._put(self._queues[0], _END)
+        except BaseException as e:
+            self._fail("decode", e)
+        finally:
+            close = getattr(it, "close", None)
+            if close is not None:
+                close()
+
+    def _stage_worker(self, name: str, fn, in_q: queue.Queue, out_q: Optional[queue.Queue]) -> None:
+        try:
+            while True:
+                item = self._get(in_q)
+                if item is _END:
+                    if out_q is not None:
+                        self._put(out_q, _END)
+                    return
+                if self.profiler is not None:
+                    self.profiler.sample_queue(name, in_q.qsize())
+                result = fn(item)
+                if result is not None and out_q is not None:
+                    if not self._put(out_q, result):
+                        return
+        except BaseException as e:
+            self._fail(name, e)
@@ -0,0 +1,190 @@
+"""
+Run instrumentation: per-stage busy time, per-frame latency, peak RSS and
+queue depths, reported in run_summary.json -> "profile" and optionally as a
+Prometheus text-format file (node_exporter textfile collector).
+
+Stage times are busy time summed per stage. The pipeline stages run on their
+own threads, so the shares can add up to more than the wall-clock time.
+The stage with the largest share is the one to optimise.
+"""
+from __future__ import annotations
+import contextlib
+import os
+import sys
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, Iterator, Optional
+
+import numpy as np
+
+# report order; stages that never ran are left out
+STAGES = ("decode", "gate", "inference", "tracking", "counting", "aggregation", "track_cache",
+          "annotation", "encoding", "export")
+QUANTILES = (0.5, 0.95, 0.99)
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process (None where it cannot be read)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return round(psutil.Process().memory_info().peak_wset / 2 ** 20, 1)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(rss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+class RunProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sec: Dict[str, float] = {}
+        self._calls: Dict[str, int] = {}
+        self._queue_sum: Dict[str, int] = {}
+        self._queue_max: Dict[str, int] = {}
+        self._queue_n: Dict[str, int] = {}
+        self._t_in: Dict[int, float] = {}
+        self._latency = array("d")
+
+    def add(self, stage: str, seconds: float, calls: int = 1) -> None:
+        with self._lock:
+            self._sec[stage] = self._sec.get(stage, 0.0) + seconds
+            self._calls[stage] = self._calls.get(stage, 0) + calls
+
+    @contextlib.contextmanager
+    def section(self, stage: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - t0)
+
+    def timed_iter(self, items: Iterable, stage: str = "decode") -> Iterator:
+        """Iterate `items`, charging the time spent producing each one to `stage`."""
+        it = iter(items)
+        try:
+            while True:
+                t0 = time.perf_counter()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+                self.add(stage, time.perf_counter() - t0)
+                yield item
+        finally:
+            close = getattr(it, "close", None)
+            if close is not None:
+                close()
+
+    def frame_in(self, key: int) -> None:
+        self._t_in[key] = time.perf_counter()
+
+    def frame_out(self, key: int) -> None:
+        t0 = self._t_in.pop(key, None)
+        if t0 is not None:
+            self._latency.append(time.perf_counter() - t0)
+
+    def sample_queue(self, stage: str, depth: int) -> None:
+        self._queue_sum[stage] = self._queue_sum.get(stage, 0) + depth
+        self._queue_n[stage] = self._queue_n.get(stage, 0) + 1
+        self._queue_max[stage] = max(self._queue_max.get(stage, 0), depth)
+
+    def summary(self, frames: int, elapsed_sec: float) -> dict:
+        stages = {}
+        for name in sorted(self._sec, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES)):
+            sec = self._sec[name]
+            stages[name] = {
+                "total_sec": round(sec, 4),
+                "ms_per_frame": round(1000.0 * sec / frames, 3) if frames else None,
+                "share_of_wall": round(sec / elapsed_sec, 4) if elapsed_sec > 0 else None,
+                "calls": self._calls[name],
+            }
+        latency = None
+        if len(self._latency):
+            lat = np.frombuffer(self._latency, dtype=np.float64) * 1000.0
+            latency = {f"p{int(q * 100)}": round(float(v), 3) for q, v in zip(QUANTILES, np.quantile(lat, QUANTILES))}
+            latency.update(mean=round(float(lat.mean()), 3), max=round(float(lat.max()), 3), count=int(lat.size))
+        return {
+            "stages": stages,
+            "frame_latency_ms": latency,
+            "peak_rss_mb": peak_rss_mb(),
+            "queue_depth": {name: {"mean": round(self._queue_sum[name] / self._queue_n[name], 3),
+                                   "max": self._queue_max[name]} for name in self._queue_n},
+        }
+
+def write_prometheus(profile: dict, path: str, labels: Optional[Dict[str, str]] = None,
+                     frames: Optional[int] = None, elapsed_sec: Optional[float] = None) -> str:
+    """Profile summary as Prometheus text exposition format (written atomically)."""
+    base = ",".join(f'{k}="{_escape(v)}"' for k, v in sorted((labels or {}).items()))
+
+    def lbl(**extra) -> str:
+        parts = [base] if base else []
+        parts += [f'{k}="{_escape(v)}"' for k, v in extra.items()]
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    lines = ["# HELP traffic_stage_seconds_total Busy time per pipeline stage.",
+             "# TYPE traffic_stage_seconds_total counter"]
+    lines += [f"traffic_stage_seconds_total{lbl(stage=name)} {s['total_sec']}"
+              for name, s in profile["stages"].items()]
+    lat = profile.get("frame_latency_ms")
+    if lat:
+        lines += ["# HELP traffic_frame_latency_seconds Decode-to-counted latency per frame.",
+                  "# TYPE traffic_frame_latency_seconds summary"]
+        lines += [f"traffic_frame_latency_seconds{lbl(quantile=str(q))} {round(lat[f'p{int(q * 100)}'] / 1000.0, 6)}"
+                  for q in QUANTILES]
+        lines += [f"traffic_frame_latency_seconds_sum{lbl()} {round(lat['mean'] * lat['count'] / 1000.0, 6)}",
+                  f"traffic_frame_latency_seconds_count{lbl()} {lat['count']}"]
+    if profile.get("peak_rss_mb") is not None:
+        lines += ["# HELP traffic_peak_rss_bytes Peak resident set size of the run.",
+                  "# TYPE traffic_peak_rss_bytes gauge",
+                  f"traffic_peak_rss_bytes{lbl()} {int(profile['peak_rss_mb'] * 2 ** 20)}"]
+    if profile.get("queue_depth"):
+        lines += ["# HELP traffic_queue_depth_max Largest number of batches waiting in front of a stage.",
+                  "# TYPE traffic_queue_depth_max gauge"]
+        lines += [f"traffic_queue_depth_max{lbl(stage=name)} {q['max']}" for name, q in profile["queue_depth"].items()]
+    if frames is not None:
+        lines += ["# TYPE traffic_frames_processed_total counter", f"traffic_frames_processed_total{lbl()} {frames}"]
+    if elapsed_sec is not None:
+        lines += ["# TYPE traffic_run_seconds gauge", f"traffic_run_seconds{lbl()} {round(elapsed_sec, 3)}"]
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, path)
+    return path
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+@contextlib.contextmanager
+def code_profiler(path: Optional[str], tool: str = "cprofile"):
+    """cProfile (.prof, open with snakeviz / pstats) or pyinstrument (.html) dump of the block."""
+    if not path:
+        yield
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if tool == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise SystemExit("❌ --profiler pyinstrument needs: pip install pyinstrument")
+        prof = Profiler()
+        prof.start()
+        try:
+            yield
+        finally:
+            prof.stop()
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(prof.output_html() if path.endswith(".html") else prof.output_text())
+    else:
+        import cProfile
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            prof.dump_stats(path)
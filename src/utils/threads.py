@@ -0,0 +1,13 @@
+"""Per-process CPU thread limits."""
+from __future__ import annotations
+import os
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+def limit_threads(threads: int) -> None:
+    """Cap BLAS/OpenMP/OpenCV pools; call before torch is imported in this process."""
+    threads = max(1, int(threads))
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+    import cv2
+    cv2.setNumThreads(threads)
@@ -0,0 +1,121 @@
+import cv2
+import numpy as np
+import pytest
+
+import src.process_video
+from src.track.bytetrack import ByteTracker
+from src.track.tracker import NativeByteTracker
+from src.utils.config import load_yaml
+
+def write_traffic_video(path, seconds=60, fps=10, n_vehicles=48, seed=0):
+    """White boxes (wide: cars, narrow: motorcycles) driving across a 320x180 frame, each in view < 8 s."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * fps)
+    start = rng.integers(0, n - 20, n_vehicles)
+    lane = rng.integers(0, 5, n_vehicles)
+    width = rng.choice([12, 28], n_vehicles)
+    speed = rng.uniform(5, 9, n_vehicles) * rng.choice([-1, 1], n_vehicles)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (320, 180))
+    for f in range(n):
+        frame = np.zeros((180, 320, 3), np.uint8)
+        for k in np.flatnonzero(start <= f):
+            x = (f - start[k]) * speed[k] + (0 if speed[k] > 0 else 320 - width[k])
+            if 0 <= x <= 320 - width[k]:
+                y = 10 + 34 * lane[k]
+                cv2.rectangle(frame, (int(x), y), (int(x) + int(width[k]), y + 14), (255, 255, 255), -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+class StubDetector:
+    """Stands in for YoloDetector: the white boxes of write_traffic_video, by connected components."""
+    names = {0: "motorcycle", 1: "car"}
+    model = None
+
+    def __init__(self):
+        self.conf, self.iou, self.imgsz = 0.25, 0.5, 320
+
+    def detect_arrays(self, frames_bgr):
+        out = []
+        for frame in frames_bgr:
+            mask = (cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) > 127).astype(np.uint8)
+            _, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+            stats = stats[1:][stats[1:, cv2.CC_STAT_AREA] >= 40]
+            xyxy = np.concatenate([stats[:, :2], stats[:, :2] + stats[:, 2:4]], axis=1).astype(np.float32)
+            out.append((xyxy, np.full(len(xyxy), 0.9, np.float32), (stats[:, 2] > 20).astype(np.int64)))
+        return out
+
+@pytest.fixture
+def make_traffic_video(tmp_path):
+    """write_traffic_video into tmp_path under a given file name (which sets the recording start)."""
+    return lambda name, **kwargs: write_traffic_video(str(tmp_path / name), **kwargs)
+
+@pytest.fixture
+def traffic_video(make_traffic_video):
+    return make_traffic_video("site01_20260118_1800.avi")
+
+@pytest.fixture
+def site_cfg():
+    return {"site_id": "site01", "line": {"p1": [160, 0], "p2": [160, 180]}, "direction": "any"}
+
+@pytest.fixture
+def pipeline_cfg():
+    """configs/pipeline.yaml with the native tracker and nothing written beyond the counts."""
+    cfg = load_yaml("configs/pipeline.yaml")
+    cfg["tracker"]["type"] = "native"
+    cfg["engine"]["threaded"] = False
+    cfg["cache"]["enabled"] = False
+    cfg["output"]["write_annotated_video"] = False
+    cfg["host_profile"]["enabled"] = False
+    return cfg
+
+@pytest.fixture
+def stub_tracker(monkeypatch):
+    """build_tracker() -> NativeByteTracker over a StubDetector; returns the trackers built."""
+    built = []
+
+    def build(cfg):
+        built.append(NativeByteTracker(StubDetector(), ByteTracker.from_config(cfg["tracker"])))
+        return built[-1]
+    monkeypatch.setattr(src.process_video, "build_tracker", build)
+    return built
+
+class _Column:
+    def __init__(self, a):
+        self.a = np.asarray(a)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.a
+
+class _Boxes:
+    def __init__(self, out):
+        self.id = _Column(out.track_id) if len(out.track_id) else None
+        self.xyxy, self.conf, self.cls = _Column(out.xyxy), _Column(out.score), _Column(out.cls_id)
+
+class _Result:
+    def __init__(self, out):
+        self.boxes = _Boxes(out)
+
+class StubUltralyticsModel:
+    """model.track() over StubDetector boxes with one persisted tracker, as Ultralytics runs a list source."""
+    names = StubDetector.names
+
+    def __init__(self, tracker_cfg):
+        self.predictor = type("Predictor", (), {})()
+        self.predictor.trackers = [ByteTracker.from_config(tracker_cfg)]
+        self.detector = StubDetector()
+
+    def track(self, source, persist=False, **kwargs):
+        frames = source if isinstance(source, list) else [source]
+        tracker = self.predictor.trackers[0]
+        return [_Result(tracker.update(*dets)) for dets in self.detector.detect_arrays(frames)]
+
+@pytest.fixture
+def stub_ultralytics(monkeypatch, pipeline_cfg):
+    """load_yolo() -> StubUltralyticsModel, for tracker.type bytetrack."""
+    import src.detect.backends
+    monkeypatch.setattr(src.detect.backends, "load_yolo",
+                        lambda *args, **kwargs: StubUltralyticsModel(pipeline_cfg["tracker"]))
@@ -0,0 +1,44 @@
+import os
+
+import yaml
+
+import src.process_video
+from src.process_video import build_arg_parser
+
+class _Progress:
+    def update(self, n):
+        pass
+
+def process(tmp_path, video, cfg, site_cfg, out):
+    config, sites = str(tmp_path / "pipeline.yaml"), str(tmp_path / "sites.yaml")
+    with open(config, "w") as f:
+        yaml.safe_dump(cfg, f)
+    with open(sites, "w") as f:
+        yaml.safe_dump({"sites": {"site01": site_cfg}}, f)
+    args = build_arg_parser().parse_args(["--input", video, "--site", "site01", "--config", config,
+                                          "--sites", sites, "--out", str(tmp_path / out)])
+    return src.process_video.run(args, progress=_Progress())
+
+def test_adaptive_stride_counts_the_same_crossings_with_fewer_inference_calls(tmp_path, monkeypatch,
+                                                                            make_traffic_video, site_cfg,
+                                                                            pipeline_cfg, stub_tracker):
+    stored = []
+    monkeypatch.setattr(src.process_video, "store_events", lambda store, events, *args, **kwargs: stored.append(
+        [(e.t_sec, e.cls_name, e.zone_id, e.direction) for e in events]))
+    video = make_traffic_video("site01_20260118_1800.avi", n_vehicles=12)   # quiet stretches between vehicles
+    summaries = {}
+    for enabled in (False, True):
+        cfg = dict(pipeline_cfg, adaptive_stride=dict(pipeline_cfg["adaptive_stride"], enabled=enabled, min_fps=2))
+        summaries[enabled] = process(tmp_path, video, cfg, site_cfg, f"adaptive_{enabled}")
+
+    fixed, adaptive = stored
+    assert len(fixed) >= 8
+    assert adaptive == fixed
+    for name in ("counts_5min.csv", "counts_15min.csv"):
+        with open(os.path.join(tmp_path, "adaptive_False", "counts", name)) as a, \
+                open(os.path.join(tmp_path, "adaptive_True", "counts", name)) as b:
+            assert b.read() == a.read(), name
+    stats = summaries[True]["adaptive_stride"]
+    assert summaries[True]["perf"]["frames_processed"] < 0.95 * summaries[False]["perf"]["frames_processed"]
+    assert stats["inference_calls_vs_fixed"] < 0.95
+    assert stats["steps_used"].keys() > {"1"}                          # sampled below max_fps at times
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from src.export.annotation_sink import AnnotationSink
+from src.track.batch import TrackBatch
+
+class DeadEncoder:
+    """An encoder whose process died: write() fails, then close() hits the closed pipe."""
+
+    def write(self, frame):
+        raise RuntimeError("ffmpeg exited: Unknown encoder 'libx265'")
+
+    def close(self):
+        raise BrokenPipeError(32, "Broken pipe")
+
+def test_close_reports_the_worker_error_not_the_broken_pipe(tmp_path):
+    sink = AnnotationSink(str(tmp_path / "annotated.mp4"), (64, 48), 10.0).start()
+    sink._encoder.close()
+    sink._encoder = DeadEncoder()
+    sink.submit(np.zeros((48, 64, 3), dtype=np.uint8), TrackBatch.empty({0: "car"}))
+    with pytest.raises(RuntimeError, match="Unknown encoder") as exc:
+        sink.close()
+    assert isinstance(exc.value.__cause__, RuntimeError)
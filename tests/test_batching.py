@@ -0,0 +1,18 @@
+import pytest
+
+import src.process_video
+from src.bench.batching import run_batch_size
+
+@pytest.mark.parametrize("tracker_type", ["bytetrack", "native"])
+def test_batched_events_match_single_frame_mode(request, traffic_video, site_cfg, pipeline_cfg, stub_ultralytics,
+                                                tracker_type):
+    if tracker_type == "native":
+        request.getfixturevalue("stub_tracker")
+    cfg = dict(pipeline_cfg, tracker=dict(pipeline_cfg["tracker"], type=tracker_type))
+    tracker = src.process_video.build_tracker(cfg)
+    single = run_batch_size(tracker, traffic_video, None, cfg, site_cfg, set(), 1)
+    assert len(single["events"]) > 10
+    for batch_size in (4, 7):
+        batched = run_batch_size(tracker, traffic_video, None, cfg, site_cfg, set(), batch_size)
+        assert batched["frames"] == single["frames"]
+        assert batched["events"] == single["events"], batch_size
@@ -0,0 +1,93 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.track.bytetrack import ByteTracker
+
+ARGS = dict(track_high_thresh=0.25, track_low_thresh=0.1, new_track_thresh=0.25, track_buffer=30,
+            match_thresh=0.8, fuse_score=True)
+
+def recorded_detections(n_frames=150, n_objects=12, seed=0):
+    """(xyxy, conf, cls) per frame: vehicles crossing a 1280x720 frame with misses, low scores and clutter."""
+    rng = np.random.default_rng(seed)
+    start = rng.integers(0, n_frames - 30, n_objects)
+    pos = np.stack([rng.uniform(50, 1100, n_objects), rng.uniform(50, 600, n_objects)], axis=1)
+    vel = rng.uniform(-8, 8, (n_objects, 2))
+    size = rng.uniform(40, 120, (n_objects, 2))
+    cls = rng.integers(0, 3, n_objects)
+    frames = []
+    for f in range(n_frames):
+        if f % 37 == 36:   # nothing detected at all
+            frames.append((np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.float32)))
+            continue
+        live = np.flatnonzero((start <= f) & (rng.uniform(size=n_objects) > 0.1))
+        xy = pos[live] + vel[live] * (f - start[live])[:, None] + rng.normal(0, 1.5, (len(live), 2))
+        boxes = np.concatenate([xy, xy + size[live]], axis=1)
+        conf = rng.uniform(0.15, 0.95, len(live))
+        k = int(rng.integers(0, 2))                     # isolated false positives
+        fp = rng.uniform(0, 600, (k, 2))
+        boxes = np.concatenate([boxes, np.concatenate([fp, fp + 30], axis=1)])
+        conf = np.concatenate([conf, rng.uniform(0.1, 0.4, k)])
+        c = np.concatenate([cls[live], np.zeros(k, dtype=np.int64)])
+        frames.append((boxes.astype(np.float32), conf.astype(np.float32), c.astype(np.float32)))
+    return frames
+
+class Detections:
+    """The part of Ultralytics' Boxes (after .cpu().numpy()) BYTETracker.update reads."""
+
+    def __init__(self, xywh, conf, cls):
+        self.xywh, self.conf, self.cls = xywh, conf, cls
+
+    def __len__(self):
+        return len(self.conf)
+
+    def __getitem__(self, index):
+        return Detections(self.xywh[index], self.conf[index], self.cls[index])
+
+@pytest.mark.parametrize("gated", [False, True])
+def test_matches_ultralytics_bytetracker(gated):
+    byte_tracker = pytest.importorskip("ultralytics.trackers.byte_tracker")
+    theirs = byte_tracker.BYTETracker(SimpleNamespace(**ARGS))   # frame_rate 30: track_buffer frames
+    theirs.reset()
+    ours = ByteTracker(**ARGS)
+    for f, (xyxy, conf, cls) in enumerate(recorded_detections()):
+        if gated and f % 10 in (3, 4, 5):                        # the motion gate skipped the frame:
+            assert len(ours.skip_frame().track_id) == 0          # Ultralytics' tracker is not called
+            continue
+        xywh = np.concatenate([(xyxy[:, :2] + xyxy[:, 2:]) / 2, xyxy[:, 2:] - xyxy[:, :2]], axis=1)
+        ref = np.asarray(theirs.update(Detections(xywh, conf, cls))).reshape(-1, 8)
+        ref = ref[np.argsort(ref[:, 4])]
+        out = ours.update(xyxy, conf, cls)
+        order = np.argsort(out.track_id)
+        np.testing.assert_array_equal(out.track_id[order], ref[:, 4].astype(np.int64), err_msg=f"frame {f}")
+        np.testing.assert_allclose(out.xyxy[order], ref[:, :4], atol=0.05, err_msg=f"frame {f}")
+        np.testing.assert_array_equal(out.det_index[order], ref[:, 7].astype(np.int64), err_msg=f"frame {f}")
+
+def test_new_track_duplicating_a_lost_track_is_dropped():
+    tracker = ByteTracker(**dict(ARGS, match_thresh=0.5))
+    box = np.array([[100.0, 100.0, 200.0, 200.0]])
+    for _ in range(5):
+        tracker.update(box, [0.9], [1])
+    tracker.update(np.zeros((0, 4)), [], [])         # the track is lost
+    # fused cost 1 - IoU * 0.3 > match_thresh: no match, so a new track starts on top of the lost one
+    out = tracker.update(box, [0.3], [1])
+    assert len(out.track_id) == 0
+    assert tracker.active_tracks == 1                # the older, lost track is kept
+
+def test_frames_skipped_by_the_gate_leave_tracks_unchanged():
+    tracker = ByteTracker(**dict(ARGS, track_buffer=5))
+    car, bike = np.array([[100.0, 100.0, 200.0, 200.0]]), np.array([[400.0, 100.0, 440.0, 180.0]])
+    for _ in range(3):
+        tracker.update(car, [0.9], [1])
+    tracker.update(np.concatenate([car, bike]), [0.9, 0.9], [1, 0])   # bike: tentative
+    first = tracker.update(np.concatenate([car, bike]), [0.9, 0.9], [1, 0]).track_id
+    tracker.update(car, [0.9], [1])                                    # bike lost
+    before = tracker.snapshot()
+    for _ in range(20):                                                # longer than track_buffer
+        assert len(tracker.skip_frame().track_id) == 0
+    for key, value in tracker.snapshot().items():
+        np.testing.assert_array_equal(value, before[key], err_msg=key)
+    assert tracker.active_tracks == 2
+    again = tracker.update(np.concatenate([car, bike]), [0.9, 0.9], [1, 0]).track_id
+    assert sorted(again.tolist()) == sorted(first.tolist())
@@ -0,0 +1,131 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+import yaml
+
+import src.process_video
+from src.count.counter import LineCrossingCounter
+from src.count.zones import ZoneCounter, parse_zones
+from src.detect.roi import MotionGate
+from src.ingest.video_reader import FramePacket
+from src.process_video import build_arg_parser, open_frames
+from src.utils.checkpoint import Checkpointer, load_checkpoint
+
+ZONES = [{"id": "box", "polygon": [[100, 0], [220, 0], [220, 180], [100, 180]], "direction": "any"},
+         {"id": "upper", "line": {"p1": [160, 0], "p2": [160, 90]}}]
+
+class _Progress:
+    def update(self, n):
+        pass
+
+def event_rows(events):
+    return [(e.t_sec, e.track_id, e.cls_name, e.rule, e.zone_id, e.direction) for e in events]
+
+def run_stream(pkts, tracker, gate, line, zones):
+    """gate -> detect -> track -> count per frame, as count_frames does."""
+    out = []
+    for pkt in pkts:
+        on = gate.check(pkt.frame_bgr)
+        batch = tracker.update(tracker.detect([pkt.frame_bgr])[0] if on else None)
+        out.append((on, batch.track_id.tolist(), np.round(batch.xyxy, 3).tolist(),
+                    event_rows(line.update(pkt.t_sec, batch)), event_rows(zones.update(pkt.t_sec, batch))))
+    return out
+
+def test_snapshots_round_trip_through_a_checkpoint_file(tmp_path, traffic_video, site_cfg, pipeline_cfg,
+                                                        stub_tracker):
+    def fresh():
+        tracker = src.process_video.build_tracker(pipeline_cfg)
+        line = LineCrossingCounter("site01", (160.0, 0.0), (160.0, 180.0), max_idle_sec=5.0)
+        zones = ZoneCounter("site01", parse_zones({"zones": ZONES}), max_idle_sec=5.0, capacity=4)
+        return tracker, MotionGate(max_skip_frames=5), line, zones
+
+    frame_iter, _ = open_frames(traffic_video, pipeline_cfg, end_frame=300)
+    pkts = list(frame_iter)
+    expected = run_stream(pkts, *fresh())
+    assert sum(not on for on, *_ in expected) > 10                      # the gate skipped frames
+    assert sum(len(line) + len(zones) for *_, line, zones in expected[150:]) > 5
+
+    tracker, gate, line, zones = fresh()
+    run_stream(pkts[:150], tracker, gate, line, zones)
+    assert tracker.tracker.active_tracks > 0
+    ckpt = Checkpointer(str(tmp_path / "run.npz"), 10.0, parts=("tracker", "gate", "zones"))
+    ckpt.capture(pkts[149].frame_index, "tracker", tracker.snapshot())
+    ckpt.capture(pkts[149].frame_index, "gate", gate.snapshot())
+    ckpt.capture(pkts[149].frame_index, "zones", zones.snapshot())
+    assert ckpt.save(pkts[149], line, [])
+
+    parts = load_checkpoint(str(tmp_path / "run.npz"))["parts"]        # np.load(allow_pickle=False)
+    tracker, gate, line, zones = fresh()
+    tracker.restore(parts["tracker"])
+    gate.restore(parts["gate"])
+    line.restore(parts["counter"])
+    zones.restore(parts["zones"])
+    assert run_stream(pkts[150:], tracker, gate, line, zones) == expected[150:]
+
+@pytest.mark.parametrize("part", ["tracker", "gate", "line", "zones"])
+def test_empty_state_round_trips(tmp_path, pipeline_cfg, stub_tracker, part):
+    build = {"tracker": lambda: src.process_video.build_tracker(pipeline_cfg),
+             "gate": MotionGate,
+             "line": lambda: LineCrossingCounter("s", (0.0, 0.0), (10.0, 10.0)),
+             "zones": lambda: ZoneCounter("s", parse_zones({"zones": ZONES}))}[part]
+    saved = build().snapshot()
+    ckpt = Checkpointer(str(tmp_path / "empty.npz"), 10.0)
+    ckpt.capture(0, "state", saved)
+    assert ckpt.save(FramePacket(None, 0, 0.0), LineCrossingCounter("s", (0, 0), (1, 1)), [])
+    restored = build()
+    restored.restore(load_checkpoint(str(tmp_path / "empty.npz"))["parts"]["state"])
+    again = restored.snapshot()
+    assert again.keys() == saved.keys()
+    for key in saved:
+        if saved[key] is None:
+            assert again[key] is None, key
+        else:
+            np.testing.assert_array_equal(np.asarray(again[key]), np.asarray(saved[key]), err_msg=key)
+
+def process(tmp_path, video, cfg, site_cfg, out, resume=False, tracker=None):
+    config, sites = str(tmp_path / "pipeline.yaml"), str(tmp_path / "sites.yaml")
+    with open(config, "w") as f:
+        yaml.safe_dump(cfg, f)
+    with open(sites, "w") as f:
+        yaml.safe_dump({"sites": {"site01": site_cfg}}, f)
+    args = build_arg_parser().parse_args(["--input", video, "--site", "site01", "--config", config,
+                                          "--sites", sites, "--out", str(tmp_path / out)]
+                                         + (["--resume"] if resume else []))
+    return src.process_video.run(args, tracker=tracker, progress=_Progress())
+
+def test_resumed_run_matches_an_uninterrupted_run(tmp_path, monkeypatch, traffic_video, site_cfg, pipeline_cfg,
+                                                  stub_tracker):
+    stored = []
+    monkeypatch.setattr(src.process_video, "store_events",
+                        lambda store, events, *args, **kwargs: stored.append(event_rows(events)))
+    cfg = dict(pipeline_cfg, motion_gate=dict(pipeline_cfg["motion_gate"], enabled=True),
+               checkpoint=dict(pipeline_cfg["checkpoint"], enabled=True, interval_sec=10,
+                               dir=str(tmp_path / "checkpoints")))
+    full = process(tmp_path, traffic_video, cfg, site_cfg, "full")
+    assert not glob.glob(str(tmp_path / "checkpoints" / "*.npz"))      # removed once the run completes
+
+    crashing = src.process_video.build_tracker(cfg)
+    detect, seen = crashing.detector.detect_arrays, []
+
+    def detect_arrays(frames):
+        seen.extend(frames)
+        if len(seen) > 250:
+            raise RuntimeError("worker killed")
+        return detect(frames)
+    monkeypatch.setattr(crashing.detector, "detect_arrays", detect_arrays)
+    with pytest.raises(RuntimeError, match="worker killed"):
+        process(tmp_path, traffic_video, cfg, site_cfg, "crashed", tracker=crashing)
+    saved = load_checkpoint(glob.glob(str(tmp_path / "checkpoints" / "*.npz"))[0])
+    assert 10 <= saved["t_sec"] < 60 and saved["parts"].keys() == {"tracker", "gate", "counter"}
+
+    resumed = process(tmp_path, traffic_video, cfg, site_cfg, "resumed", resume=True)
+    assert resumed["checkpoint"]["resumed_from"]["frame_index"] == saved["frame_index"]
+    assert resumed["perf"]["frames_processed"] < full["perf"]["frames_processed"]
+    assert len(stored[0]) > 10
+    assert stored[1] == stored[0]
+    for name in ("counts_5min.csv", "counts_15min.csv", "counts_60min.csv"):
+        with open(os.path.join(tmp_path, "full", "counts", name)) as a, \
+                open(os.path.join(tmp_path, "resumed", "counts", name)) as b:
+            assert b.read() == a.read(), name
@@ -0,0 +1,107 @@
+import glob
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+import yaml
+
+import src.process_video
+import src.store.events
+from src.count.counter import CountEvent
+from src.process_video import build_arg_parser
+
+pytest.importorskip("pyarrow")
+from src.store.events import EventStore  # noqa: E402
+from src.store.query import main as query_main  # noqa: E402
+
+ORIGIN = datetime(2026, 1, 18, 23, 0)
+
+def ev(t_sec, cls_name, zone_id="line", direction="A_to_B", track_id=1):
+    return CountEvent(t_sec, "site01", track_id, cls_name, "line_crossing", zone_id, direction)
+
+# 23:05 car, 23:10 bus, 23:50 car (zone b), next day 00:20 car, 01:40 bus
+EVENTS = [ev(300, "car"), ev(600, "bus"), ev(3000, "car", zone_id="b", direction="B_to_A"),
+          ev(4800, "car"), ev(9600, "bus")]
+
+class _Progress:
+    def update(self, n):
+        pass
+
+def process(tmp_path, video, cfg, site_cfg, out):
+    config, sites = str(tmp_path / "pipeline.yaml"), str(tmp_path / "sites.yaml")
+    with open(config, "w") as f:
+        yaml.safe_dump(cfg, f)
+    with open(sites, "w") as f:
+        yaml.safe_dump({"sites": {"site01": site_cfg}}, f)
+    args = build_arg_parser().parse_args(["--input", video, "--site", "site01", "--config", config,
+                                          "--sites", sites, "--out", str(tmp_path / out)])
+    return src.process_video.run(args, progress=_Progress())
+
+def test_rerunning_a_video_replaces_its_events(tmp_path, make_traffic_video, site_cfg, pipeline_cfg, stub_tracker):
+    cfg = dict(pipeline_cfg, store={"enabled": True, "dir": str(tmp_path / "store")})
+    first = make_traffic_video("site01_20260118_1800.avi")
+    other = make_traffic_video("site01_20260118_1900.avi", seed=1)
+    for video, out in ((first, "a"), (other, "b"), (first, "c")):
+        process(tmp_path, video, cfg, site_cfg, out)
+
+    store = EventStore(str(tmp_path / "store"))
+    df = store.events(site="site01")
+    csv = pd.read_csv(tmp_path / "c" / "counts" / "counts_15min.csv")
+    assert len(df[df["source"] == first]) == csv["count"].sum() > 10
+    assert df["video_id"].nunique() == 2
+    assert len(glob.glob(str(tmp_path / "store" / "site_id=site01" / "date=*" / "*.parquet"))) == 2
+    counts = store.counts("15min", site="site01", start="2026-01-18 18:00", end="2026-01-18 18:15")
+    assert counts[["vehicle_class", "count"]].values.tolist() \
+        == csv[["vehicle_class", "count"]].values.tolist()
+
+def test_rewrite_drops_dates_the_run_no_longer_covers(tmp_path):
+    store = EventStore(str(tmp_path))
+    store.write_run(EVENTS, "site01", ORIGIN, "clip")
+    assert store.dates() == ["2026-01-18", "2026-01-19"]
+    store.write_run(EVENTS[:2], "site01", ORIGIN, "clip")
+    assert store.dates() == ["2026-01-18"]
+    assert store.events()["cls_name"].tolist() == ["car", "bus"]
+
+def test_failed_rewrite_leaves_the_old_run(tmp_path, monkeypatch):
+    store = EventStore(str(tmp_path))
+    store.write_run(EVENTS, "site01", ORIGIN, "clip")
+
+    def replace(src, dst):
+        raise OSError("disk full")
+    monkeypatch.setattr(src.store.events.os, "replace", replace)
+    with pytest.raises(OSError, match="disk full"):
+        store.write_run(EVENTS[:2], "site01", ORIGIN, "clip")
+    assert len(store.events()) == len(EVENTS)
+
+def test_counts_by_bucket_class_and_date_range(tmp_path):
+    store = EventStore(str(tmp_path))
+    store.write_run(EVENTS, "site01", ORIGIN, "clip")
+
+    hourly = store.counts("1h", site="site01")
+    assert hourly[["bucket_start", "vehicle_class", "count"]].values.tolist() == [
+        ["2026-01-18 23:00:00", "bus", 1], ["2026-01-18 23:00:00", "car", 2],
+        ["2026-01-19 00:00:00", "car", 1], ["2026-01-19 01:00:00", "bus", 1]]
+    daily = store.counts("1d", classes=["car"])
+    assert daily[["bucket_start", "count"]].values.tolist() == [["2026-01-18 00:00:00", 2],
+                                                               ["2026-01-19 00:00:00", 1]]
+    # start inclusive, end exclusive
+    window = store.counts("15min", start="2026-01-18 23:10", end="2026-01-19 01:40")
+    assert window[["bucket_start", "vehicle_class"]].values.tolist() == [
+        ["2026-01-18 23:00:00", "bus"], ["2026-01-18 23:45:00", "car"], ["2026-01-19 00:15:00", "car"]]
+    assert store.dates(start="2026-01-19") == ["2026-01-19"]
+    by_zone = store.counts("1d", by=["zone_id"], end="2026-01-19")
+    assert by_zone[["zone_id", "vehicle_class", "count"]].values.tolist() == [
+        ["b", "car", 1], ["line", "bus", 1], ["line", "car", 1]]
+    assert store.counts("1h", site="site02").empty
+    with pytest.raises(ValueError):
+        store.counts("1h", by=["speed"])
+
+def test_query_cli_writes_the_report(tmp_path):
+    EventStore(str(tmp_path / "store")).write_run(EVENTS, "site01", ORIGIN, "clip")
+    out = str(tmp_path / "report.csv")
+    query_main(["--store", str(tmp_path / "store"), "--site", "site01", "--from", "2026-01-19", "--bucket", "1d",
+                "--classes", "car,bus", "--out", out])
+    assert pd.read_csv(out)[["vehicle_class", "count"]].values.tolist() == [["bus", 1], ["car", 1]]
+    with pytest.raises(SystemExit, match="No event store"):
+        query_main(["--store", str(tmp_path / "missing")])
@@ -0,0 +1,67 @@
+import pytest
+import yaml
+
+import src.process_video
+import src.utils.host_profile
+from src.export.json_summary import write_json
+from src.process_video import build_arg_parser
+from src.utils.host_profile import cpu_info, detector_key, profile_path
+from src.utils.threads import THREAD_ENV_VARS
+
+class _Progress:
+    def update(self, n):
+        pass
+
+@pytest.fixture
+def applied(monkeypatch):
+    """Thread counts apply_profile_threads() sets (recorded, not applied to the test process)."""
+    calls = []
+    for var in THREAD_ENV_VARS:
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setattr(src.utils.host_profile, "apply_threads", lambda *threads: calls.append(threads))
+    return calls
+
+def process(tmp_path, video, cfg, site_cfg, *extra):
+    config, sites = str(tmp_path / "pipeline.yaml"), str(tmp_path / "sites.yaml")
+    with open(config, "w") as f:
+        yaml.safe_dump(cfg, f)
+    with open(sites, "w") as f:
+        yaml.safe_dump({"sites": {"site01": site_cfg}}, f)
+    args = build_arg_parser().parse_args(["--input", video, "--site", "site01", "--config", config,
+                                          "--sites", sites, "--out", str(tmp_path / "out"), *extra])
+    return src.process_video.run(args, progress=_Progress())
+
+def save_profile(cfg, **cpu):
+    profile = {"host": "test", "cpu": dict(cpu_info(), **cpu), "detector": detector_key(cfg),
+               "settings": {"workers": 1, "torch_threads": 3, "cv2_threads": 2, "batch_size": 5, "affinity": False}}
+    write_json(profile, profile_path(cfg))
+    return profile_path(cfg)
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_saved_profile_is_applied_only_when_enabled(tmp_path, make_traffic_video, site_cfg, pipeline_cfg,
+                                                    stub_tracker, applied, enabled):
+    cfg = dict(pipeline_cfg, host_profile={"enabled": enabled, "dir": str(tmp_path / "profiles")})
+    path = save_profile(cfg)
+    summary = process(tmp_path, make_traffic_video("site01_20260118_1800.avi", seconds=10), cfg, site_cfg)
+    if enabled:
+        assert summary["perf"]["host_profile"] == path
+        assert summary["perf"]["batch_size"] == 5
+        assert applied == [(3, 2)]
+    else:
+        assert summary["perf"]["host_profile"] is None
+        assert summary["perf"]["batch_size"] == int(cfg["detector"].get("batch_size", 1))
+        assert applied == []
+
+def test_explicit_batch_size_and_stale_profiles_win(tmp_path, make_traffic_video, site_cfg, pipeline_cfg,
+                                                    stub_tracker, applied):
+    cfg = dict(pipeline_cfg, host_profile={"enabled": True, "dir": str(tmp_path / "profiles")})
+    video = make_traffic_video("site01_20260118_1800.avi", seconds=10)
+    save_profile(cfg)
+    assert process(tmp_path, video, cfg, site_cfg, "--batch_size", "2")["perf"]["batch_size"] == 2
+
+    save_profile(cfg, model="another CPU")
+    summary = process(tmp_path, video, cfg, site_cfg)
+    assert summary["perf"]["host_profile"] is None
+    save_profile(dict(cfg, detector=dict(cfg["detector"], imgsz=1280)))
+    assert process(tmp_path, video, cfg, site_cfg)["perf"]["host_profile"] is None
+    assert applied == [(3, 2)]                                         # only the first, current profile
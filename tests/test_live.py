@@ -0,0 +1,47 @@
+import time
+
+import pandas as pd
+import yaml
+
+import src.process_video
+from src.ingest.live_stream import LiveFrameSource
+from src.process_video import EventTally, build_arg_parser
+
+class _Progress:
+    def update(self, n):
+        pass
+
+def test_live_run_loads_the_model_first_and_keeps_only_the_event_count(tmp_path, monkeypatch, make_traffic_video,
+                                                                       site_cfg, pipeline_cfg, stub_tracker):
+    order, stored = [], []
+    build = src.process_video.build_tracker
+
+    def slow_build(cfg):
+        time.sleep(0.5)                                                 # loading the model
+        order.append("tracker")
+        return build(cfg)
+    start = LiveFrameSource.start
+
+    def start_source(self, *args, **kwargs):
+        order.append("source")
+        return start(self, *args, **kwargs)
+    monkeypatch.setattr(src.process_video, "build_tracker", slow_build)
+    monkeypatch.setattr(LiveFrameSource, "start", start_source)
+    monkeypatch.setattr(src.process_video, "store_events", lambda store, events, *args: stored.append(events))
+
+    config, sites = str(tmp_path / "pipeline.yaml"), str(tmp_path / "sites.yaml")
+    with open(config, "w") as f:
+        yaml.safe_dump(pipeline_cfg, f)
+    with open(sites, "w") as f:
+        yaml.safe_dump({"sites": {"site01": site_cfg}}, f)
+    video = make_traffic_video("site01_20260118_1800.avi", seconds=5, n_vehicles=10)
+    args = build_arg_parser().parse_args(["--input", video, "--realtime", "--site", "site01", "--config", config,
+                                          "--sites", sites, "--out", str(tmp_path / "out")])
+    summary = src.process_video.run(args, progress=_Progress())
+
+    assert order == ["tracker", "source"]
+    assert summary["live"]["frames_delivered"] > 30
+    events, = stored
+    assert isinstance(events, EventTally)
+    counts = pd.read_csv(tmp_path / "out" / "counts" / "counts_15min.csv")
+    assert summary["events_total"] == len(events) == counts["count"].sum() > 0
@@ -0,0 +1,82 @@
+from collections import Counter, deque
+from types import SimpleNamespace
+
+import pytest
+import yaml
+
+import src.detect.yolo_detector
+import src.process_video
+from src.parallel.multistream import MultiStreamScheduler, StreamSpec, run_streams
+from src.process_video import build_arg_parser
+
+from conftest import StubDetector
+
+def fake_stream(name, priority, frames):
+    return SimpleNamespace(spec=SimpleNamespace(name=name, priority=priority), buf=deque(frames), deficit=0.0,
+                           done=False)
+
+def take_rounds(scheduler, rounds, refill):
+    taken = Counter()
+    for _ in range(rounds):
+        for s in scheduler.streams:
+            if s.spec.name in refill:
+                s.buf.extend((None, True) for _ in range(scheduler.queue_frames - len(s.buf)))
+        taken.update(s.spec.name for s, _, _ in scheduler._take())
+    return taken
+
+@pytest.mark.parametrize("batch_size", [1, 3, 4])
+def test_busy_streams_share_batches_by_priority(batch_size):
+    scheduler = MultiStreamScheduler([fake_stream("high", 2, []), fake_stream("low", 1, []),
+                                      fake_stream("half", 0.5, [])], batch_size)
+    taken = take_rounds(scheduler, 700, refill={"high", "low", "half"})
+    total = sum(taken.values())
+    assert total == 700 * batch_size
+    for name, priority in (("high", 2), ("low", 1), ("half", 0.5)):
+        assert taken[name] / total == pytest.approx(priority / 3.5, abs=0.01), name
+
+def test_a_stalled_stream_banks_no_credit():
+    scheduler = MultiStreamScheduler([fake_stream("busy", 1, []), fake_stream("stalled", 1, [])], 2)
+    assert take_rounds(scheduler, 50, refill={"busy"}) == {"busy": 100}
+    # back with frames: an even split, not a burst paid for by the stalled rounds
+    taken = take_rounds(scheduler, 50, refill={"busy", "stalled"})
+    assert taken == {"busy": 50, "stalled": 50}
+
+def test_a_turn_cut_short_by_an_empty_queue_is_not_banked():
+    high, low = fake_stream("high", 3, [(None, True)]), fake_stream("low", 1, [(None, True)] * 4)
+    scheduler = MultiStreamScheduler([high, low], 2)
+    assert [s.spec.name for s, _, _ in scheduler._take()] == ["high", "low"]
+    assert high.deficit == 0
+    taken = take_rounds(scheduler, 400, refill={"high", "low"})
+    assert taken["high"] / sum(taken.values()) == pytest.approx(0.75, abs=0.01)
+
+def event_rows(events):
+    return [(e.t_sec, e.track_id, e.cls_name, e.zone_id, e.direction) for e in events]
+
+def test_each_stream_counts_like_a_single_stream_run(tmp_path, monkeypatch, make_traffic_video, site_cfg,
+                                                     pipeline_cfg, stub_tracker):
+    stored = {}
+    monkeypatch.setattr(src.process_video, "store_events",
+                        lambda store, events, site_id, origin, source, *args: stored.setdefault(source, []).append(
+                            event_rows(events)))
+    monkeypatch.setattr(src.detect.yolo_detector, "YoloDetector", lambda **kwargs: StubDetector())
+    sites = {"site01": site_cfg, "site02": dict(site_cfg, site_id="site02")}
+    videos = {"site01": make_traffic_video("site01_20260118_1800.avi"),
+              "site02": make_traffic_video("site02_20260118_1800.avi", seconds=40, seed=1)}
+    specs = [StreamSpec("site01", "site01", videos["site01"], priority=2),
+             StreamSpec("site02", "site02", videos["site02"], priority=1)]
+    host = run_streams(specs, pipeline_cfg, sites, set(), str(tmp_path / "multi"), batch_size=3)
+    assert [r["frames_processed"] for r in host["streams"]] == [600, 400]
+    assert host["mean_batch_fill"] > 0.5
+
+    config, sites_path = str(tmp_path / "pipeline.yaml"), str(tmp_path / "sites.yaml")
+    with open(config, "w") as f:
+        yaml.safe_dump(pipeline_cfg, f)
+    with open(sites_path, "w") as f:
+        yaml.safe_dump({"sites": sites}, f)
+    for site, video in videos.items():
+        args = build_arg_parser().parse_args(["--input", video, "--site", site, "--config", config,
+                                              "--sites", sites_path, "--out", str(tmp_path / site)])
+        src.process_video.run(args, progress=SimpleNamespace(update=lambda n: None))
+        multi, single = stored[video]
+        assert len(single) > 10
+        assert multi == single, site
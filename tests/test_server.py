@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+import yaml
+
+import src.process_video
+from src.server import FINISHED, Worker
+
+def wait(job, timeout=120):
+    with job.changed:
+        assert job.changed.wait_for(lambda: job.status in FINISHED, timeout)
+    assert job.status == "done", job.error
+    return job
+
+@pytest.mark.parametrize("tracker_type", ["bytetrack", "native"])
+def test_jobs_on_one_loaded_tracker_count_like_a_fresh_one(request, tmp_path, monkeypatch, make_traffic_video,
+                                                           site_cfg, pipeline_cfg, stub_ultralytics, tracker_type):
+    if tracker_type == "native":
+        request.getfixturevalue("stub_tracker")
+    loaded = []
+    build = src.process_video.build_tracker
+    monkeypatch.setattr(src.process_video, "build_tracker", lambda cfg: loaded.append(build(cfg)) or loaded[-1])
+    stored = []
+    monkeypatch.setattr(src.process_video, "store_events", lambda store, events, *args: stored.append(
+        [(e.t_sec, e.track_id, e.cls_name, e.direction) for e in events]))
+    cfg = dict(pipeline_cfg, tracker=dict(pipeline_cfg["tracker"], type=tracker_type))
+    config, sites = str(tmp_path / "pipeline.yaml"), str(tmp_path / "sites.yaml")
+    with open(config, "w") as f:
+        yaml.safe_dump(cfg, f)
+    with open(sites, "w") as f:
+        yaml.safe_dump({"sites": {"site01": site_cfg}}, f)
+    first = make_traffic_video("site01_20260118_1800.avi")
+    other = make_traffic_video("site01_20260118_1900.avi", seed=1)
+
+    worker = Worker().start()
+    try:
+        jobs = [worker.submit(["--input", video, "--site", "site01", "--config", config, "--sites", sites,
+                               "--out", str(tmp_path / out)])
+                for video, out in ((first, "a"), (other, "b"), (first, "c"))]
+        for job in jobs:
+            wait(job)
+    finally:
+        worker.stop()
+
+    assert len(loaded) == 1 and len(worker.models) == 1
+    a, c = (pd.read_csv(tmp_path / out / "counts" / "counts_15min.csv") for out in ("a", "c"))
+    assert a["count"].sum() > 10
+    pd.testing.assert_frame_equal(c, a)
+    assert stored[2] == stored[0]                                      # track ids restart too
+    assert jobs[2].summary["perf"]["frames_processed"] == jobs[0].summary["perf"]["frames_processed"]
@@ -0,0 +1,35 @@
+import os
+
+import yaml
+
+from src.tools.sweep import _run_id, load_truth, run_detection, score
+
+def write_yaml(path, doc):
+    with open(path, "w") as f:
+        yaml.safe_dump(doc, f)
+    return str(path)
+
+def test_counts_line_up_with_a_clip_starting_between_quarter_hours(tmp_path, make_traffic_video, site_cfg,
+                                                                   pipeline_cfg, stub_tracker):
+    clip = {"input": make_traffic_video("site01_20260118_1807.avi"), "site": "site01"}
+    sites = write_yaml(tmp_path / "sites.yaml", {"sites": {"site01": site_cfg}})
+    classes = write_yaml(tmp_path / "classes.yaml", {"keep_classes": []})
+    run_id = _run_id(clip["input"], {}, pipeline_cfg, site_cfg, set())
+    r = run_detection(clip, pipeline_cfg, {}, [3], str(tmp_path / "sweep"), sites, classes, run_id)
+
+    # the run's own counts_15min.csv as ground truth: 18:00-18:15 is bucket -420
+    truth = load_truth(os.path.join(os.path.dirname(r["config"]), "counts", "counts_15min.csv"))
+    assert {start for start, _ in truth} == {-420}
+    totals, _ = score([r], {clip["input"]: truth}, 3)
+    assert totals["gt"] > 10
+    assert totals["wape"] == 0.0
+
+def test_run_id_covers_configs_and_classes(pipeline_cfg, site_cfg):
+    point = {"imgsz": 640}
+    base = _run_id("clip.mp4", point, pipeline_cfg, site_cfg, set())
+    tracker = dict(pipeline_cfg, tracker=dict(pipeline_cfg["tracker"], type="bytetrack"))
+    moved = dict(site_cfg, line={"p1": [100, 0], "p2": [100, 180]})
+    assert _run_id("clip.mp4", point, tracker, site_cfg, set()) != base
+    assert _run_id("clip.mp4", point, pipeline_cfg, moved, set()) != base
+    assert _run_id("clip.mp4", point, pipeline_cfg, site_cfg, {"car"}) != base
+    assert _run_id("clip.mp4", dict(point), dict(pipeline_cfg), dict(site_cfg), set()) == base
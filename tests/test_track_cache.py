@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pytest
+import yaml
+
+import src.process_video
+import src.recount
+from src.track.batch import TrackBatch
+from src.track.cache import TrackCache, TrackCacheWriter, cache_key
+
+NAMES = {0: "motorcycle", 1: "car", 2: "bus"}
+
+def frames(n=50, seed=0):
+    rng = np.random.default_rng(seed)
+    for f in range(n):
+        k = int(rng.integers(0, 4)) if f % 7 else 0   # some frames without tracks
+        xyxy = rng.uniform(0, 640, (k, 4))
+        yield f / 10.0, 3 * f, TrackBatch(rng.integers(1, 20, k), xyxy, rng.uniform(0, 1, k),
+                                          rng.integers(0, 2, k), NAMES)
+
+def test_streamed_cache_round_trip(tmp_path):
+    writer = TrackCacheWriter(str(tmp_path), "key", {"version": 1}, chunk_frames=8)
+    expected = list(frames())
+    for t, fidx, batch in expected:
+        writer.add(t, fidx, batch)
+    assert os.path.isdir(writer.path + ".tmp") and not os.path.exists(writer.path)
+    path = writer.close({"fps": 10})
+
+    cache = TrackCache(path)
+    assert cache.n_frames == len(expected)
+    assert isinstance(cache.xyxy, np.memmap) and cache.xyxy.shape[1] == 4
+    assert cache.names == {0: "motorcycle", 1: "car"}
+    for (t, fidx, batch), (t2, fidx2, replay) in zip(expected, cache.iter_frames()):
+        assert (t, fidx) == (t2, fidx2)
+        np.testing.assert_array_equal(replay.track_id, batch.track_id)
+        np.testing.assert_array_equal(replay.xyxy, batch.xyxy)
+        np.testing.assert_array_equal(replay.cls_id, batch.cls_id)
+        np.testing.assert_allclose(replay.conf, batch.conf, rtol=1e-6)
+    assert np.load(os.path.join(path, "frame_ptr.npy"))[-1] == sum(len(b) for _, _, b in expected)
+
+def test_empty_cache(tmp_path):
+    writer = TrackCacheWriter(str(tmp_path), "key", {"version": 1})
+    cache = TrackCache(writer.close({}))
+    assert cache.n_frames == 0
+    assert cache.xyxy.shape == (0, 4)
+    assert list(cache.iter_frames()) == []
+
+def test_inference_filters_are_part_of_the_key(pipeline_cfg):
+    base, _ = cache_key("v.mp4", pipeline_cfg, video_hash="v")
+    for section in ("roi", "motion_gate", "adaptive_stride"):
+        filtered = dict(pipeline_cfg, **{section: dict(pipeline_cfg[section], enabled=True)})
+        assert cache_key("v.mp4", filtered, video_hash="v")[0] != base, section
+    # the ROI box follows the line, so moving the line keeps the key
+    assert cache_key("v.mp4", dict(pipeline_cfg), video_hash="v")[0] == base
+
+class _Progress:
+    def update(self, n):
+        pass
+
+def test_recount_refuses_lines_outside_the_recorded_roi(tmp_path, traffic_video, site_cfg, pipeline_cfg,
+                                                        stub_tracker):
+    cfg = dict(pipeline_cfg, roi=dict(pipeline_cfg["roi"], enabled=True, pad_px=40),
+               cache=dict(pipeline_cfg["cache"], enabled=True, dir=str(tmp_path / "cache")))
+    paths = {}
+    for name, doc in (("config", cfg), ("sites", {"sites": {"site01": site_cfg}})):
+        paths[name] = str(tmp_path / f"{name}.yaml")
+        with open(paths[name], "w") as f:
+            yaml.safe_dump(doc, f)
+    common = ["--input", traffic_video, "--site", "site01", "--config", paths["config"], "--sites", paths["sites"]]
+    summary = src.process_video.run(src.process_video.build_arg_parser().parse_args(
+        common + ["--out", str(tmp_path / "run")]), progress=_Progress())
+    assert TrackCache(summary["outputs"]["track_cache"]).recorded_with["roi"] == [120, 0, 200, 180]
+
+    inside = src.recount.run(src.recount.build_arg_parser().parse_args(
+        common + ["--out", str(tmp_path / "inside"), "--line", "near=150,0,150,180"]))
+    assert inside["candidates"][1]["total"] > 0
+    with pytest.raises(SystemExit, match="outside leaves it"):
+        src.recount.run(src.recount.build_arg_parser().parse_args(
+            common + ["--out", str(tmp_path / "outside"), "--line", "outside=60,0,60,180"]))
@@ -0,0 +1,88 @@
+import numpy as np
+
+import src.detect.backends
+from src.count.counter import LineCrossingCounter
+from src.track.tracker import UltralyticsByteTracker
+
+class _Col:
+    def __init__(self, a):
+        self.a = np.asarray(a)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.a
+
+class _Boxes:
+    def __init__(self, ids, xyxy):
+        self.id, self.xyxy = _Col(ids), _Col(xyxy)
+        self.conf, self.cls = _Col(np.full(len(ids), 0.9)), _Col(np.zeros(len(ids)))
+
+class _Result:
+    def __init__(self, ids, xyxy):
+        self.boxes = _Boxes(ids, xyxy)
+
+class _Tracker:
+    """Stands in for BYTETracker: nearest-centre ids; reset() forgets tracks and restarts ids at 1."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.prev, self.next_id = {}, 1
+
+    def update(self, xyxy):
+        centres, ids, taken = (xyxy[:, :2] + xyxy[:, 2:]) / 2, [], set()
+        for c in centres:
+            near = [t for t, p in self.prev.items() if t not in taken and np.abs(p - c).sum() < 60]
+            tid = near[0] if near else self.next_id
+            self.next_id += tid == self.next_id
+            taken.add(tid)
+            ids.append(tid)
+        self.prev = dict(zip(ids, centres))
+        return np.array(ids, dtype=float)
+
+class _Predictor:
+    pass
+
+class StubYOLO:
+    """model.track() as in Ultralytics 8.2/8.3: `persist` is bound when the trackers are first registered."""
+    names = {0: "car"}
+
+    def __init__(self):
+        self.predictor = None
+        self._persist = None
+
+    def track(self, source, persist=False, **kwargs):
+        if self.predictor is None:
+            self.predictor = _Predictor()
+        if not hasattr(self.predictor, "trackers"):
+            self._persist = persist                                  # register_tracker(model, persist)
+        if not (self._persist and hasattr(self.predictor, "trackers")):
+            self.predictor.trackers = [_Tracker()]                   # on_predict_start
+        frames = source if isinstance(source, list) else [source]
+        # a "frame" here is its detections: (N,4) boxes
+        return [_Result(self.predictor.trackers[0].update(f), f) for f in frames]
+
+def clip():
+    """Three vehicles driving left to right across x = 320."""
+    return [np.array([[x + dx, 100.0 + 80 * k, x + dx + 40, 140.0 + 80 * k] for k, dx in enumerate((0, -30, -60))])
+            for x in range(200, 440, 20)]
+
+def run(tracker):
+    counter = LineCrossingCounter("s", (320.0, 0.0), (320.0, 720.0), min_track_age_frames=2)
+    ids, events = [], []
+    for t, batch in enumerate(tracker.track_frames(clip()[:4]) + [tracker.track_frame(f) for f in clip()[4:]]):
+        ids.append(batch.track_id.tolist())
+        events += [(e.t_sec, e.track_id) for e in counter.update(float(t), batch)]
+    return ids, events
+
+def test_reset_starts_the_next_video_with_fresh_tracks(monkeypatch):
+    monkeypatch.setattr(src.detect.backends, "load_yolo", lambda *args, **kwargs: StubYOLO())
+    tracker = UltralyticsByteTracker("stub.pt", conf=0.25, iou=0.5, imgsz=640, tracker_cfg="bytetrack.yaml")
+    first = run(tracker)
+    tracker.reset()
+    second = run(tracker)
+    assert len(first[1]) == 3
+    assert second == first
@@ -0,0 +1,116 @@
+import os
+import time
+
+import pytest
+
+import src.parallel.distributed
+from src.aggregate.online import parse_recording_start
+from src.parallel.distributed import merge, plan_video_jobs, work
+from src.parallel.shards import run_shard
+from src.parallel.work_queue import SqliteWorkQueue, WorkQueue
+from src.process_video import build_aggregator, write_15min_workbook
+
+def expire(queue, worker="crashed"):
+    """Lease a job and let the lease run out, as when the worker holding it dies."""
+    lease = queue.lease(worker, 0.01)
+    time.sleep(0.05)
+    return lease
+
+def test_backend_missing_a_method_fails_when_created():
+    class Partial(WorkQueue):
+        def submit(self, jobs, max_attempts=3, force=False):
+            return 0
+
+    with pytest.raises(TypeError):
+        Partial()
+
+def test_expired_lease_is_requeued_and_its_token_refused(tmp_path):
+    queue = SqliteWorkQueue(str(tmp_path / "queue.db"))
+    assert queue.submit([("a", {"n": 1}), ("b", {"n": 2})]) == 2
+    stale = expire(queue)
+    assert stale.job_id == "a" and stale.attempt == 1
+
+    lease = queue.lease("w2", 60)
+    assert (lease.job_id, lease.attempt) == ("a", 2)        # requeued ahead of "b"
+    assert lease.token != stale.token
+    assert not queue.heartbeat(stale, 60)
+    assert not queue.complete(stale, {"from": "stale"})
+    assert not queue.fail(stale, "late error")
+    assert queue.heartbeat(lease, 60)
+    assert queue.complete(lease, {"from": "w2"})
+    assert not queue.complete(lease, {"from": "w2 again"})  # one accepted result per job
+    assert list(queue.results()) == [("a", {"n": 1}, {"from": "w2"})]
+    assert queue.counts() == {"queued": 1, "leased": 0, "done": 1, "failed": 0}
+
+def test_job_fails_for_good_after_max_attempts(tmp_path):
+    queue = SqliteWorkQueue(str(tmp_path / "queue.db"))
+    queue.submit([("expired", {}), ("error", {})], max_attempts=2)
+    expire(queue)
+    expire(queue)
+    for _ in range(2):
+        lease = queue.lease("w", 60)
+        assert lease.job_id == "error"
+        assert queue.fail(lease, "boom")
+    assert queue.lease("w", 60) is None
+    failed = {j["job_id"]: j for j in queue.jobs("failed")}
+    assert failed["expired"]["attempts"] == 2 and failed["expired"]["error"] == "lease expired"
+    assert failed["error"]["attempts"] == 2 and failed["error"]["error"] == "boom"
+    assert queue.counts()["failed"] == 2
+
+def test_released_job_keeps_its_attempts(tmp_path):
+    queue = SqliteWorkQueue(str(tmp_path / "queue.db"))
+    queue.submit([("a", {})], max_attempts=2)
+    stale = expire(queue)
+    lease = queue.lease("w", 60)
+    assert not queue.release(stale)
+    assert queue.release(lease)
+    assert not queue.complete(lease, {})                    # the released lease is gone
+    job, = queue.jobs()
+    assert (job["status"], job["attempts"]) == ("queued", 1)   # only the expired lease counted
+
+def test_stopping_a_worker_does_not_fail_its_job(tmp_path, monkeypatch):
+    url = "sqlite:///" + str(tmp_path / "queue.db")
+    queue = SqliteWorkQueue(str(tmp_path / "queue.db"))
+    queue.submit([("a", {})], max_attempts=2)
+
+    def interrupted(payload, models):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(src.parallel.distributed, "run_job", interrupted)
+    for _ in range(3):                                      # more stops than max_attempts
+        with pytest.raises(KeyboardInterrupt):
+            work(url, "w", poll_sec=0, idle_exit_sec=0)
+    job, = queue.jobs()
+    assert (job["status"], job["attempts"], job["error"]) == ("queued", 0, "released")
+    assert queue.lease("w", 60).attempt == 1
+
+def counts_files(counts_dir):
+    return {name: open(os.path.join(counts_dir, name)).read()
+            for name in sorted(os.listdir(counts_dir)) if name.endswith(".csv")}
+
+def test_merge_of_retried_shards_matches_a_single_run(tmp_path, traffic_video, site_cfg, pipeline_cfg,
+                                                      stub_tracker):
+    url = "sqlite:///" + str(tmp_path / "queue.db")
+    queue = SqliteWorkQueue(str(tmp_path / "queue.db"))
+    jobs = plan_video_jobs(traffic_video, "site01", pipeline_cfg, site_cfg, [], shard_minutes=0.25)
+    assert len(jobs) == 4
+    queue.submit(jobs)
+    stale = expire(queue)                                    # shard 0: its first worker dies
+    stats = work(url, "w", lease_sec=60, poll_sec=0, idle_exit_sec=0)
+    assert stats["done"] == len(jobs)
+    assert not queue.complete(stale, {"events": []})
+    summary = merge(queue, str(tmp_path / "merged"))
+
+    whole = run_shard(traffic_video, pipeline_cfg, site_cfg, set(), 1,
+                      dict(index=0, start_frame=0, end_frame=None, warmup_from=0), tracker=stub_tracker[0])
+    single_dir = str(tmp_path / "single")
+    os.makedirs(single_dir)
+    agg, sinks, closed_15 = build_aggregator(pipeline_cfg, site_cfg, single_dir, parse_recording_start(traffic_video))
+    agg.add(whole["events"])
+    agg.flush()
+    write_15min_workbook(single_dir, agg, sinks, closed_15)
+
+    site = summary["sites"]["site01"]
+    assert len(whole["events"]) > 10
+    assert site["events_total"] == len(whole["events"])
+    assert site["videos"][0]["attempts"] == len(jobs) + 1
+    assert counts_files(str(tmp_path / "merged" / "site01" / "counts")) == counts_files(single_dir)